@@ -0,0 +1,136 @@
+"""
+Benchmarks for computing intersections and building figures. They follow the conventions of airspeed velocity (asv):
+each class has a parameter grid, setup is run once per combination of parameters, time_* methods are timed and track_*
+methods return a value to record. Run them with benchmarks/run.py, or with asv if it is installed.
+
+The size of the grid is chosen with the UPSETPLOTLY_BENCH_SCALE environment variable: quick, default or full. The full
+grid goes up to 10^7 elements and needs several GB of memory.
+"""
+import os
+from benchmarks.generators import OVERLAPS, make_samples, make_names, make_secondary_data
+from upsetplotly import UpSetPlotly
+from upsetplotly.set_functions import get_all_intersections, iter_intersections
+
+try:
+    import numpy
+    BACKENDS = ['python', 'numpy']
+except ImportError:
+    BACKENDS = ['python']
+
+SCALES = {
+    'quick': {'samples': [3, 8], 'elements': [10 ** 3, 10 ** 4]},
+    'default': {'samples': [3, 8, 15, 25], 'elements': [10 ** 3, 10 ** 5]},
+    'full': {'samples': [3, 8, 15, 25], 'elements': [10 ** 3, 10 ** 5, 10 ** 7]},
+}
+SCALE = os.environ.get('UPSETPLOTLY_BENCH_SCALE', 'default')
+if SCALE not in SCALES:
+    raise ValueError(f'UPSETPLOTLY_BENCH_SCALE must be one of {{{", ".join(SCALES)}}}')
+N_SAMPLES = SCALES[SCALE]['samples']
+N_ELEMENTS = SCALES[SCALE]['elements']
+
+# get_all_intersections returns every possible intersection, including the empty ones, so its output alone has 2^n
+# entries. beyond this many samples only iter_intersections is benchmarked.
+MAX_DENSE_SAMPLES = 15
+
+# the number of intersections drawn in the plot benchmarks, so figures stay a realistic size with many samples
+MAX_INTERSECTIONS = 40
+
+_cache = {}
+
+
+def get_samples(n_samples: int, n_elements: int, overlap: str):
+    # the samples are shared between benchmark classes, they are expensive to generate at the larger sizes
+    key = (n_samples, n_elements, overlap)
+    if key not in _cache:
+        _cache.clear()
+        _cache[key] = make_samples(n_samples, n_elements, overlap=overlap)
+    return _cache[key]
+
+
+class GetAllIntersections:
+    params = (N_SAMPLES, N_ELEMENTS, OVERLAPS)
+    param_names = ['n_samples', 'n_elements', 'overlap']
+
+    def setup(self, n_samples, n_elements, overlap):
+        if n_samples > MAX_DENSE_SAMPLES:
+            raise NotImplementedError
+        self.samples = get_samples(n_samples, n_elements, overlap)
+        self.names = make_names(n_samples)
+
+    def time_get_all_intersections(self, n_samples, n_elements, overlap):
+        get_all_intersections(self.samples, self.names)
+
+
+class IterIntersections:
+    params = (N_SAMPLES, N_ELEMENTS, OVERLAPS, BACKENDS)
+    param_names = ['n_samples', 'n_elements', 'overlap', 'backend']
+
+    def setup(self, n_samples, n_elements, overlap, backend):
+        self.samples = get_samples(n_samples, n_elements, overlap)
+        self.names = make_names(n_samples)
+
+    def time_iter_intersections(self, n_samples, n_elements, overlap, backend):
+        for _ in iter_intersections(self.samples, self.names, backend=backend):
+            pass
+
+
+class Init:
+    params = (N_SAMPLES, N_ELEMENTS, OVERLAPS, BACKENDS)
+    param_names = ['n_samples', 'n_elements', 'overlap', 'backend']
+
+    def setup(self, n_samples, n_elements, overlap, backend):
+        self.samples = get_samples(n_samples, n_elements, overlap)
+        self.names = make_names(n_samples)
+
+    def time_init(self, n_samples, n_elements, overlap, backend):
+        UpSetPlotly(self.samples, self.names, backend=backend)
+
+    def time_init_counts_only(self, n_samples, n_elements, overlap, backend):
+        UpSetPlotly(self.samples, self.names, backend=backend, keep_elements=False)
+
+
+class Plot:
+    params = (N_SAMPLES, N_ELEMENTS, OVERLAPS)
+    param_names = ['n_samples', 'n_elements', 'overlap']
+
+    def setup(self, n_samples, n_elements, overlap):
+        self.usp = UpSetPlotly(get_samples(n_samples, n_elements, overlap), make_names(n_samples))
+
+    def time_plot(self, n_samples, n_elements, overlap):
+        self.usp.plot(show_fig=False, max_intersections=MAX_INTERSECTIONS, use_cache=False)
+
+    def time_plot_ordered(self, n_samples, n_elements, overlap):
+        self.usp.plot(show_fig=False, order_by='decreasing', max_intersections=MAX_INTERSECTIONS, use_cache=False)
+
+
+class PlotSecondary:
+    params = (N_SAMPLES, N_ELEMENTS, OVERLAPS, [False, True])
+    param_names = ['n_samples', 'n_elements', 'overlap', 'aggregate']
+
+    def setup(self, n_samples, n_elements, overlap, aggregate):
+        if aggregate and 'numpy' not in BACKENDS:
+            raise NotImplementedError
+        samples = get_samples(n_samples, n_elements, overlap)
+        self.usp = UpSetPlotly(samples, make_names(n_samples))
+        self.usp.add_secondary_plot(make_secondary_data(samples), 'score', plot_type='box', aggregate=aggregate)
+
+    def time_plot_box(self, n_samples, n_elements, overlap, aggregate):
+        self.usp.plot(show_fig=False, max_intersections=MAX_INTERSECTIONS, use_cache=False)
+
+
+class Serialization:
+    params = (N_SAMPLES, N_ELEMENTS, OVERLAPS)
+    param_names = ['n_samples', 'n_elements', 'overlap']
+
+    def setup(self, n_samples, n_elements, overlap):
+        samples = get_samples(n_samples, n_elements, overlap)
+        usp = UpSetPlotly(samples, make_names(n_samples))
+        usp.add_secondary_plot(make_secondary_data(samples), 'score', plot_type='box')
+        self.fig = usp.plot(show_fig=False, return_fig=True, max_intersections=MAX_INTERSECTIONS)
+
+    def time_to_json(self, n_samples, n_elements, overlap):
+        self.fig.to_json()
+
+    def track_json_size(self, n_samples, n_elements, overlap):
+        return len(self.fig.to_json())
+    track_json_size.unit = 'bytes'
@@ -0,0 +1,88 @@
+"""
+Deterministic synthetic data for the benchmarks. The same arguments always give the same samples, on any machine and
+any python version, so timings from different versions of UpSetPlotly are measured on identical data.
+"""
+from typing import List, Dict
+import random
+
+# the overlap structures the generators can produce:
+#   uniform - every element is in each sample with probability 1/2, so nearly every possible intersection occurs
+#   sparse  - every element has a home sample and is in each other sample with probability 1/8, which gives a few large
+#             intersections and a long tail of small ones (typical for replicate peptide lists)
+#   nested  - element j is in samples 0..k for a random k, so each sample contains the next one
+OVERLAPS = ['uniform', 'sparse', 'nested']
+
+
+def make_signatures(n_samples: int, n_elements: int, overlap: str = 'sparse', seed: int = 0) -> List[int]:
+    """
+    Draw a membership signature for each element. Bit i of a signature is set if the element is in sample i.
+    :param n_samples: The number of samples.
+    :param n_elements: The number of distinct elements.
+    :param overlap: The overlap structure. Must be one of {uniform, sparse, nested}.
+    :param seed: Seed for the random number generator.
+    :return: A list with the (non-zero) signature of every element.
+    """
+    if overlap not in OVERLAPS:
+        raise ValueError(f'overlap must be one of {{{", ".join(OVERLAPS)}}}')
+    rng = random.Random(seed)
+    full = (1 << n_samples) - 1
+    signatures = []
+    if overlap == 'uniform':
+        for _ in range(n_elements):
+            signature = rng.getrandbits(n_samples)
+            while signature == 0:
+                signature = rng.getrandbits(n_samples)
+            signatures.append(signature)
+    elif overlap == 'sparse':
+        for _ in range(n_elements):
+            # and-ing three random words sets each bit with probability 1/8
+            extra = rng.getrandbits(n_samples) & rng.getrandbits(n_samples) & rng.getrandbits(n_samples)
+            signatures.append((1 << rng.randrange(n_samples)) | (extra & full))
+    else:
+        for _ in range(n_elements):
+            signatures.append((1 << (rng.randrange(n_samples) + 1)) - 1)
+    return signatures
+
+
+def make_samples(n_samples: int, n_elements: int, overlap: str = 'sparse', seed: int = 0,
+                 strings: bool = False) -> List[List]:
+    """
+    Generate samples with a known overlap structure. See make_signatures.
+    :param n_samples: The number of samples.
+    :param n_elements: The number of distinct elements across all samples.
+    :param overlap: The overlap structure. Must be one of {uniform, sparse, nested}.
+    :param seed: Seed for the random number generator.
+    :param strings: If True, the elements are peptide-like strings rather than integers.
+    :return: A list of lists (the samples).
+    """
+    signatures = make_signatures(n_samples, n_elements, overlap=overlap, seed=seed)
+    elements = [f'PEP{j:09d}' for j in range(n_elements)] if strings else range(n_elements)
+    samples = [[] for _ in range(n_samples)]
+    for element, signature in zip(elements, signatures):
+        i = 0
+        while signature:
+            if signature & 1:
+                samples[i].append(element)
+            signature >>= 1
+            i += 1
+    return samples
+
+
+def make_names(n_samples: int) -> List[str]:
+    """
+    :param n_samples: The number of samples.
+    :return: Sample names of the form "sample_1", "sample_2", ...
+    """
+    return [f'sample_{i + 1}' for i in range(n_samples)]
+
+
+def make_secondary_data(samples: List[List], seed: int = 0) -> Dict:
+    """
+    Generate a value for every element, e.g. a score to show in a secondary plot.
+    :param samples: The samples, as returned by make_samples.
+    :param seed: Seed for the random number generator.
+    :return: A dictionary mapping each element to a float.
+    """
+    rng = random.Random(seed)
+    elements = sorted(set().union(*samples))
+    return {element: rng.gauss(0, 1) for element in elements}
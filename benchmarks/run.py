@@ -0,0 +1,190 @@
+"""
+Run the benchmarks in benchmarks/bench_upsetplotly.py without asv, and optionally compare them to a baseline.
+
+    python -m benchmarks.run --output baseline.json
+    python -m benchmarks.run --compare baseline.json
+
+Each time_* method is run up to --repeat times (fewer if a single run is slow) and the fastest run is reported. The
+results are written as JSON together with the versions they were measured with, so a results file from one version of
+UpSetPlotly can be used as the baseline for another. Note that timings are only comparable on the same machine and at
+the same --scale, so no baseline is shipped: record one from the version to compare against, e.g. in a git worktree.
+"""
+from typing import Dict, List
+import argparse
+import datetime
+import gc
+import importlib
+import inspect
+import itertools
+import json
+import os
+import platform
+import re
+import subprocess
+import sys
+import time
+
+# a single run longer than this is not repeated
+MAX_REPEAT_TIME = 10.0
+
+
+def benchmark_name(cls_name: str, method: str, param_names: List[str], params: tuple) -> str:
+    args = ', '.join(f'{name}={value}' for name, value in zip(param_names, params))
+    return f'{cls_name}.{method}({args})'
+
+
+def time_call(func, args: tuple, repeat: int) -> float:
+    """
+    Time a function the way timeit does (with garbage collection turned off), returning the fastest of several runs.
+    """
+    best = None
+    for _ in range(repeat):
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            start = time.perf_counter()
+            func(*args)
+            elapsed = time.perf_counter() - start
+        finally:
+            if gc_enabled:
+                gc.enable()
+        best = elapsed if best is None else min(best, elapsed)
+        if elapsed > MAX_REPEAT_TIME:
+            break
+    return best
+
+
+def run_benchmarks(module, pattern: str = None, repeat: int = 3, verbose: bool = True) -> Dict[str, Dict]:
+    """
+    Run every benchmark of a module.
+    :param module: A module with asv-style benchmark classes.
+    :param pattern: If given, only benchmarks whose name matches this regular expression are run.
+    :param repeat: The maximum number of times each time_* method is run.
+    :param verbose: Whether or not to print the results as they come in.
+    :return: A dictionary mapping benchmark names to {'params': {...}, 'value': value, 'unit': unit}.
+    """
+    results = {}
+    for cls_name, cls in inspect.getmembers(module, inspect.isclass):
+        if cls.__module__ != module.__name__:
+            continue
+        methods = [m for m in dir(cls) if m.startswith('time_') or m.startswith('track_')]
+        param_names = list(getattr(cls, 'param_names', []))
+        for params in itertools.product(*getattr(cls, 'params', ())):
+            names = {m: benchmark_name(cls_name, m, param_names, params) for m in methods}
+            if pattern:
+                names = {m: name for m, name in names.items() if re.search(pattern, name)}
+            if not names:
+                continue
+            instance = cls()
+            try:
+                if hasattr(instance, 'setup'):
+                    instance.setup(*params)
+            except NotImplementedError:
+                # asv convention: the benchmark does not apply to these parameters
+                continue
+            for method, name in names.items():
+                func = getattr(instance, method)
+                if method.startswith('time_'):
+                    value, unit = time_call(func, params, repeat), 's'
+                else:
+                    value, unit = func(*params), getattr(func, 'unit', 'unit')
+                results[name] = {'params': dict(zip(param_names, map(str, params))), 'value': value, 'unit': unit}
+                if verbose:
+                    print(f'{name:<90} {format_value(value, unit)}', flush=True)
+            if hasattr(instance, 'teardown'):
+                instance.teardown(*params)
+    return results
+
+
+def format_value(value: float, unit: str) -> str:
+    if unit == 's':
+        for factor, suffix in ((1e-6, 'us'), (1e-3, 'ms')):
+            if value < factor * 1000:
+                return f'{value / factor:.2f} {suffix}'
+        return f'{value:.2f} s'
+    return f'{value} {unit}'
+
+
+def environment_info(scale: str) -> Dict[str, str]:
+    import upsetplotly
+    import plotly
+    info = {'upsetplotly': upsetplotly.__version__, 'plotly': plotly.__version__, 'python': platform.python_version(),
+            'platform': platform.platform(), 'cpu_count': str(os.cpu_count()), 'scale': scale,
+            'date': datetime.datetime.now().isoformat(timespec='seconds')}
+    try:
+        import numpy
+        info['numpy'] = numpy.__version__
+    except ImportError:
+        pass
+    try:
+        info['commit'] = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                        cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        pass
+    return info
+
+
+def compare(results: Dict[str, Dict], baseline: Dict[str, Dict], tolerance: float) -> List[str]:
+    """
+    Print how the results compare to a baseline.
+    :param results: The results of run_benchmarks.
+    :param baseline: The results of an earlier run.
+    :param tolerance: How much larger a value may get before it counts as a regression, e.g. 0.25 for 25%.
+    :return: The names of the benchmarks which regressed.
+    """
+    regressions = []
+    missing = 0
+    print(f'\n{"benchmark":<90} {"baseline":>12} {"current":>12} {"ratio":>7}')
+    for name, result in results.items():
+        if name not in baseline:
+            missing += 1
+            continue
+        old, new = baseline[name]['value'], result['value']
+        ratio = new / old if old else float('inf') if new else 1.0
+        flag = ''
+        if ratio > 1 + tolerance:
+            flag = '  REGRESSION'
+            regressions.append(name)
+        elif ratio < 1 / (1 + tolerance):
+            flag = '  improved'
+        print(f'{name:<90} {format_value(old, result["unit"]):>12} {format_value(new, result["unit"]):>12} '
+              f'{ratio:>7.2f}{flag}')
+    if missing:
+        print(f'\n{missing} of {len(results)} benchmarks are not in the baseline and were not compared.')
+    return regressions
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description='Run the UpSetPlotly benchmarks.')
+    parser.add_argument('--scale', choices=['quick', 'default', 'full'], default='default',
+                        help='The size of the parameter grid.')
+    parser.add_argument('--filter', default=None, help='Only run benchmarks whose name matches this regex.')
+    parser.add_argument('--repeat', type=int, default=3, help='The maximum number of runs per timing.')
+    parser.add_argument('--output', default=None, help='Write the results to this JSON file.')
+    parser.add_argument('--compare', default=None, help='A results file to compare against.')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='The relative slowdown reported as a regression when comparing.')
+    args = parser.parse_args(argv)
+
+    # the parameter grid is read when the benchmark module is imported
+    os.environ['UPSETPLOTLY_BENCH_SCALE'] = args.scale
+    module = importlib.import_module('benchmarks.bench_upsetplotly')
+    results = run_benchmarks(module, pattern=args.filter, repeat=args.repeat)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'environment': environment_info(args.scale), 'results': results}, f, indent=1)
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        print('\nbaseline environment: ' + ', '.join(f'{k}={v}' for k, v in baseline['environment'].items()))
+        if baseline['environment'].get('scale') != args.scale:
+            print(f'warning: the baseline was measured with --scale {baseline["environment"].get("scale")}, so only '
+                  f'the benchmarks shared with --scale {args.scale} are compared.')
+        if compare(results, baseline['results'], args.tolerance):
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
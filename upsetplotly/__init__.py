@@ -1,3 +1,4 @@
-from upsetplotly.plotting import UpSetPlotly
+from upsetplotly.core import UpSetPlotly
+from upsetplotly.profiling import Profiler
 
 __version__ = '0.1.7'
@@ -0,0 +1,109 @@
+from typing import List, Dict, Iterable, Union
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+import plotly.graph_objs as go
+from upsetplotly.plotting import UpSetPlotly, master_figure
+from upsetplotly.profiling import stage
+
+OUTPUTS = ['figure', 'json', 'html']
+
+# the keys a job may have besides 'secondary_plots', 'plot' and 'name', which are passed to UpSetPlotly
+_INIT_KEYS = {'samples', 'sample_names', 'backend', 'compact', 'keep_elements'}
+
+# the jobs being rendered by plot_batch. the worker processes are forked, so they inherit these instead of having every
+# sample pickled and sent to them.
+_shared_jobs = None
+
+
+def _check_job(job: Dict) -> None:
+    unknown = set(job) - _INIT_KEYS - {'secondary_plots', 'plot', 'name'}
+    if unknown:
+        raise ValueError(f'Unknown job keys: {", ".join(sorted(unknown))}')
+    if 'samples' not in job:
+        raise ValueError('Every job needs "samples".')
+    if 'show_fig' in job.get('plot', {}) or 'return_fig' in job.get('plot', {}):
+        raise ValueError('show_fig and return_fig cannot be set for a batch job.')
+
+
+def render_job(job: Dict, output: str = 'figure', path: str = None) -> Union[go.Figure, str]:
+    """
+    Compute the intersections and build the figure for a single job. See plot_batch.
+    :param job: A dictionary describing the plot.
+    :param output: What to return. Must be one of {figure, json, html}.
+    :param path: If given, the JSON or HTML is written to this file instead of being returned.
+    :return: The figure, its JSON or an HTML fragment, or the path it was written to.
+    """
+    usp = UpSetPlotly(n_jobs=1, **{key: value for key, value in job.items() if key in _INIT_KEYS})
+    for secondary_plot in job.get('secondary_plots', []):
+        usp.add_secondary_plot(**secondary_plot)
+    fig = usp.plot(show_fig=False, return_fig=True, use_cache=False, **job.get('plot', {}))
+    if output == 'figure':
+        return fig
+    if output == 'json':
+        text = fig.to_json()
+    else:
+        text = fig.to_html(full_html=False, include_plotlyjs=False)
+    if path is None:
+        return text
+    with open(path, 'w') as f:
+        f.write(text)
+    return path
+
+
+def _render_shared_job(index: int, output: str, path: str) -> Union[go.Figure, str]:
+    return render_job(_shared_jobs[index], output=output, path=path)
+
+
+def plot_batch(jobs: Iterable[Dict], n_jobs: int = -1, output: str = 'figure',
+               output_dir: str = None) -> List[Union[go.Figure, str]]:
+    """
+    Build many UpSet plots at once, e.g. one per allele group or condition of a report. The jobs are rendered in
+    parallel by a pool of processes, each of which computes the intersections and builds the figure of a job. The
+    subplot layout of every distinct shape of plot (number of samples and secondary plots) is built once, up front, and
+    shared by all workers.
+    :param jobs: Dictionaries describing the plots. Each one must have 'samples', and may have 'sample_names',
+    'backend', 'compact' and 'keep_elements', which are passed to UpSetPlotly. 'secondary_plots' is a list of
+    dictionaries of keyword arguments for UpSetPlotly.add_secondary_plot, 'plot' is a dictionary of keyword arguments
+    for UpSetPlotly.plot (e.g. order_by or max_intersections) and 'name' names the output file.
+    :param n_jobs: The number of processes to use. -1 means one per CPU. Worker processes are forked, so if the
+    platform does not support forking the jobs are rendered in this process.
+    :param output: What to produce for each job. Must be one of {figure, json, html}. "html" gives a fragment (a div
+    without plotly.js) which can be embedded in a report which loads plotly.js once.
+    :param output_dir: If given, the JSON or HTML of each job is written to "<output_dir>/<name>.<json|html>" and the
+    paths are returned. Jobs without a name are named by their position.
+    :return: A list with the figure, JSON, HTML or file path of each job, in the order of the jobs.
+    """
+    global _shared_jobs
+    if output not in OUTPUTS:
+        raise ValueError('output must be one of {figure, json, html}')
+    if output_dir is not None and output == 'figure':
+        raise ValueError('output must be "json" or "html" to write the plots to output_dir.')
+    if n_jobs == -1 or n_jobs is None:
+        n_jobs = os.cpu_count() or 1
+    if n_jobs < 1:
+        raise ValueError('n_jobs must be a positive integer or -1.')
+
+    jobs = list(jobs)
+    for job in jobs:
+        _check_job(job)
+    paths = [None] * len(jobs)
+    if output_dir is not None:
+        os.makedirs(output_dir, exist_ok=True)
+        paths = [os.path.join(output_dir, f'{job.get("name", i)}.{output}') for i, job in enumerate(jobs)]
+
+    with stage('batch', n_items=len(jobs)):
+        # build the layouts before forking, so the workers inherit them rather than each building their own
+        for job in jobs:
+            master_figure(len(job['samples']), 2 + len(job.get('secondary_plots', [])))
+
+        n_jobs = min(n_jobs, len(jobs))
+        if n_jobs <= 1 or 'fork' not in multiprocessing.get_all_start_methods():
+            return [render_job(job, output=output, path=path) for job, path in zip(jobs, paths)]
+
+        _shared_jobs = jobs
+        try:
+            with ProcessPoolExecutor(max_workers=n_jobs, mp_context=multiprocessing.get_context('fork')) as executor:
+                return list(executor.map(_render_shared_job, range(len(jobs)), [output] * len(jobs), paths))
+        finally:
+            _shared_jobs = None
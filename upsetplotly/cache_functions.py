@@ -0,0 +1,209 @@
+from typing import List, Set, Union, Dict, Tuple, Iterable, Callable, Optional
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import numpy as np
+from upsetplotly.numpy_functions import _as_array, _NUMERIC_KINDS, _TEXT_KINDS, compact_signatures, _slice_groups, \
+    _mix
+from upsetplotly.set_functions import signature_order_key
+
+# bump this whenever the layout of the cache changes, so old entries are never read
+CACHE_VERSION = 1
+
+# an entry of the cache is a directory holding these files. signatures.npy has one row of little-endian bytes per
+# signature, counts.npy the number of elements having each signature and elements.npy (if the elements were kept) all
+# elements, sorted by signature, so the elements of signature i start at the sum of the first i counts.
+_META = 'meta.json'
+_SIGNATURES = 'signatures.npy'
+_COUNTS = 'counts.npy'
+_ELEMENTS = 'elements.npy'
+
+
+def _hash_params(h, params: Dict) -> None:
+    h.update(json.dumps([CACHE_VERSION, params], sort_keys=True, default=str).encode())
+
+
+def _element_hashes(arr: np.ndarray) -> np.ndarray:
+    """
+    Hash every element of an array with a native (numeric or text) dtype to a 64 bit integer, from its bytes.
+    """
+    n_words = (arr.dtype.itemsize + 7) // 8
+    raw = np.zeros((len(arr), n_words * 8), dtype=np.uint8)
+    raw[:, :arr.dtype.itemsize] = np.ascontiguousarray(arr).view(np.uint8).reshape(len(arr), arr.dtype.itemsize)
+    words = raw.view('<u8')
+    hashes = np.full(len(arr), n_words, dtype=np.uint64)
+    for i in range(n_words):
+        hashes = _mix(hashes ^ words[:, i])
+    return hashes
+
+
+def hash_samples(samples: Iterable[Iterable], sample_names: List[str], **params) -> str:
+    """
+    Compute a content hash of a list of samples. The order of the elements within a sample does not change the hash,
+    so a list and a set of the same elements hash the same. Numbers and strings are hashed with vectorized operations,
+    which is several times faster than finding the intersections. Other elements are hashed by their repr.
+    :param samples: A list of lists, sets or arrays (the samples).
+    :param sample_names: The names of the samples.
+    :param params: Anything else which changes the result computed from the samples, e.g. keep_elements.
+    :return: A hexadecimal digest.
+    """
+    h = hashlib.blake2b(digest_size=20)
+    _hash_params(h, {'sample_names': list(sample_names), 'params': params})
+    for sample in samples:
+        arr = _as_array(sample)
+        if arr.dtype.kind in _NUMERIC_KINDS or arr.dtype.kind in _TEXT_KINDS:
+            # summing the hashes of the elements makes the result independent of their order. two differently seeded
+            # sums give 128 bits.
+            hashes = _element_hashes(arr)
+            total = int(hashes.sum(dtype=np.uint64))
+            other = int(_mix(hashes ^ np.uint64(0x9e3779b97f4a7c15)).sum(dtype=np.uint64))
+            h.update(f'{arr.dtype.str}:{len(arr)}:{total}:{other};'.encode())
+        else:
+            items = sorted(repr(x) for x in arr.tolist())
+            h.update(f'object:{len(items)}:'.encode())
+            h.update('\0'.join(items).encode())
+    return h.hexdigest()
+
+
+def hash_file(path: str, **params) -> str:
+    """
+    Compute a content hash of a file.
+    :param path: The path to the file.
+    :param params: Anything else which changes the result computed from the file, e.g. the columns which are read.
+    :return: A hexadecimal digest.
+    """
+    h = hashlib.blake2b(digest_size=20)
+    _hash_params(h, params)
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+def save_signatures(directory: str, signatures: Dict[int, Union[Set, int, np.ndarray]],
+                    sample_names: List[str]) -> Tuple[Dict[int, Union[np.ndarray, int]], Optional[np.ndarray]]:
+    """
+    Save membership signatures to a directory. The directory is written in one go, so a reader never sees a partially
+    written entry.
+    :param directory: The directory to create.
+    :param signatures: A dictionary mapping signatures to collections of elements, or to numbers of elements.
+    :param sample_names: The names of the samples. Bit i of the signatures refers to sample_names[i].
+    :return: A tuple of (the signatures, with each group a view of the saved array of elements, the saved array of
+    elements). If only the numbers of elements were given, they are returned as they are, with None for the array.
+    """
+    keep_elements = not any(isinstance(x, int) for x in signatures.values())
+    elements = None
+    if keep_elements:
+        # this also puts the signatures in name order, which is the order they are saved in
+        elements, signatures = compact_signatures(signatures)
+    order = sorted(signatures, key=signature_order_key)
+    n_bytes = max(1, (len(sample_names) + 7) // 8)
+    packed = np.frombuffer(b''.join(x.to_bytes(n_bytes, 'little') for x in order), dtype=np.uint8)
+    counts = np.array([len(signatures[x]) if keep_elements else signatures[x] for x in order], dtype=np.int64)
+
+    parent = os.path.dirname(os.path.abspath(directory))
+    os.makedirs(parent, exist_ok=True)
+    temp = tempfile.mkdtemp(dir=parent, prefix='.tmp-')
+    try:
+        np.save(os.path.join(temp, _SIGNATURES), packed.reshape(len(order), n_bytes))
+        np.save(os.path.join(temp, _COUNTS), counts)
+        if keep_elements:
+            np.save(os.path.join(temp, _ELEMENTS), elements, allow_pickle=True)
+        with open(os.path.join(temp, _META), 'w') as f:
+            json.dump({'version': CACHE_VERSION, 'sample_names': list(sample_names), 'keep_elements': keep_elements},
+                      f)
+        try:
+            os.rename(temp, directory)
+        except OSError:
+            # another process saved the same entry first
+            shutil.rmtree(temp, ignore_errors=True)
+    except BaseException:
+        shutil.rmtree(temp, ignore_errors=True)
+        raise
+    return signatures, elements
+
+
+def load_signatures(directory: str, mmap: bool = True,
+                    allow_pickle: bool = False) -> Tuple[List[str], Dict[int, Union[np.ndarray, int]],
+                                                         Optional[np.ndarray]]:
+    """
+    Load membership signatures saved by save_signatures.
+    :param directory: The directory of the entry.
+    :param mmap: Whether or not to memory-map the elements rather than read them. Memory-mapped elements are only read
+    from disk when they are used. Elements which are not numbers or strings are always read.
+    :param allow_pickle: Whether or not to load elements which are not numbers or strings (e.g. tuples, or a mixture of
+    types). They are saved with pickle, and unpickling a file can run arbitrary code, so only allow this if no one else
+    can write to the directory. If False, a ValueError is raised for such an entry.
+    :return: A tuple of (the sample names, a dictionary mapping each signature to a view of the array of elements or to
+    a number of elements, the array of elements or None if the elements were not kept).
+    """
+    with open(os.path.join(directory, _META)) as f:
+        meta = json.load(f)
+    if meta['version'] != CACHE_VERSION:
+        raise ValueError(f'{directory} was saved by an incompatible version of UpSetPlotly.')
+    packed = np.load(os.path.join(directory, _SIGNATURES))
+    counts = np.load(os.path.join(directory, _COUNTS)).tolist()
+    order = [int.from_bytes(row.tobytes(), 'little') for row in packed]
+    if not meta['keep_elements']:
+        return meta['sample_names'], dict(zip(order, counts)), None
+
+    path = os.path.join(directory, _ELEMENTS)
+    if _holds_objects(path):
+        if not allow_pickle:
+            raise ValueError(f'The elements in {directory} are pickled python objects, which are only loaded with '
+                             'allow_pickle=True.')
+        # object arrays cannot be memory-mapped
+        elements = np.load(path, allow_pickle=True)
+    else:
+        elements = np.load(path, mmap_mode='r' if mmap else None)
+    return meta['sample_names'], _slice_groups(elements, order, counts), elements
+
+
+def _holds_objects(path: str) -> bool:
+    """
+    Whether or not a .npy file holds an object array, from its header alone, so nothing is unpickled.
+    """
+    with open(path, 'rb') as f:
+        version = np.lib.format.read_magic(f)
+        if version == (1, 0):
+            dtype = np.lib.format.read_array_header_1_0(f)[2]
+        else:
+            dtype = np.lib.format.read_array_header_2_0(f)[2]
+    return dtype.hasobject
+
+
+def is_cached(cache_dir: str, key: str) -> bool:
+    """
+    :param cache_dir: The directory holding the cache.
+    :param key: The key of the entry.
+    :return: Whether or not the cache has an entry for the key.
+    """
+    return os.path.exists(os.path.join(cache_dir, key, _META))
+
+
+def cached_signatures(cache_dir: str, key: str, compute: Callable[[], Tuple[List[str], Dict]], mmap: bool = True,
+                      allow_pickle: bool = False) -> Tuple[List[str], Dict[int, Union[np.ndarray, int]],
+                                                           Optional[np.ndarray]]:
+    """
+    Load membership signatures from a cache, computing and saving them first if they are not there yet.
+    :param cache_dir: The directory holding the cache. Each entry is a subdirectory named by its key.
+    :param key: The key of the entry, e.g. from hash_samples or hash_file.
+    :param compute: A function returning (the sample names, the signatures), called if the entry does not exist.
+    :param mmap: Whether or not to memory-map the elements of an existing entry. See load_signatures.
+    :param allow_pickle: Whether or not to load pickled elements (anything but numbers and strings) from an existing
+    entry. See load_signatures. If False, such an entry is computed again instead of being loaded.
+    :return: A tuple of (the sample names, a dictionary mapping each signature to a view of the array of elements or to
+    a number of elements, the array of elements or None if the elements were not kept).
+    """
+    directory = os.path.join(cache_dir, key)
+    if is_cached(cache_dir, key):
+        pickled = os.path.exists(os.path.join(directory, _ELEMENTS)) and \
+            _holds_objects(os.path.join(directory, _ELEMENTS))
+        if allow_pickle or not pickled:
+            return load_signatures(directory, mmap=mmap, allow_pickle=allow_pickle)
+    sample_names, signatures = compute()
+    # an existing entry is left as it is
+    signatures, elements = save_signatures(directory, signatures, sample_names)
+    return list(sample_names), signatures, elements
@@ -0,0 +1,794 @@
+from typing import List, Dict, Tuple, Iterable, Optional, Union, Set, TYPE_CHECKING
+import itertools
+import numbers
+from collections import OrderedDict
+from upsetplotly.set_functions import get_membership_signatures, intersections_from_signatures, \
+    order_sample_intersections, get_sample_sizes, cached_membership_signatures, import_cache_functions, \
+    import_sketch_functions, signature_to_samples, samples_to_signature, signature_order_key, \
+    get_membership_signatures_parallel
+from upsetplotly.profiling import stage
+
+# plotly is slow to import, so it is only imported (by upsetplotly.plotting) once a figure is built. everything else,
+# e.g. computing and filtering the intersections, works without it. io_functions is also only imported when needed.
+if TYPE_CHECKING:
+    import numpy as np
+    import plotly.graph_objs as go
+    from upsetplotly.sketch_functions import SampleSketch
+
+
+class UpSetPlotly:
+    def __init__(self, samples: List[Iterable], sample_names: List[str] = None, backend: str = 'python',
+                 n_jobs: int = 1, compact: bool = False, keep_elements: bool = True, cache_dir: str = None,
+                 sketch_size: int = None, allow_pickle: bool = False, memory_budget: int = None,
+                 temp_dir: str = None):
+        """
+        :param samples: A list of iterables (the samples) whose intersections will be plotted.
+        :param sample_names: Names for the respective samples. If None, sequential integers will be used.
+        :param backend: The implementation used to find the intersections. Must be one of {python, numpy, disk}. The
+        numpy backend requires numpy and is several times faster for large samples of numbers (strings take about as
+        long as with the python backend). The disk backend keeps the elements in temporary files while the
+        intersections are found.
+        :param n_jobs: The number of processes used to find the intersections. -1 means one per CPU.
+        :param compact: If True, every element is stored once in a single numpy array (self.elements) which is sorted
+        by intersection, and the elements of each intersection are views of that array. Requires numpy.
+        :param keep_elements: If False, only the size of each intersection is kept. This uses far less memory, but
+        secondary plots and updates to the samples are then not possible.
+        :param cache_dir: If given, the intersections are saved in this directory, keyed by a hash of the samples and
+        sample names, and loaded from it (memory-mapped, so only the elements which are used are read) when the same
+        samples are seen again. The elements are then stored as if compact were True. Requires numpy.
+        :param sketch_size: If given, the sizes of the intersections are estimated from a sketch of this many hashes per
+        sample rather than computed exactly, which takes constant memory per sample. The elements are not kept, and the
+        bars show error bars (see count_bounds). backend, n_jobs, compact, keep_elements, cache_dir, memory_budget and
+        temp_dir are ignored.
+        Requires numpy. See also from_sketches.
+        :param allow_pickle: Whether or not elements which are not numbers or strings (e.g. tuples, or a mixture of
+        types) may be loaded from cache_dir. They are pickled, and unpickling a file can run arbitrary code, so only
+        allow this if no one else can write to cache_dir. If False, such intersections are computed again instead.
+        :param memory_budget: For the disk backend, the approximate number of bytes to use for buffers and for each
+        partition while the intersections are found. See set_functions.get_membership_signatures.
+        :param temp_dir: For the disk backend, the directory in which the partitions are created. If None, the system
+        default is used.
+        """
+
+        if sample_names:
+            if not len(samples) == len(sample_names):
+                raise ValueError('the length of samples and sample_names must be equal.')
+        else:
+            # if there are no names provided, use sequential integers starting at 1
+            sample_names = [str(x) for x in range(1, len(samples) + 1)]
+
+        if sketch_size is not None:
+            sketch_functions = import_sketch_functions()
+            with stage('sketch', k=sketch_size) as info:
+                signatures, count_bounds, _ = sketch_functions.sketch_signatures(samples, k=sketch_size)
+                info['n_items'] = len(signatures)
+            self._setup(signatures, sample_names)
+            self.count_bounds = count_bounds
+        elif cache_dir is not None:
+            signatures, elements = cached_membership_signatures(samples, sample_names, cache_dir, backend=backend,
+                                                                n_jobs=n_jobs, keep_elements=keep_elements,
+                                                                allow_pickle=allow_pickle, memory_budget=memory_budget,
+                                                                temp_dir=temp_dir)
+            self._setup(signatures, sample_names, elements=elements)
+        elif compact and keep_elements and backend == 'numpy' and memory_budget is None and temp_dir is None:
+            from upsetplotly import numpy_functions
+            with stage('signatures', backend=backend, n_jobs=n_jobs) as info:
+                if n_jobs == 1:
+                    elements, signatures = numpy_functions.get_compact_signatures(samples)
+                else:
+                    elements, signatures = get_membership_signatures_parallel(samples, backend=backend, n_jobs=n_jobs,
+                                                                              compact=True)
+                info['n_items'] = len(signatures)
+            self._setup(signatures, sample_names, elements=elements)
+        else:
+            # only the intersections which actually occur are computed, empty ones are never created
+            signatures = get_membership_signatures(samples, backend=backend, n_jobs=n_jobs,
+                                                   keep_elements=keep_elements, memory_budget=memory_budget,
+                                                   temp_dir=temp_dir)
+            self._setup(signatures, sample_names, compact=compact)
+
+    def _setup(self, signatures: Dict[int, Union[Set, int]], sample_names: List[str], compact: bool = False,
+               elements=None) -> None:
+        """
+        Set up the object from the signature groups of the samples.
+        """
+        self.sample_names = list(sample_names)
+        self.keep_elements = not any(isinstance(x, int) for x in signatures.values())
+        # the elements are only held by their signature groups, which do not overlap, so each is stored once
+        self.elements = elements
+        if compact and self.keep_elements and elements is None:
+            from upsetplotly import numpy_functions
+            self.elements, signatures = numpy_functions.compact_signatures(signatures)
+        self.signatures = signatures
+        # the (lower bound, upper bound) of the size of each intersection, if the sizes are estimates
+        self.count_bounds: Optional[Dict[int, Tuple[float, float]]] = None
+        self._element_signatures: Optional[Dict] = None
+        self._intersections: Optional[List[Dict]] = None
+        # filtered/ordered intersections and finished figures, keyed by the plot parameters. see clear_cache.
+        self.cache_size = 16
+        self._view_cache = OrderedDict()
+        self._figure_cache = OrderedDict()
+        self.n_plotted_intersections: int = 0
+        self.n_rows = 2
+        self.additional_data = []
+        self.fig: Optional['go.Figure'] = None
+        # the last figure converted to JSON by plot_patch, and its JSON, so it is only converted once
+        self._fig_json: Optional[Tuple['go.Figure', Dict]] = None
+
+    @classmethod
+    def from_signatures(cls, signatures: Dict[int, Union[Set, int]], sample_names: List[str],
+                        compact: bool = False) -> 'UpSetPlotly':
+        """
+        Create an UpSetPlotly object from precomputed membership signatures.
+        :param signatures: A dictionary mapping signatures to sets of elements, or to numbers of elements, as returned
+        by upsetplotly.set_functions.get_membership_signatures. Bit i of the signatures refers to sample_names[i].
+        :param sample_names: The names of the samples.
+        :param compact: If True, store the elements in a single numpy array. See __init__.
+        :return: An UpSetPlotly object.
+        """
+        usp = cls.__new__(cls)
+        usp._setup(signatures, sample_names, compact=compact)
+        return usp
+
+    @classmethod
+    def from_sketches(cls, sketches: List['SampleSketch'], sample_names: List[str] = None,
+                      n_std: float = 2.0) -> 'UpSetPlotly':
+        """
+        Create an UpSetPlotly object from sketches of the samples, with estimated intersection sizes. Sketches take
+        constant memory, can be updated as elements arrive and can be merged, e.g. when each node of a cluster sketches
+        its part of the samples. Only the sizes of the intersections are kept.
+        :param sketches: A sketch of each sample (upsetplotly.sketch_functions.SampleSketch), all with the same seed.
+        :param sample_names: Names for the respective samples. If None, sequential integers will be used.
+        :param n_std: The number of standard deviations the error bars are apart from the estimates. 2 gives error bars
+        which hold about 95% of the time.
+        :return: An UpSetPlotly object.
+        """
+        if sample_names:
+            if not len(sketches) == len(sample_names):
+                raise ValueError('the length of sketches and sample_names must be equal.')
+        else:
+            sample_names = [str(x) for x in range(1, len(sketches) + 1)]
+        sketch_functions = import_sketch_functions()
+        with stage('sketch', k=min((x.k for x in sketches), default=0)) as info:
+            signatures, count_bounds, _ = sketch_functions.estimate_signatures(sketches, n_std=n_std)
+            info['n_items'] = len(signatures)
+        usp = cls.__new__(cls)
+        usp._setup(signatures, sample_names)
+        usp.count_bounds = count_bounds
+        return usp
+
+    @classmethod
+    def from_pairs(cls, pairs: Iterable[Tuple], sample_names: List[str] = None, compact: bool = False,
+                   keep_elements: bool = True, chunksize: int = 100000, memory_budget: int = None) -> 'UpSetPlotly':
+        """
+        Create an UpSetPlotly object from long-format data, i.e. (element, sample name) pairs. The pairs are consumed
+        in chunks and go straight into the membership signatures without building a list for each sample.
+        :param pairs: An iterable of (element, sample name) pairs.
+        :param sample_names: The names of the samples, which sets their order. If None, the samples are ordered by
+        their first appearance.
+        :param compact: If True, store the elements in a single numpy array. See __init__.
+        :param keep_elements: If False, only the size of each intersection is kept. See __init__.
+        :param chunksize: The number of pairs processed at a time.
+        :param memory_budget: If given, the pairs are spilled into partitions on disk so that roughly this many bytes
+        are used while the intersections are found. See io_functions.signatures_out_of_core.
+        :return: An UpSetPlotly object.
+        """
+        from upsetplotly.io_functions import signatures_from_pairs
+        sample_names, signatures = signatures_from_pairs(pairs, sample_names=sample_names,
+                                                         keep_elements=keep_elements, chunksize=chunksize,
+                                                         memory_budget=memory_budget)
+        return cls.from_signatures(signatures, sample_names, compact=compact)
+
+    @classmethod
+    def from_file(cls, path: str, sep: str = '\t', element_column: int = 0, sample_column: int = 1,
+                  header: bool = False, sample_names: List[str] = None, compact: bool = False,
+                  keep_elements: bool = True, chunksize: int = 100000, memory_budget: int = None,
+                  cache_dir: str = None) -> 'UpSetPlotly':
+        """
+        Create an UpSetPlotly object from a delimited text file of (element, sample name) pairs, one pair per row. The
+        file is read in chunks, so it never has to fit in memory. Elements are read as strings.
+        :param path: The path to the file. Files ending in ".gz" are decompressed.
+        :param sep: The column delimiter.
+        :param element_column: The index of the column holding the elements.
+        :param sample_column: The index of the column holding the sample names.
+        :param header: Whether or not the first row is a header.
+        :param sample_names: The names of the samples, which sets their order. If None, the samples are ordered by
+        their first appearance.
+        :param compact: If True, store the elements in a single numpy array. See __init__.
+        :param keep_elements: If False, only the size of each intersection is kept. See __init__.
+        :param chunksize: The number of rows read at a time.
+        :param memory_budget: If given, the file is spilled into partitions on disk so that roughly this many bytes
+        are used while the intersections are found. See io_functions.signatures_out_of_core.
+        :param cache_dir: If given, the intersections are saved in this directory, keyed by a hash of the file and the
+        parameters which affect how it is read, and loaded from it when the same file is read again. See __init__.
+        :return: An UpSetPlotly object.
+        """
+        from upsetplotly.io_functions import signatures_from_file
+
+        def compute():
+            return signatures_from_file(path, sep=sep, element_column=element_column, sample_column=sample_column,
+                                        header=header, sample_names=sample_names, keep_elements=keep_elements,
+                                        chunksize=chunksize, memory_budget=memory_budget)
+
+        if cache_dir is None:
+            sample_names, signatures = compute()
+            return cls.from_signatures(signatures, sample_names, compact=compact)
+
+        cache_functions = import_cache_functions()
+        with stage('cache') as info:
+            key = cache_functions.hash_file(path, sep=sep, element_column=element_column, sample_column=sample_column,
+                                            header=header, sample_names=sample_names, keep_elements=keep_elements)
+            info['hit'] = cache_functions.is_cached(cache_dir, key)
+            sample_names, signatures, elements = cache_functions.cached_signatures(cache_dir, key, compute)
+        usp = cls.__new__(cls)
+        usp._setup(signatures, sample_names, elements=elements)
+        return usp
+
+    @classmethod
+    def from_membership_table(cls, table, sample_names: List[str] = None, element_column: int = 0,
+                              sep: str = '\t', compact: bool = False, keep_elements: bool = True,
+                              chunksize: int = 100000) -> 'UpSetPlotly':
+        """
+        Create an UpSetPlotly object from a wide membership table, with one row per element and one column per sample
+        indicating whether the element is in that sample (e.g. 1/0 or True/False).
+        :param table: The path to a delimited text file with a header row, a pandas DataFrame, or an iterable of rows.
+        For a file or DataFrame the sample names are taken from the column names.
+        :param sample_names: The names of the sample columns. Required if table is an iterable of rows.
+        :param element_column: The index of the column holding the elements. Every other column is a sample.
+        :param sep: The column delimiter, if table is a file.
+        :param compact: If True, store the elements in a single numpy array. See __init__.
+        :param keep_elements: If False, only the size of each intersection is kept. See __init__.
+        :param chunksize: The number of rows read at a time, if table is a file.
+        :return: An UpSetPlotly object.
+        """
+        from upsetplotly.io_functions import signatures_from_membership_table
+        sample_names, signatures = signatures_from_membership_table(table, sample_names=sample_names,
+                                                                    element_column=element_column, sep=sep,
+                                                                    keep_elements=keep_elements,
+                                                                    chunksize=chunksize)
+        return cls.from_signatures(signatures, sample_names, compact=compact)
+
+    @property
+    def intersections(self) -> List[Dict]:
+        """
+        All the non-empty intersections, in the same order as get_all_intersections.
+        """
+        if self._intersections is None:
+            self._intersections = list(intersections_from_signatures(self.signatures, self.sample_names))
+        return self._intersections
+
+    @property
+    def all_elements(self) -> Set:
+        """
+        The set of all unique elements. It is built from the intersections each time, so avoid it for large data.
+        """
+        self._check_elements_kept()
+        return set(itertools.chain.from_iterable(self.signatures.values()))
+
+    @property
+    def samples(self) -> List[Set]:
+        """
+        The samples as sets. They are built from the intersections each time, so avoid them for large data.
+        """
+        self._check_elements_kept()
+        samples = [set() for _ in self.sample_names]
+        for signature, elements in self.signatures.items():
+            for i in range(len(samples)):
+                if signature >> i & 1:
+                    samples[i].update(elements)
+        return samples
+
+    @property
+    def sample_data(self) -> Dict[str, Set]:
+        """
+        The samples as sets, keyed by sample name.
+        """
+        return dict(zip(self.sample_names, self.samples))
+
+    @property
+    def sample_sizes(self) -> Dict[str, int]:
+        """
+        The number of unique elements in each sample.
+        """
+        return dict(zip(self.sample_names, get_sample_sizes(self.signatures, len(self.sample_names))))
+
+    def add_sample(self, sample: Iterable, name: str = None) -> None:
+        """
+        Add a sample. The intersections are updated from the elements of the new sample only, so this is much faster
+        than creating a new UpSetPlotly object. Intersections obtained before the update are no longer valid.
+        :param sample: The elements of the new sample.
+        :param name: The name of the new sample. If None, the next sequential integer will be used.
+        :return: None
+        """
+        if name is None:
+            name = str(len(self.sample_names) + 1)
+        if name in self.sample_names:
+            raise ValueError(f'There is already a sample named {name}.')
+        self._thaw()
+        self.sample_names.append(name)
+        self._add_to_sample(len(self.sample_names) - 1, sample)
+
+    def add_elements(self, sample: str, elements: Iterable) -> None:
+        """
+        Add elements to an existing sample. Only the new elements are looked at to update the intersections.
+        Intersections obtained before the update are no longer valid.
+        :param sample: The name of the sample.
+        :param elements: The elements to add. Elements already in the sample are ignored.
+        :return: None
+        """
+        index = self._sample_index(sample)
+        self._thaw()
+        self._add_to_sample(index, elements)
+
+    def remove_sample(self, sample: str) -> None:
+        """
+        Remove a sample. The intersections are updated without looking at the elements of the other samples.
+        Intersections obtained before the update are no longer valid.
+        :param sample: The name of the sample to remove.
+        :return: None
+        """
+        index = self._sample_index(sample)
+        self._thaw()
+        del self.sample_names[index]
+
+        # drop the bit of the removed sample from every signature. two signatures which only differed by that bit now
+        # describe the same intersection, so merge them (the smaller group is never bigger than the removed sample).
+        low_bits = (1 << index) - 1
+        signatures = {}
+        for signature, elements in self.signatures.items():
+            new_signature = (signature >> (index + 1)) << index | (signature & low_bits)
+            if new_signature == 0:
+                # these elements were only found in the removed sample
+                continue
+            elif new_signature in signatures:
+                other = signatures[new_signature]
+                if len(other) < len(elements):
+                    other, elements = elements, other
+                other |= elements
+                signatures[new_signature] = other
+            else:
+                signatures[new_signature] = elements
+        self.signatures = signatures
+        # the signatures of most elements just changed, so the element index is rebuilt when it is next needed
+        self._element_signatures = None
+        self.clear_cache()
+
+    def clear_cache(self) -> None:
+        """
+        Forget the intersections and figures remembered from previous calls to plot. This is done automatically when
+        the samples or secondary plots change, but must be done by hand if the data of a secondary plot is modified.
+        :return: None
+        """
+        self._intersections = None
+        self._view_cache.clear()
+        self._figure_cache.clear()
+
+    def _cache_get(self, cache: OrderedDict, key: tuple):
+        if key in cache:
+            cache.move_to_end(key)
+            return cache[key]
+        return None
+
+    def _cache_put(self, cache: OrderedDict, key: tuple, value) -> None:
+        cache[key] = value
+        while len(cache) > self.cache_size:
+            cache.popitem(last=False)
+
+    def _sample_index(self, sample: str) -> int:
+        if sample not in self.sample_names:
+            raise ValueError(f'{sample} is not one of the sample names.')
+        return self.sample_names.index(sample)
+
+    def _check_elements_kept(self) -> None:
+        if not self.keep_elements:
+            raise ValueError('The elements were not kept (keep_elements=False), only the sizes of the intersections.')
+
+    def _thaw(self) -> None:
+        """
+        Prepare the signature groups to be modified. Compact groups are views of one shared array, which cannot grow,
+        so they are turned back into sets.
+        """
+        self._check_elements_kept()
+        if self.elements is not None:
+            # secondary data aligned to the array of elements has to be keyed by element once the array is gone
+            for entry in self.additional_data:
+                if entry['kind'] == 'aligned':
+                    entry['data'] = {element: value for element, value in zip(self.elements.tolist(),
+                                                                              entry['data'].tolist()) if value == value}
+                    entry['kind'] = 'dict'
+            self.signatures = {signature: set(elements.tolist()) for signature, elements in self.signatures.items()}
+            self.elements = None
+
+    def _get_element_signatures(self) -> Dict:
+        """
+        Get the index mapping every element to its signature. It is built on first use and then kept up to date by
+        add_sample and add_elements, so each update or query only touches the elements involved.
+        """
+        self._check_elements_kept()
+        if self._element_signatures is None:
+            self._element_signatures = {element: signature for signature, group in self.signatures.items()
+                                        for element in (group.tolist() if hasattr(group, 'tolist') else group)}
+        return self._element_signatures
+
+    def find_intersection(self, element) -> Optional[Tuple[str]]:
+        """
+        Find the intersection an element belongs to. The first query builds an index of all elements, after which
+        every lookup is O(1).
+        :param element: An element of the samples.
+        :return: The names of the samples the element is found in, i.e. the intersection it is unique to, or None if it
+        is not in any sample.
+        """
+        signature = self._get_element_signatures().get(element)
+        return None if signature is None else signature_to_samples(signature, self.sample_names)
+
+    def find_intersections(self, elements: Iterable) -> List[Optional[Tuple[str]]]:
+        """
+        Find the intersections of many elements. See find_intersection.
+        :param elements: Elements of the samples.
+        :return: A list with the names of the samples each element is found in, or None for elements which are not in
+        any sample.
+        """
+        element_signatures = self._get_element_signatures()
+        names = {}
+        out = []
+        for element in elements:
+            signature = element_signatures.get(element)
+            if signature is not None and signature not in names:
+                names[signature] = signature_to_samples(signature, self.sample_names)
+            out.append(None if signature is None else names[signature])
+        return out
+
+    def get_intersection_elements(self, intersection: Union[int, str, Iterable[str]]) -> Union[Set, Iterable]:
+        """
+        Get the elements unique to an intersection, without looking at any other intersection.
+        :param intersection: The names of the samples of the intersection, or its signature as an integer or a hex
+        string (e.g. "0x5"). The bars of the plot carry the signature of their intersection as a hex string in
+        customdata, so the customdata of a clicked bar can be passed directly.
+        :return: The elements of the intersection (a set, or a numpy array in compact mode). Empty if no element is
+        unique to the intersection.
+        """
+        self._check_elements_kept()
+        if isinstance(intersection, str) and intersection not in self.sample_names:
+            if not intersection.startswith('0x'):
+                raise ValueError(f'{intersection} is neither one of the sample names nor a hex signature.')
+            signature = int(intersection, 16)
+        elif isinstance(intersection, str):
+            signature = samples_to_signature([intersection], self.sample_names)
+        elif isinstance(intersection, numbers.Integral):
+            signature = int(intersection)
+        else:
+            signature = samples_to_signature(intersection, self.sample_names)
+        return self.signatures.get(signature, set())
+
+    def _secondary_values(self, entry: Dict, intersections: List[Dict]) -> List:
+        """
+        Get the values of a secondary plot for each of a list of intersections.
+        """
+        data = entry['data']
+        if entry['kind'] == 'aligned':
+            # the elements are sorted by intersection in the default (name) order, so each intersection is a slice
+            offsets = {}
+            start = 0
+            for signature in sorted(self.signatures, key=signature_order_key):
+                offsets[signature] = start
+                start += len(self.signatures[signature])
+            values = []
+            for x in intersections:
+                start = offsets[samples_to_signature(x['samples'], self.sample_names)]
+                values.append(data[start:start + x['n']])
+            if entry['ignore_missing']:
+                values = [v[v == v] for v in values]
+            return values
+        if entry['kind'] == 'series':
+            array = data.to_numpy()
+            values = []
+            for x in intersections:
+                positions = data.index.get_indexer(list(x['elements']))
+                values.append(array[positions[positions >= 0]] if entry['ignore_missing'] else array[positions])
+            return values
+        if entry['ignore_missing']:
+            return [[data[e] for e in x['elements'] if e in data] for x in intersections]
+        return [[data[e] for e in x['elements']] for x in intersections]
+
+    def _add_to_sample(self, index: int, elements: Iterable) -> None:
+        """
+        Move elements into the signature groups which include the sample at the given index.
+        """
+        bit = 1 << index
+        element_signatures = self._get_element_signatures()
+        for element in elements:
+            old_signature = element_signatures.get(element, 0)
+            if old_signature & bit:
+                continue
+            if old_signature:
+                group = self.signatures[old_signature]
+                group.discard(element)
+                if not group:
+                    del self.signatures[old_signature]
+            new_signature = old_signature | bit
+            if new_signature in self.signatures:
+                self.signatures[new_signature].add(element)
+            else:
+                self.signatures[new_signature] = {element}
+            element_signatures[element] = new_signature
+        self.clear_cache()
+
+    def add_secondary_plot(self, data, label: str, plot_type: str = 'box', aggregate: bool = False,
+                           max_points: int = None, ignore_missing: bool = False) -> None:
+        """
+        Add data to generate a secondary plot above the bar chart. Can be called more than once to add multiple plots.
+        :param data: The value of each element found in the sample sets. Either a dictionary or a pandas Series mapping
+        elements to values, or, in compact mode, a numpy array of values aligned to self.elements (NaN for missing
+        values). The values of an intersection are then a slice of the array, so nothing is copied or looked up.
+        :param label: The label to use in the plot.
+        :param plot_type:
+        :param aggregate: If True, all intersections are drawn in a single trace and box plots only contain precomputed
+        statistics rather than every value, which keeps large figures small. Swarm plots are drawn with WebGL.
+        Requires numpy.
+        :param max_points: The maximum number of values drawn per intersection in aggregated violin and swarm plots.
+        Larger intersections are randomly downsampled. If None, all values are drawn. Requires aggregate=True, since
+        plots which are not aggregated draw every value.
+        :param ignore_missing: If True, elements without a value are left out of the plot. Otherwise every element
+        must have a value.
+        :return: None
+        """
+        if plot_type not in ['box', 'violin', 'swarm']:
+            raise ValueError('plot_type must be one of {box, violin, swarm}')
+        check_max_points(max_points, aggregate)
+        self._check_elements_kept()
+        kind = 'dict'
+        if hasattr(data, 'index') and hasattr(data, 'to_numpy'):
+            # a pandas Series keyed by element. find the position of every element in it once, with vectorized lookups
+            kind = 'series'
+            if self.elements is not None:
+                data, kind = gather_series(data, self.elements), 'aligned'
+                missing = has_missing_values(data)
+            else:
+                missing = any((data.index.get_indexer(list(elements)) < 0).any()
+                              for elements in self.signatures.values())
+        elif hasattr(data, 'dtype') and hasattr(data, 'shape'):
+            if self.elements is None or len(data) != len(self.elements):
+                raise ValueError('An array of secondary data must have one value for each element of self.elements, '
+                                 'in the same order, which requires compact=True.')
+            kind = 'aligned'
+            missing = has_missing_values(data)
+        else:
+            missing = any(element not in data for elements in self.signatures.values() for element in elements)
+        if missing and not ignore_missing:
+            raise ValueError('There are elements in the provided samples which are missing in the secondary '
+                             'data to plot. Check the data or, to ignore the missing data and plot anyway, '
+                             'pass ignore_missing as True.')
+        self.additional_data.append({'type': plot_type, 'data': data, 'label': label, 'aggregate': aggregate,
+                                     'max_points': max_points, 'ignore_missing': ignore_missing, 'kind': kind})
+        self.n_rows += 1
+        self.clear_cache()
+
+    def get_plotted_intersections(self, intersection_limit: str = None, order_by: str = None,
+                                  max_intersections: int = None) -> List[Dict]:
+        """
+        Get the intersections which would be plotted with the given parameters. See plot for the parameters.
+        :return: A list of dictionaries of form {'samples': [samples], 'elements': [elements unique to these samples],
+        'n': [number of elements]}
+        """
+        if order_by:
+            if order_by not in ['increasing', 'decreasing']:
+                raise ValueError('order_by must be one of {increasing, decreasing}')
+
+        # the filters are applied while the intersections are built, so only the ones being plotted are created
+        filters = {}
+        if intersection_limit:
+            cutoff = float(intersection_limit.split(' ')[1])
+            if intersection_limit.startswith('by_total'):
+                filters['min_total_fraction'] = cutoff
+            elif intersection_limit.startswith('by_sample'):
+                filters['min_sample_fraction'] = cutoff
+            else:
+                raise ValueError('intersection_limit must start with "by_total" or "by_sample". See docstring for '
+                                 'details.')
+        if max_intersections is not None:
+            if not isinstance(max_intersections, numbers.Integral) or max_intersections < 1:
+                raise ValueError('max_intersections must be a positive integer.')
+            filters['top_k'] = max_intersections
+
+        with stage('intersections') as info:
+            intersections = list(intersections_from_signatures(self.signatures, self.sample_names, **filters))
+            info['n_items'] = len(intersections)
+        if order_by:
+            with stage('ordering', n_items=len(intersections)):
+                intersections = order_sample_intersections(intersections, by=order_by)
+
+        if len(intersections) == 0:
+            if intersection_limit:
+                raise RuntimeError('After filtering by intersection size there is no data to plot. Refine the value '
+                                   'of "intersection_limit".')
+            raise RuntimeError('There is no data to plot, as all of the samples are empty.')
+        return intersections
+
+    def _build_figure(self, intersections: List[Dict], color: str, hover_elements: int = 0) -> 'go.Figure':
+        """
+        Build the figure for a list of intersections.
+        """
+        from upsetplotly.plotting import master_figure, add_intersect_bar_subplot, add_rows_to_sample_table, \
+            add_circles_and_bars, add_additional_plot
+        rows = 2 + len(self.additional_data)
+        barplot_row = rows - 1
+        intersection_row = rows
+        with stage('layout', n_items=rows):
+            fig = master_figure(n_samples=len(self.sample_names),
+                                rows=rows)
+        with stage('bar_trace', n_items=len(intersections)):
+            signatures = [samples_to_signature(x['samples'], self.sample_names) for x in intersections]
+            hovertext = None
+            if hover_elements and self.keep_elements:
+                hovertext = [element_preview(x['elements'], hover_elements) for x in intersections]
+            error_bounds = None
+            if self.count_bounds is not None:
+                error_bounds = [self.count_bounds[x] for x in signatures]
+            # as strings, since javascript numbers can not hold the signatures of more than 53 samples exactly
+            add_intersect_bar_subplot(fig, intersections, row=barplot_row, color=color,
+                                      customdata=[hex(x) for x in signatures],
+                                      hovertext=hovertext, error_bounds=error_bounds)
+        with stage('sample_table', n_items=len(self.sample_names)):
+            add_rows_to_sample_table(fig, self.sample_names, row=intersection_row)
+        with stage('matrix_glyphs', n_items=len(intersections)):
+            add_circles_and_bars(fig, intersections, self.sample_names, row=intersection_row, color=color)
+        for i in range(len(self.additional_data)):
+            data = self.additional_data[i]
+            with stage('secondary_plot', label=data['label'], plot_type=data['type'],
+                       n_items=sum(x['n'] for x in intersections)):
+                add_additional_plot(fig,
+                                    data=data['data'],
+                                    values=self._secondary_values(data, intersections),
+                                    label=data['label'],
+                                    intersections=intersections,
+                                    plot_type=data['type'],
+                                    row=i+1,
+                                    color=color,
+                                    aggregate=data['aggregate'],
+                                    max_points=data['max_points'])
+        return fig
+
+    def plot(self, show_fig: bool = True, return_fig: bool = False,
+             intersection_limit: str = None,
+             order_by: str = None,
+             color: str = None,
+             max_intersections: int = None,
+             use_cache: bool = True,
+             hover_elements: int = 0) -> Optional['go.Figure']:
+        """
+        Create the UpSetPlot.
+        :param show_fig: Whether or not to show the figure.
+        :param return_fig: Whether or not to return the Figure object.
+        :param intersection_limit: A string indicating a limit on how small an intersection to plot. Must be of this
+        form: "by_sample [a float between 0 and 1]" or "by_total [a float between 0 and 1]". For example, if you
+        give "by_sample 0.05", then any intersection which is 5% or greater of any sample will be displayed. If you
+        were to give "by_total 0.05", then any intersection which is 5% or greater of the total number of unique
+        elements would be displayed.
+        :param order_by: If the intersections should be ordered according to size. Must be one of
+        {increasing, decreasing}
+        :param color: The base color of the figure, as a hex or rgb string.
+        :param max_intersections: If given, only the largest max_intersections intersections are plotted. Must be at
+        least 1.
+        :param use_cache: Whether or not to reuse the intersections and figure from a previous call with the same
+        parameters. Note that the same Figure object is then returned, so copy it before modifying it.
+        :param hover_elements: The number of elements of each intersection to list in the hover text of its bar.
+        Every bar also carries the signature of its intersection as a hex string in customdata, which can be passed
+        to get_intersection_elements to get all of its elements, e.g. when a bar is clicked.
+        :return:
+        """
+        if color is None:
+            color = '#636efa'
+
+        view_key = (order_by, intersection_limit, max_intersections)
+        figure_key = view_key + (color, hover_elements, tuple((id(x['data']), x['label'], x['type'], x['aggregate'],
+                                                               x['max_points'], x['ignore_missing'])
+                                                              for x in self.additional_data))
+        with stage('plot') as info:
+            if use_cache:
+                intersections = self._cache_get(self._view_cache, view_key)
+                fig = self._cache_get(self._figure_cache, figure_key)
+            else:
+                intersections = fig = None
+            info['cached'] = fig is not None
+
+            if intersections is None:
+                intersections = self.get_plotted_intersections(intersection_limit=intersection_limit, order_by=order_by,
+                                                               max_intersections=max_intersections)
+                if use_cache:
+                    self._cache_put(self._view_cache, view_key, intersections)
+
+            if fig is None:
+                fig = self._build_figure(intersections, color, hover_elements=hover_elements)
+                if use_cache:
+                    self._cache_put(self._figure_cache, figure_key, fig)
+            self.fig = fig
+            self.n_plotted_intersections = len(intersections)
+            info['n_items'] = len(intersections)
+        if show_fig:
+            self.fig.show()
+        if return_fig:
+            return self.fig
+
+    def _figure_json(self, fig: 'go.Figure') -> Dict:
+        from upsetplotly.patch_functions import figure_json
+        if self._fig_json is None or self._fig_json[0] is not fig:
+            self._fig_json = (fig, figure_json(fig))
+        return self._fig_json[1]
+
+    def plot_patch(self, previous: Union['go.Figure', Dict] = None, **kwargs) -> Dict:
+        """
+        Compute the update which turns the figure currently displayed into the figure for new plot parameters, e.g. in
+        the callback of an interactive app when the user changes order_by or intersection_limit. Only what changed is
+        included (reordered bar arrays, moved glyphs, the secondary traces which differ), so far less has to be sent to
+        the browser than the whole figure. The new figure becomes self.fig.
+        :param previous: The figure currently displayed, as a Figure or as a figure dictionary in JSON form (e.g. the
+        figure property of a Dash Graph). By default, the last figure made by plot or plot_patch.
+        :param kwargs: The parameters of the new figure, which are passed to plot (e.g. order_by, intersection_limit,
+        max_intersections or color).
+        :return: The update, as described in patch_functions.figure_diff. patch_functions.apply_patch applies it to
+        the previous figure, and patch_functions.plotly_js_calls converts it to plotly.js calls for the browser.
+        """
+        from upsetplotly.patch_functions import figure_diff
+        if previous is None:
+            if self.fig is None:
+                raise ValueError('There is no previous figure. Call plot first or pass the previous figure.')
+            previous = self.fig
+        if not isinstance(previous, dict):
+            previous = self._figure_json(previous)
+        if 'show_fig' in kwargs or 'return_fig' in kwargs:
+            raise ValueError('show_fig and return_fig cannot be passed to plot_patch.')
+        fig = self.plot(show_fig=False, return_fig=True, **kwargs)
+        with stage('patch') as info:
+            patch = figure_diff(previous, self._figure_json(fig))
+            info['n_items'] = len(patch['restyle']) + len(patch['relayout']) + len(patch['add_traces'])
+        return patch
+
+
+def check_max_points(max_points: Optional[int], aggregate: bool) -> None:
+    """
+    Check the point budget of a secondary plot. Only aggregated plots are downsampled, so a budget without aggregate
+    is an error rather than being silently ignored.
+    """
+    if max_points is None:
+        return
+    if not aggregate:
+        raise ValueError('max_points only applies to aggregated plots. Pass aggregate=True to downsample the values.')
+    if max_points < 1:
+        raise ValueError('max_points must be a positive integer.')
+
+
+def element_preview(elements: Iterable, n: int) -> str:
+    """
+    List the first few elements of an intersection, e.g. for hover text.
+    :param elements: The elements of the intersection.
+    :param n: The maximum number of elements to list.
+    :return: The elements, one per line (separated by <br>), followed by the number of elements left out, if any.
+    """
+    shown = [str(x) for x in itertools.islice(elements, n)]
+    rest = len(elements) - len(shown)
+    if rest > 0:
+        shown.append(f'... and {rest} more')
+    return '<br>'.join(shown)
+
+
+def gather_series(series, elements) -> 'np.ndarray':
+    """
+    Put the values of a pandas Series keyed by element in the order of an array of elements.
+    :param series: A pandas Series mapping elements to values.
+    :param elements: An array of elements.
+    :return: A float array with the value of each element, NaN for elements missing from the series.
+    """
+    import numpy as np
+    positions = series.index.get_indexer(elements)
+    values = series.to_numpy(dtype=float)[positions]
+    values[positions < 0] = np.nan
+    return values
+
+
+def has_missing_values(values) -> bool:
+    """
+    :param values: A numpy array of values, with NaN for missing values.
+    :return: Whether or not any value is missing.
+    """
+    import numpy as np
+    return values.dtype.kind in 'fc' and bool(np.isnan(values).any())
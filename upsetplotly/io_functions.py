@@ -0,0 +1,295 @@
+from typing import List, Set, Dict, Tuple, Iterable, Iterator, Any
+import csv
+import gzip
+import itertools
+import os
+import pickle
+import tempfile
+from upsetplotly.set_functions import group_element_signatures, merge_signatures
+
+
+def open_text(path: str):
+    """
+    Open a text file for reading, decompressing it on the fly if the name ends in ".gz".
+    :param path: The path to the file.
+    :return: A file object.
+    """
+    if str(path).endswith('.gz'):
+        return gzip.open(path, 'rt', newline='')
+    return open(path, 'r', newline='')
+
+
+def read_rows(path: str, sep: str = '\t', header: bool = False,
+              chunksize: int = 100000) -> Tuple[List[str], Iterator[List[List[str]]]]:
+    """
+    Read a delimited text file in chunks of rows, so the whole file is never in memory.
+    :param path: The path to the file. Files ending in ".gz" are decompressed.
+    :param sep: The column delimiter.
+    :param header: Whether or not the first row is a header.
+    :param chunksize: The number of rows in each chunk.
+    :return: A tuple of (the header, or None if there is no header, a generator of lists of rows).
+    """
+    f = open_text(path)
+    reader = csv.reader(f, delimiter=sep)
+    columns = next(reader, None) if header else None
+
+    def chunks():
+        try:
+            while True:
+                chunk = list(itertools.islice(reader, chunksize))
+                if not chunk:
+                    break
+                yield chunk
+        finally:
+            f.close()
+    return columns, chunks()
+
+
+def _sample_bits(sample_names: List[str] = None) -> Tuple[List[str], Dict[str, int], bool]:
+    names = list(sample_names) if sample_names else []
+    bits = {name: 1 << i for i, name in enumerate(names)}
+    if len(bits) != len(names):
+        raise ValueError('The sample names must be unique.')
+    return names, bits, not sample_names
+
+
+def signatures_from_pairs(pairs: Iterable[Tuple[Any, str]], sample_names: List[str] = None,
+                          keep_elements: bool = True, chunksize: int = 100000,
+                          memory_budget: int = None) -> Tuple[List[str], Dict[int, Set]]:
+    """
+    Build the membership signatures from (element, sample) pairs, i.e. long-format data. The pairs are consumed in
+    chunks and folded straight into the signatures, so the samples are never held as separate lists.
+    :param pairs: An iterable of (element, sample name) pairs. Repeated pairs are fine.
+    :param sample_names: The names of the samples, which sets their order. If None, the samples are ordered by their
+    first appearance. If given, a pair with an unknown sample raises a ValueError.
+    :param keep_elements: If False, each signature is mapped to the number of elements having it instead.
+    :param chunksize: The number of pairs processed at a time.
+    :param memory_budget: If given, the pairs are spilled into partitions on disk so that roughly this many bytes are
+    used. See signatures_out_of_core.
+    :return: A tuple of (the sample names, a dictionary mapping signatures to sets of elements).
+    """
+    if memory_budget is not None:
+        return signatures_out_of_core(pairs, sample_names=sample_names, keep_elements=keep_elements,
+                                      memory_budget=memory_budget)
+    names, bits, open_ended = _sample_bits(sample_names)
+    element_signatures = {}
+    get = element_signatures.get
+    pairs = iter(pairs)
+    while True:
+        chunk = list(itertools.islice(pairs, chunksize))
+        if not chunk:
+            break
+        for element, sample in chunk:
+            bit = bits.get(sample)
+            if bit is None:
+                if not open_ended:
+                    raise ValueError(f'{sample} is not one of the sample names.')
+                bit = bits[sample] = 1 << len(names)
+                names.append(sample)
+            element_signatures[element] = get(element, 0) | bit
+    return names, group_element_signatures(element_signatures, keep_elements=keep_elements)
+
+
+def signatures_from_file(path: str, sep: str = '\t', element_column: int = 0, sample_column: int = 1,
+                         header: bool = False, sample_names: List[str] = None, keep_elements: bool = True,
+                         chunksize: int = 100000, memory_budget: int = None) -> Tuple[List[str], Dict[int, Set]]:
+    """
+    Build the membership signatures from a delimited text file of (element, sample) pairs, one pair per row. The file
+    is read in chunks. Elements are read as strings.
+    :param path: The path to the file. Files ending in ".gz" are decompressed.
+    :param sep: The column delimiter.
+    :param element_column: The index of the column holding the elements.
+    :param sample_column: The index of the column holding the sample names.
+    :param header: Whether or not the first row is a header.
+    :param sample_names: The names of the samples, which sets their order. If None, the samples are ordered by their
+    first appearance.
+    :param keep_elements: If False, each signature is mapped to the number of elements having it instead.
+    :param chunksize: The number of rows read at a time.
+    :param memory_budget: If given, the rows are spilled into partitions on disk so that roughly this many bytes are
+    used. See signatures_out_of_core.
+    :return: A tuple of (the sample names, a dictionary mapping signatures to sets of elements).
+    """
+    _, chunks = read_rows(path, sep=sep, header=header, chunksize=chunksize)
+    pairs = ((row[element_column], row[sample_column]) for chunk in chunks for row in chunk if row)
+    return signatures_from_pairs(pairs, sample_names=sample_names, keep_elements=keep_elements, chunksize=chunksize,
+                                 memory_budget=memory_budget)
+
+
+def _is_member(value) -> bool:
+    # values read from text files are strings, so "0" and "False" must not count as members
+    if isinstance(value, str):
+        return value.strip().lower() not in ('', '0', 'false', 'no', 'n', 'f')
+    return bool(value)
+
+
+def signatures_from_membership_table(table, sample_names: List[str] = None, element_column: int = 0,
+                                     sep: str = '\t', keep_elements: bool = True,
+                                     chunksize: int = 100000) -> Tuple[List[str], Dict[int, Set]]:
+    """
+    Build the membership signatures from a wide membership table, which has one row per element and one column per
+    sample indicating whether the element is in that sample (e.g. 1/0 or True/False).
+    :param table: The path to a delimited text file with a header row, a pandas DataFrame, or an iterable of rows. For
+    a file or DataFrame the sample names are taken from the column names.
+    :param sample_names: The names of the sample columns, in order. Required if table is an iterable of rows.
+    :param element_column: The index of the column holding the elements. Every other column is a sample.
+    :param sep: The column delimiter, if table is a file.
+    :param keep_elements: If False, each signature is mapped to the number of elements having it instead.
+    :param chunksize: The number of rows read at a time, if table is a file.
+    :return: A tuple of (the sample names, a dictionary mapping signatures to sets of elements).
+    """
+    if isinstance(table, str) or hasattr(table, '__fspath__'):
+        columns, chunks = read_rows(table, sep=sep, header=True, chunksize=chunksize)
+        rows = itertools.chain.from_iterable(chunks)
+    elif hasattr(table, 'itertuples'):
+        columns = [str(x) for x in table.columns]
+        rows = table.itertuples(index=False, name=None)
+    else:
+        columns = None
+        rows = table
+
+    if columns is not None:
+        file_names = columns[:element_column] + columns[element_column + 1:]
+        if sample_names and list(sample_names) != file_names:
+            raise ValueError('sample_names does not match the columns of the table.')
+        sample_names = file_names
+    if not sample_names:
+        raise ValueError('sample_names must be given if the table is an iterable of rows.')
+
+    sample_names = list(sample_names)
+    element_signatures = {}
+    for row in rows:
+        if not row:
+            continue
+        flags = list(row[:element_column]) + list(row[element_column + 1:])
+        if len(flags) != len(sample_names):
+            raise ValueError(f'Expected {len(sample_names)} sample columns but found {len(flags)} in row {row}.')
+        signature = 0
+        for i, flag in enumerate(flags):
+            if _is_member(flag):
+                signature |= 1 << i
+        if signature:
+            element = row[element_column]
+            element_signatures[element] = element_signatures.get(element, 0) | signature
+    return sample_names, group_element_signatures(element_signatures, keep_elements=keep_elements)
+
+
+# rough number of bytes a buffered (element, signature) entry takes in memory, used to turn the memory budget into a
+# number of buffered entries
+_BYTES_PER_ENTRY = 200
+
+
+def _partition_file(directory: str, partition: int) -> str:
+    return os.path.join(directory, f'partition_{partition}.pkl')
+
+
+def _spill(buffers: List[Dict], directory: str) -> None:
+    """
+    Append the buffered element signatures of every partition to its file and empty the buffers.
+    """
+    for partition, buffer in enumerate(buffers):
+        if buffer:
+            with open(_partition_file(directory, partition), 'ab') as f:
+                pickle.dump(list(buffer.items()), f, protocol=pickle.HIGHEST_PROTOCOL)
+            buffer.clear()
+
+
+def _read_partition(path: str) -> Iterator[List[Tuple[Any, int]]]:
+    with open(path, 'rb') as f:
+        while True:
+            try:
+                yield pickle.load(f)
+            except EOFError:
+                return
+
+
+def _partition_signatures(records: Iterable[Tuple[Any, int]], directory: str, n_partitions: int, salt: int,
+                          buffer_size: int) -> None:
+    """
+    Split (element, signature) records into hash partitions on disk. Records of the same element are combined while
+    they are buffered, and always end up in the same partition.
+    """
+    buffers = [{} for _ in range(n_partitions)]
+    n_buffered = 0
+    for element, signature in records:
+        buffer = buffers[hash((salt, element)) % n_partitions]
+        old = buffer.get(element)
+        if old is None:
+            buffer[element] = signature
+            n_buffered += 1
+            if n_buffered >= buffer_size:
+                _spill(buffers, directory)
+                n_buffered = 0
+        else:
+            buffer[element] = old | signature
+    _spill(buffers, directory)
+
+
+def _merge_partition(path: str, keep_elements: bool, memory_budget: int, n_partitions: int, depth: int,
+                     buffer_size: int) -> Dict[int, Set]:
+    """
+    Compute the signature groups of one partition file. A partition which is too big for the memory budget is split
+    into sub-partitions with a different hash first.
+    """
+    if os.path.getsize(path) * 4 > memory_budget and depth < 4:
+        directory = tempfile.mkdtemp(dir=os.path.dirname(path))
+        records = (record for batch in _read_partition(path) for record in batch)
+        _partition_signatures(records, directory, n_partitions, salt=depth + 1, buffer_size=buffer_size)
+        os.remove(path)
+        results = []
+        for partition in range(n_partitions):
+            sub_path = _partition_file(directory, partition)
+            if os.path.exists(sub_path):
+                results.append(_merge_partition(sub_path, keep_elements, memory_budget, n_partitions, depth + 1,
+                                                buffer_size))
+        return merge_signatures(results)
+
+    element_signatures = {}
+    get = element_signatures.get
+    for batch in _read_partition(path):
+        for element, signature in batch:
+            element_signatures[element] = get(element, 0) | signature
+    os.remove(path)
+    return group_element_signatures(element_signatures, keep_elements=keep_elements)
+
+
+def signatures_out_of_core(pairs: Iterable[Tuple[Any, str]], sample_names: List[str] = None,
+                           keep_elements: bool = True, memory_budget: int = 2 ** 30, n_partitions: int = 64,
+                           temp_dir: str = None) -> Tuple[List[str], Dict[int, Set]]:
+    """
+    Build the membership signatures from (element, sample) pairs without holding all the distinct elements in memory.
+    The records are spilled into hash partitions in a temporary directory, the signatures of each partition are
+    computed one at a time and the per-signature results are merged. Partitions which turn out to be too big for the
+    memory budget are split again. Elements must be picklable.
+    Note that with keep_elements the result itself holds every element, so only keep_elements=False bounds the memory
+    of the whole computation.
+    :param pairs: An iterable of (element, sample name) pairs.
+    :param sample_names: The names of the samples, which sets their order. If None, the samples are ordered by their
+    first appearance.
+    :param keep_elements: If False, each signature is mapped to the number of elements having it instead.
+    :param memory_budget: The approximate number of bytes to use for buffers and for each partition.
+    :param n_partitions: The number of partitions the elements are split into.
+    :param temp_dir: The directory in which to create the temporary partitions. If None, the system default is used.
+    :return: A tuple of (the sample names, a dictionary mapping signatures to sets of elements).
+    """
+    names, bits, open_ended = _sample_bits(sample_names)
+
+    def records():
+        for element, sample in pairs:
+            bit = bits.get(sample)
+            if bit is None:
+                if not open_ended:
+                    raise ValueError(f'{sample} is not one of the sample names.')
+                bit = bits[sample] = 1 << len(names)
+                names.append(sample)
+            yield element, bit
+
+    buffer_size = max(1000, memory_budget // 2 // _BYTES_PER_ENTRY)
+    with tempfile.TemporaryDirectory(dir=temp_dir, prefix='upsetplotly_') as directory:
+        _partition_signatures(records(), directory, n_partitions, salt=0, buffer_size=buffer_size)
+        results = []
+        for partition in range(n_partitions):
+            path = _partition_file(directory, partition)
+            if os.path.exists(path):
+                results.append(_merge_partition(path, keep_elements, memory_budget, n_partitions, depth=0,
+                                                buffer_size=buffer_size))
+    return names, merge_signatures(results)
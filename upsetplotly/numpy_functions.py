@@ -0,0 +1,421 @@
+from typing import List, Set, Union, Dict, Tuple, Iterable
+import itertools
+import numpy as np
+from upsetplotly.set_functions import signature_order_key, get_element_signatures, group_element_signatures
+
+# dtype kinds which can be put in a single numpy array without changing how the elements compare to each other
+_NUMERIC_KINDS = 'biuf'
+_TEXT_KINDS = 'US'
+
+
+def _mix(x: np.ndarray) -> np.ndarray:
+    # the splitmix64 finalizer, which spreads every input bit over the whole output. uint64 arithmetic wraps around.
+    x = x ^ (x >> np.uint64(30))
+    x = x * np.uint64(0xbf58476d1ce4e5b9)
+    x = x ^ (x >> np.uint64(27))
+    x = x * np.uint64(0x94d049bb133111eb)
+    return x ^ (x >> np.uint64(31))
+
+
+def _as_array(sample: Iterable) -> np.ndarray:
+    """
+    Convert a sample to a one-dimensional numpy array, falling back to an object array if numpy would have to change
+    the elements to fit them in a native dtype (e.g. a mixture of strings and integers).
+    :param sample: A list, set or array of elements.
+    :return: A numpy array
+    """
+    if isinstance(sample, np.ndarray):
+        return sample.ravel()
+    sample = list(sample)
+    try:
+        arr = np.asarray(sample)
+    except ValueError:
+        # e.g. tuples of different lengths
+        arr = np.empty(0)
+    if arr.ndim != 1 or len(arr) != len(sample):
+        arr = np.empty(len(sample), dtype=object)
+        arr[:] = sample
+    elif arr.dtype.kind in _TEXT_KINDS and len(set(map(type, sample))) > 1:
+        arr = np.asarray(sample, dtype=object)
+    elif arr.dtype.kind in _NUMERIC_KINDS and not _same_number_type(sample, arr.dtype.kind):
+        # e.g. integers and floats, which would all become floats (rounding integers above 2 ** 53), or bools and
+        # integers, which would all become integers
+        arr = np.asarray(sample, dtype=object)
+    return arr
+
+
+# the python and numpy types which are kept as they are in an array of each numeric dtype kind
+_NUMBER_TYPES = {'b': (bool, np.bool_), 'i': (int, np.integer), 'u': (int, np.integer), 'f': (float, np.floating)}
+
+
+def _same_number_type(sample: List, kind: str) -> bool:
+    """
+    Whether all numbers of a sample come back with their own type from an array of the given dtype kind.
+    """
+    types = set(map(type, sample))
+    if kind != 'b' and types & {bool, np.bool_}:
+        return False
+    return all(issubclass(t, _NUMBER_TYPES[kind]) for t in types)
+
+
+def _objects_or_array(sample: Iterable) -> Union[Iterable, np.ndarray]:
+    """
+    Leave a collection of python objects which are not numbers (e.g. strings) as it is, since putting them in an array
+    only to take them out again costs more than hashing them. Anything else is converted with _as_array.
+    """
+    if isinstance(sample, (list, tuple, set, frozenset)) and len(sample) > 0 and \
+            not isinstance(next(iter(sample)), (int, float, np.number)):
+        return sample
+    return _as_array(sample)
+
+
+def _kinds(arrays: List[Union[Iterable, np.ndarray]]) -> Set[str]:
+    return {arr.dtype.kind if isinstance(arr, np.ndarray) else 'O' for arr in arrays if len(arr) > 0}
+
+
+def _numbers_fit_one_dtype(arrays: List[Union[list, np.ndarray]]) -> bool:
+    """
+    Whether the samples are all numbers which can be put in one array without changing them. Integers and floats are
+    not mixed, since e.g. integers above 2 ** 53 would be rounded, and neither are integer dtypes which only fit
+    together in a float (int64 and uint64). Floats with NaNs are left out too: np.unique puts all NaNs together, while
+    a dictionary (and so the python backend) only does that for the very same NaN object.
+    """
+    kinds = _kinds(arrays)
+    if not kinds or not kinds <= set(_NUMERIC_KINDS):
+        return False
+    if kinds == {'f'}:
+        return not any(np.isnan(arr).any() for arr in arrays if len(arr) > 0)
+    return kinds <= set('biu') and np.result_type(*[arr.dtype for arr in arrays if len(arr) > 0]).kind in 'biu'
+
+
+def encode_elements(samples: Union[List[List], List[Set]]) -> Tuple[np.ndarray, List[np.ndarray]]:
+    """
+    Map the elements of all samples to dense integer IDs.
+    :param samples: A list of lists, sets or arrays (the samples).
+    :return: A tuple of (an array of the unique elements, a list of arrays holding the element IDs of each sample). The
+    ID of an element is its index in the array of unique elements.
+    """
+    samples = _collections(samples)
+    arrays = [_as_array(sample) for sample in samples]
+    kinds = _kinds(arrays)
+
+    if _numbers_fit_one_dtype(arrays) or (len(kinds) == 1 and kinds <= set(_TEXT_KINDS)):
+        flat = np.concatenate([arr for arr in arrays if len(arr) > 0])
+        elements, inverse = np.unique(flat, return_inverse=True)
+        inverse = inverse.ravel()
+        ids = []
+        start = 0
+        for arr in arrays:
+            if len(arr) > 0:
+                ids.append(inverse[start:start + len(arr)])
+                start += len(arr)
+            else:
+                ids.append(np.empty(0, dtype=np.intp))
+        return elements, ids
+
+    # the elements cannot share a native dtype without being changed, so hash them in python instead. the IDs are given
+    # in order of first appearance.
+    values = _as_lists(samples, arrays)
+    lookup = {element: i for i, element in enumerate(dict.fromkeys(itertools.chain.from_iterable(values)))}
+    ids = [np.fromiter(map(lookup.__getitem__, sample), dtype=np.intp, count=len(sample)) for sample in values]
+    elements = np.empty(len(lookup), dtype=object)
+    elements[:] = list(lookup)
+    return elements, ids
+
+
+def _collections(samples: Iterable[Iterable]) -> List[Iterable]:
+    # iterators (e.g. generators) are read once, into lists, so they can still be read as they are after being
+    # converted to arrays. see _as_lists.
+    return [x if isinstance(x, (np.ndarray, list, tuple, set, frozenset)) else list(x) for x in samples]
+
+
+def _as_lists(samples: List[Iterable], arrays: List[Union[list, np.ndarray]]) -> List[Iterable]:
+    # the samples as the python backend reads them: python collections as they are, so the very same objects are
+    # grouped (this matters for NaNs, which only equal themselves), and arrays as python objects
+    return [sample if isinstance(sample, (list, tuple, set, frozenset)) else
+            arr.tolist() if isinstance(arr, np.ndarray) else arr for sample, arr in zip(samples, arrays)]
+
+
+def _signature_groups(samples: Union[List[List], List[Set]]) -> Tuple[np.ndarray, List[int], np.ndarray, np.ndarray]:
+    """
+    Find the membership signature of every distinct element of the samples.
+    :param samples: A list of lists, sets or arrays (the samples).
+    :return: A tuple of (an array of the unique elements, the distinct signatures as python integers, the index of each
+    element's signature in that list, the number of elements having each signature).
+    """
+    samples = _collections(samples)
+    arrays = [_objects_or_array(sample) for sample in samples]
+    if _numbers_fit_one_dtype(arrays):
+        elements, ids = encode_elements(arrays)
+        return (elements,) + get_signature_groups(membership_matrix(ids, len(elements)))
+
+    # strings and other python objects are visited once, in a dictionary (see get_membership_signatures). only the
+    # signatures are grouped in numpy.
+    element_signatures = get_element_signatures(_as_lists(samples, arrays))
+    elements = np.empty(len(element_signatures), dtype=object)
+    elements[:] = list(element_signatures)
+    keys = np.fromiter(element_signatures.values(), dtype=np.uint64 if len(arrays) <= 64 else object,
+                       count=len(element_signatures))
+    unique, inverse, counts = np.unique(keys, return_inverse=True, return_counts=True)
+    return elements, [int(x) for x in unique], inverse.ravel(), counts
+
+
+def python_hashes(sample: Iterable) -> np.ndarray:
+    """
+    Get hash() of every element of a sample. Integers (and floats which equal them) of moderate size are hashed with
+    vectorized operations, since python hashes them to themselves (except -1, which hashes to -2).
+    :param sample: A list, set or array of elements.
+    :return: An int64 array.
+    """
+    if isinstance(sample, np.ndarray) and sample.dtype.kind in _NUMERIC_KINDS and len(sample) > 0:
+        limit = 2 ** 61 - 1
+        if sample.dtype.kind == 'f':
+            with np.errstate(invalid='ignore'):
+                exact = bool(((sample == np.floor(sample)) & (np.abs(sample) < limit)).all())
+        else:
+            exact = int(sample.max()) < limit and int(sample.min()) > -limit
+        if exact:
+            ints = sample.astype(np.int64)
+            return np.where(ints == -1, -2, ints)
+    values = sample.tolist() if isinstance(sample, np.ndarray) else sample
+    return np.fromiter(map(hash, values), dtype=np.int64, count=len(values))
+
+
+def shard_ids(sample: Iterable, n_shards: int) -> np.ndarray:
+    """
+    Assign every element of a sample to one of n_shards shards by its hash, so an element is in the same shard in every
+    sample it is found in.
+    :param sample: A list or array of elements.
+    :param n_shards: The number of shards, at most 65536.
+    :return: A uint16 array with the shard of each element.
+    """
+    # the hashes of numbers are mostly the numbers themselves, so they are mixed before being divided up
+    return (_mix(python_hashes(sample).view(np.uint64)) % np.uint64(n_shards)).astype(np.uint16)
+
+
+def take(sample: Union[List, np.ndarray], mask: np.ndarray) -> Union[List, np.ndarray]:
+    """
+    :param sample: A list or array of elements.
+    :param mask: A boolean array selecting the elements to take.
+    :return: The selected elements, as a list if sample is a list.
+    """
+    if isinstance(sample, np.ndarray):
+        return sample[mask]
+    return list(map(sample.__getitem__, np.flatnonzero(mask).tolist()))
+
+
+def merge_compact_signatures(results: Iterable[Tuple[np.ndarray, List[int], List[int]]]
+                             ) -> Tuple[np.ndarray, Dict[int, np.ndarray]]:
+    """
+    Merge compact signature groups computed for disjoint sets of elements (e.g. shards of the same samples).
+    :param results: Tuples of (an array of elements sorted by signature, the signatures in that order, the number of
+    elements having each signature).
+    :return: A tuple of (the array of all elements, a dictionary mapping each signature to a view of the array), as
+    returned by get_compact_signatures.
+    """
+    parts = {}
+    for elements, signatures, counts in results:
+        for signature, group in _slice_groups(elements, signatures, counts).items():
+            parts.setdefault(signature, []).append(group)
+    order = sorted(parts, key=signature_order_key)
+    arrays = [group for signature in order for group in parts[signature] if len(group) > 0]
+    if not arrays:
+        return np.empty(0, dtype=object), {}
+    kinds = {arr.dtype.kind for arr in arrays}
+    if len(kinds) > 1 or np.result_type(*[arr.dtype for arr in arrays]).kind not in kinds:
+        # e.g. strings in one shard and a mixture of types in another, or int64 and uint64
+        arrays = [arr.astype(object) for arr in arrays]
+    elements = np.concatenate(arrays)
+    return elements, _slice_groups(elements, order, [sum(len(x) for x in parts[signature]) for signature in order])
+
+
+def membership_matrix(ids: List[np.ndarray], n_elements: int) -> np.ndarray:
+    """
+    Build a packed boolean membership matrix.
+    :param ids: The element IDs of each sample, as returned by encode_elements.
+    :param n_elements: The total number of unique elements.
+    :return: A uint8 array of shape (ceil(n_samples / 8), n_elements). Bit (i % 8) of row (i // 8) is set for the
+    elements found in sample i.
+    """
+    packed = np.zeros(((len(ids) + 7) // 8, n_elements), dtype=np.uint8)
+    for i, sample_ids in enumerate(ids):
+        packed[i // 8, sample_ids] |= np.uint8(1 << (i % 8))
+    return packed
+
+
+def get_signature_groups(packed: np.ndarray) -> Tuple[List[int], np.ndarray, np.ndarray]:
+    """
+    Find the distinct membership signatures in a packed membership matrix.
+    :param packed: A packed membership matrix, as returned by membership_matrix.
+    :return: A tuple of (the signatures as python integers, the index of each element's signature in that list, the
+    number of elements having each signature).
+    """
+    n_bytes, n_elements = packed.shape
+    rows = np.ascontiguousarray(packed.T)
+    if n_bytes <= 8:
+        # up to 64 samples the signature fits in a uint64, which np.unique handles fastest
+        padded = np.zeros((n_elements, 8), dtype=np.uint8)
+        padded[:, :n_bytes] = rows
+        keys = padded.view('<u8').ravel()
+        unique, inverse, counts = np.unique(keys, return_inverse=True, return_counts=True)
+        signatures = [int(x) for x in unique]
+    else:
+        keys = rows.view(np.dtype((np.void, n_bytes))).ravel()
+        unique, inverse, counts = np.unique(keys, return_inverse=True, return_counts=True)
+        signatures = [int.from_bytes(x.tobytes(), 'little') for x in unique]
+    return signatures, inverse.ravel(), counts
+
+
+def get_membership_signatures(samples: Union[List[List], List[Set]], keep_elements: bool = True) -> Dict[int, Set]:
+    """
+    NumPy implementation of upsetplotly.set_functions.get_membership_signatures. Elements are mapped to integer IDs
+    once, after which the signatures are found with vectorized operations rather than per-element python code.
+    :param samples: A list of lists, sets or arrays (the samples).
+    :param keep_elements: If False, each signature is mapped to the number of elements having it instead.
+    :return: A dictionary mapping each signature found in the data to the set of elements having that signature.
+    """
+    if len(samples) == 0:
+        return {}
+    samples = _collections(samples)
+    arrays = [_objects_or_array(sample) for sample in samples]
+    if not _numbers_fit_one_dtype(arrays):
+        # strings and other python objects are visited once, in a dictionary, just like by the python backend. sorting
+        # them in numpy (or even copying them into an array) costs more than that, since every element is a separate
+        # python object in memory.
+        return group_element_signatures(get_element_signatures(_as_lists(samples, arrays)),
+                                        keep_elements=keep_elements)
+    elements, signatures, inverse, counts = _signature_groups(arrays)
+    if len(elements) == 0:
+        return {}
+    if not keep_elements:
+        return dict(zip(signatures, counts.tolist()))
+
+    # sort the elements by signature so each group is one contiguous slice
+    grouped = elements[np.argsort(inverse, kind='stable')].tolist()
+    out = {}
+    start = 0
+    for signature, count in zip(signatures, counts.tolist()):
+        out[signature] = set(grouped[start:start + count])
+        start += count
+    return out
+
+
+def get_compact_signatures(samples: Union[List[List], List[Set]]) -> Tuple[np.ndarray, Dict[int, np.ndarray]]:
+    """
+    Like get_membership_signatures, but every element is stored once in a single array which is sorted by signature.
+    Each signature is mapped to a view of its slice of that array, so no per-group sets are created.
+    :param samples: A list of lists, sets or arrays (the samples).
+    :return: A tuple of (the array of all elements, a dictionary mapping each signature to a view of the array).
+    """
+    if len(samples) == 0:
+        return np.empty(0, dtype=object), {}
+    elements, signatures, inverse, counts = _signature_groups(samples)
+    if len(elements) == 0:
+        return elements, {}
+    order = sorted(range(len(signatures)), key=lambda x: signature_order_key(signatures[x]))
+    # number the groups in the default (name) order so the array follows the order of the intersections
+    rank = np.empty(len(signatures), dtype=np.intp)
+    rank[order] = np.arange(len(signatures))
+    elements = elements[np.argsort(rank[inverse], kind='stable')]
+    if elements.dtype == object and set(map(type, elements.tolist())) == {str}:
+        # a native array of strings can be saved and memory-mapped (see cache_functions), an object array cannot
+        elements = np.array(elements.tolist())
+    return elements, _slice_groups(elements, [signatures[i] for i in order], counts[order].tolist())
+
+
+def compact_signatures(signatures: Dict[int, Set]) -> Tuple[np.ndarray, Dict[int, np.ndarray]]:
+    """
+    Put the groups of a signature dictionary in a single array, sorted by signature, and map each signature to a view
+    of its slice of that array. See get_compact_signatures.
+    :param signatures: A dictionary mapping signatures to collections of elements.
+    :return: A tuple of (the array of all elements, a dictionary mapping each signature to a view of the array).
+    """
+    order = sorted(signatures, key=signature_order_key)
+    elements = _as_array(itertools.chain.from_iterable(signatures[x] for x in order))
+    return elements, _slice_groups(elements, order, [len(signatures[x]) for x in order])
+
+
+def _slice_groups(elements: np.ndarray, signatures: List[int], counts: List[int]) -> Dict[int, np.ndarray]:
+    out = {}
+    start = 0
+    for signature, count in zip(signatures, counts):
+        out[signature] = elements[start:start + count]
+        start += count
+    return out
+
+
+def grouped_box_stats(values: Iterable[float], sizes: Iterable[int],
+                      max_outliers: int = None) -> Dict[str, np.ndarray]:
+    """
+    Compute box plot statistics for many groups of values at once. The groups are sorted together and the quartiles,
+    whiskers and outliers of every group are found with vectorized operations.
+    :param values: The values of all groups, one group after the other.
+    :param sizes: The number of values in each group.
+    :param max_outliers: The maximum number of outliers to return per group. The outliers furthest from the median are
+    kept. If None, all outliers are returned.
+    :return: A dictionary of arrays with one entry per group: 'q1', 'median', 'q3', 'lowerfence' and 'upperfence'
+    (NaN for empty groups), plus 'outlier_groups' and 'outlier_values' describing the outliers.
+    """
+    values = np.asarray(values, dtype=float)
+    sizes = np.asarray(sizes, dtype=np.intp)
+    n_groups = len(sizes)
+    groups = np.repeat(np.arange(n_groups), sizes)
+    order = np.lexsort((values, groups))
+    values = values[order]
+    starts = np.concatenate(([0], np.cumsum(sizes)[:-1])).astype(np.intp)
+    ends = starts + np.maximum(sizes - 1, 0)
+    filled = sizes > 0
+
+    def quantile(p: float) -> np.ndarray:
+        # linear interpolation between the closest ranks, as numpy and plotly do by default
+        position = starts + (sizes - 1).clip(0) * p
+        lower = np.floor(position).astype(np.intp)
+        upper = np.minimum(lower + 1, ends)
+        out = np.full(n_groups, np.nan)
+        lower, upper, position = lower[filled], upper[filled], position[filled]
+        out[filled] = values[lower] + (values[upper] - values[lower]) * (position - lower)
+        return out
+
+    q1 = quantile(0.25)
+    median = quantile(0.5)
+    q3 = quantile(0.75)
+    iqr = q3 - q1
+    inside = (values >= (q1 - 1.5 * iqr)[groups]) & (values <= (q3 + 1.5 * iqr)[groups])
+
+    # the whiskers go to the most extreme values which are not outliers
+    lowerfence = np.full(n_groups, np.nan)
+    upperfence = np.full(n_groups, np.nan)
+    if filled.any():
+        lowerfence[filled] = np.minimum.reduceat(np.where(inside, values, np.inf), starts[filled])
+        upperfence[filled] = np.maximum.reduceat(np.where(inside, values, -np.inf), starts[filled])
+
+    outliers = np.flatnonzero(~inside)
+    outlier_groups = groups[outliers]
+    if max_outliers is not None and len(outliers) > 0:
+        distance = np.abs(values[outliers] - median[outlier_groups])
+        ranked = np.lexsort((-distance, outlier_groups))
+        outliers, outlier_groups = outliers[ranked], outlier_groups[ranked]
+        rank = np.arange(len(outliers)) - np.searchsorted(outlier_groups, outlier_groups, side='left')
+        outliers, outlier_groups = outliers[rank < max_outliers], outlier_groups[rank < max_outliers]
+
+    return {'q1': q1, 'median': median, 'q3': q3, 'lowerfence': lowerfence, 'upperfence': upperfence,
+            'outlier_groups': outlier_groups, 'outlier_values': values[outliers]}
+
+
+def grouped_sample(sizes: Iterable[int], max_per_group: int, seed: int = 0) -> np.ndarray:
+    """
+    Randomly sample at most max_per_group values from each of many groups, without replacement. Every group is sampled
+    on its own (i.e. stratified sampling), so small groups are kept whole.
+    :param sizes: The number of values in each group. The values of the groups are assumed to follow each other.
+    :param max_per_group: The maximum number of values to keep from each group.
+    :param seed: Seed for the random number generator, so the same values are chosen every time.
+    :return: The sorted indices of the values to keep.
+    """
+    sizes = np.asarray(sizes, dtype=np.intp)
+    groups = np.repeat(np.arange(len(sizes)), sizes)
+    keys = np.random.default_rng(seed).random(len(groups))
+    # rank the values of each group in a random order and keep the first max_per_group of them
+    order = np.lexsort((keys, groups))
+    starts = np.concatenate(([0], np.cumsum(sizes)[:-1])).astype(np.intp)
+    rank = np.arange(len(groups)) - starts[groups]
+    return np.sort(order[rank < max_per_group])
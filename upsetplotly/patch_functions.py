@@ -0,0 +1,157 @@
+from typing import List, Dict, Any
+import copy
+import json
+import re
+
+# the token of an attribute path, e.g. "shapes[3]" in "shapes[3].x0"
+_PATH_TOKEN = re.compile(r'^([^\[\]]+)(?:\[(\d+)\])?$')
+
+
+def figure_json(fig) -> Dict:
+    """
+    Get the JSON form of a figure, i.e. what plotly.js (or a Dash figure property) holds.
+    :param fig: A plotly.graph_objs.Figure, or a figure dictionary which is already in JSON form.
+    :return: A dictionary with 'data' (a list of traces) and 'layout'.
+    """
+    if isinstance(fig, dict):
+        return {'data': fig.get('data', []), 'layout': fig.get('layout', {})}
+    return json.loads(fig.to_json())
+
+
+def _is_leaf(value: Any) -> bool:
+    # typed arrays (numpy data is encoded as {'dtype': ..., 'bdata': ...}) are compared as a whole
+    return not isinstance(value, dict) or 'bdata' in value
+
+
+def _diff(old: Any, new: Any, path: str, out: Dict[str, Any]) -> None:
+    """
+    Add the attribute paths at which new differs from old to out.
+    """
+    if isinstance(old, dict) and isinstance(new, dict) and not _is_leaf(old) and not _is_leaf(new):
+        prefix = path + '.' if path else ''
+        for key, value in new.items():
+            if key not in old:
+                out[prefix + key] = value
+            else:
+                _diff(old[key], value, prefix + key, out)
+        for key in old:
+            if key not in new:
+                # null resets an attribute to its default
+                out[prefix + key] = None
+    elif (isinstance(old, list) and isinstance(new, list) and len(old) == len(new) and path
+          and all(isinstance(x, dict) for x in new) and all(isinstance(x, dict) for x in old)):
+        # lists of objects (e.g. the shapes) are compared item by item, so moving a single shape is a small update
+        for i, (old_item, new_item) in enumerate(zip(old, new)):
+            _diff(old_item, new_item, f'{path}[{i}]', out)
+    elif old != new:
+        out[path] = new
+
+
+def figure_diff(old, new) -> Dict:
+    """
+    Compute the update which turns one figure into another. Only the attributes which differ are included, e.g.
+    reordered bar arrays, moved shapes or the traces of the secondary plots which changed, so the update is
+    proportional to what changed rather than to the size of the figure.
+    :param old: The previous figure (a Figure or a figure dictionary in JSON form).
+    :param new: The new figure (a Figure or a figure dictionary in JSON form).
+    :return: A dictionary with:
+        'restyle': {trace index: {attribute path: new value}} for traces in both figures,
+        'relayout': {attribute path: new value} for the layout, e.g. {'shapes[12].x0': 0.25},
+        'delete_traces': the indices of traces to delete (after restyling), and
+        'add_traces': the traces to append (after deleting).
+    A value of None resets the attribute. Apply it with apply_patch, or convert it with plotly_js_calls to apply it in
+    the browser.
+    """
+    old, new = figure_json(old), figure_json(new)
+    old_data, new_data = old['data'], new['data']
+    n_common = min(len(old_data), len(new_data))
+
+    restyle = {}
+    for i in range(n_common):
+        changes = {}
+        _diff(old_data[i], new_data[i], '', changes)
+        if changes:
+            restyle[i] = changes
+    relayout = {}
+    _diff(old['layout'], new['layout'], '', relayout)
+    return {'restyle': restyle, 'relayout': relayout,
+            'delete_traces': list(range(n_common, len(old_data))),
+            'add_traces': new_data[n_common:]}
+
+
+def _set_path(obj: Dict, path: str, value: Any) -> None:
+    """
+    Set an attribute path such as "shapes[3].x0" in a nested dictionary, creating objects along the way.
+    """
+    tokens = path.split('.')
+    for i, token in enumerate(tokens):
+        match = _PATH_TOKEN.match(token)
+        if match is None:
+            raise ValueError(f'Invalid attribute path: {path}')
+        key, index = match.group(1), match.group(2)
+        last = i == len(tokens) - 1
+        if index is None:
+            if last:
+                if value is None:
+                    obj.pop(key, None)
+                else:
+                    obj[key] = value
+                return
+            obj = obj.setdefault(key, {})
+        else:
+            items = obj.setdefault(key, [])
+            index = int(index)
+            while len(items) <= index:
+                items.append({})
+            if last:
+                items[index] = value
+                return
+            obj = items[index]
+
+
+def apply_patch(fig, patch: Dict) -> Dict:
+    """
+    Apply an update computed by figure_diff to a figure, e.g. to check what the browser will show.
+    :param fig: The figure the update was computed from (a Figure or a figure dictionary in JSON form).
+    :param patch: The update.
+    :return: A new figure dictionary in JSON form. The figure which is passed in is not modified.
+    """
+    fig = copy.deepcopy(figure_json(fig))
+    for index, changes in patch['restyle'].items():
+        for path, value in changes.items():
+            _set_path(fig['data'][int(index)], path, value)
+    for path, value in patch['relayout'].items():
+        _set_path(fig['layout'], path, value)
+    delete = set(patch['delete_traces'])
+    fig['data'] = [trace for i, trace in enumerate(fig['data']) if i not in delete] + copy.deepcopy(
+        patch['add_traces'])
+    return fig
+
+
+def plotly_js_calls(patch: Dict) -> List[List]:
+    """
+    Convert an update computed by figure_diff to the arguments of the plotly.js functions which apply it, in order.
+    Plotly.restyle reads an array value as one value per trace, so every value is wrapped in a list of one (the value
+    for the single trace being restyled), e.g. {'x': [[2, 1]]} sets x to [2, 1].
+    :param patch: An update computed by figure_diff.
+    :return: A list of [function name, *arguments] without the graph div, e.g.
+    [['restyle', {'x': [[2, 1]]}, [0]], ['relayout', {'shapes[1].x0': 4}], ['deleteTraces', [3]], ['addTraces', [...]]].
+    In JavaScript: for (const [name, ...args] of calls) await Plotly[name](gd, ...args);
+    """
+    calls = [['restyle', {path: [value] for path, value in changes.items()}, [int(index)]]
+             for index, changes in patch['restyle'].items()]
+    if patch['relayout']:
+        calls.append(['relayout', patch['relayout']])
+    if patch['delete_traces']:
+        calls.append(['deleteTraces', patch['delete_traces']])
+    if patch['add_traces']:
+        calls.append(['addTraces', patch['add_traces']])
+    return calls
+
+
+def patch_size(patch: Dict) -> int:
+    """
+    :param patch: An update computed by figure_diff.
+    :return: The size of the update as JSON, in bytes.
+    """
+    return len(json.dumps(patch, default=str))
@@ -1,7 +1,14 @@
 import plotly.graph_objs as go
 import plotly.subplots
-from typing import List, Dict, Tuple, Iterable, Optional, Union
-from upsetplotly.set_functions import get_all_intersections, order_sample_intersections
+import pickle
+from typing import List, Dict, Tuple
+# UpSetPlotly lives in upsetplotly.core, which does not need plotly. it is imported here for backwards compatibility.
+from upsetplotly.core import UpSetPlotly  # noqa: F401
+from upsetplotly.core import check_max_points
+
+
+# pickled master figures by (n_samples, rows). see master_figure.
+_master_figure_templates = {}
 
 
 def get_rgb_tuple(color: str) -> Tuple[int]:
@@ -20,131 +27,24 @@ def get_rgb_tuple(color: str) -> Tuple[int]:
     return rgb_color
 
 
-class UpSetPlotly:
-    def __init__(self, samples: List[Iterable], sample_names: List[str] = None):
-
-        if sample_names:
-            if not len(samples) == len(sample_names):
-                raise ValueError('the length of samples and sample_names must be equal.')
-        else:
-            # if there are no names provided, use sequential integers starting at 1
-            sample_names = [str(x) for x in range(1, len(samples) + 1)]
-
-        self.samples = [set(x) for x in samples]
-        self.sample_names = sample_names
-        self.sample_data = {sample: data for sample, data in zip(sample_names, samples)}
-        self.intersections = get_all_intersections(self.samples, self.sample_names)
-        self.intersections = [x for x in self.intersections if x['n'] > 0]  # drop any empty intersections
-        self.n_plotted_intersections: int = 0
-        self.all_elements = set()
-        self.all_elements.update(*self.samples)
-        self.n_rows = 2
-        self.additional_data = []
-        self.fig: go.Figure = None
-
-    def add_secondary_plot(self, data: dict, label: str, plot_type: str = 'box') -> None:
-        """
-        Add data to generate a secondary plot above the bar chart. Can be called more than once to add multiple plots.
-        :param data: A dictionary which maps values to elements found in the sample sets
-        :param label: The label to use in the plot.
-        :param plot_type:
-        :return: None
-        """
-        if plot_type not in ['box', 'violin', 'swarm']:
-            raise ValueError('plot_type must be one of {box, violin, swarm}')
-        provided_elements = set(list(data.keys()))
-        if len(self.all_elements - provided_elements) > 0:
-            raise ValueError('There are elements in the provided samples which are missing in the secondary '
-                             'data to plot. Check the data or, to ignore the missing data and plot anyway, '
-                             'pass ignore_missing as True.')
-        self.additional_data.append({'type': plot_type, 'data': data, 'label': label})
-        self.n_rows += 1
-
-    def plot(self, show_fig: bool = True, return_fig: bool = False,
-             intersection_limit: str = None,
-             order_by: str = None,
-             color: str = None) -> Optional[go.Figure]:
-        """
-        Create the UpSetPlot.
-        :param show_fig: Whether or not to show the figure.
-        :param return_fig: Whether or not to return the Figure object.
-        :param intersection_limit: A string indicating a limit on how small an intersection to plot. Must be of this
-        form: "by_sample [a float between 0 and 1]" or "by_total [a float between 0 and 1]". For example, if you
-        give "by_sample 0.05", then any intersection which is 5% or greater of any sample will be displayed. If you
-        were to give "by_total 0.05", then any intersection which is 5% or greater of the total number of unique
-        elements would be displayed.
-        :param order_by: If the intersections should be ordered according to size. Must be one of
-        {increasing, decreasing}
-        :return:
-        """
-        if color is None:
-            color = '#636efa'
-
-        if order_by:
-            if order_by not in ['increasing', 'decreasing']:
-                raise ValueError('order_by must be one of {increasing, decreasing}')
-            intersections = order_sample_intersections(self.intersections, by=order_by)
-        else:
-            intersections = self.intersections
-
-        if intersection_limit:
-            cutoff = float(intersection_limit.split(' ')[1])
-            if intersection_limit.startswith('by_total'):
-                new_intersections = []
-                total = len(self.all_elements)
-
-                for intersect in intersections:
-                    if intersect['n'] / total >= cutoff:
-                        new_intersections.append(intersect)
-                intersections = new_intersections
-
-            elif intersection_limit.startswith('by_sample'):
-                new_intersections = []
-
-                for intersect in intersections:
-                    keep = False
-                    for sample in intersect['samples']:
-                        if intersect['n'] / len(self.sample_data[sample]) >= cutoff:
-                            keep = True
-                            break
-                    if keep:
-                        new_intersections.append(intersect)
-                intersections = new_intersections
-            else:
-                raise ValueError('intersection_limit must start with "by_total" or "by_sample". See docstring for '
-                                 'details.')
-
-            if len(intersections) == 0:
-                raise RuntimeError('After filtering by intersection size there is no data to plot. Refine the value '
-                                   'of "intersection_limit".')
-
-        rows = 2 + len(self.additional_data)
-        barplot_row = rows - 1
-        intersection_row = rows
-        self.fig = master_figure(n_samples=len(self.sample_names),
-                                 rows=rows)
-        add_intersect_bar_subplot(self.fig, intersections, row=barplot_row, color=color)
-        add_rows_to_sample_table(self.fig, self.sample_names, row=intersection_row)
-        add_circles_and_bars(self.fig, intersections, self.sample_names, row=intersection_row, color=color)
-        for i in range(len(self.additional_data)):
-            data = self.additional_data[i]
-            add_additional_plot(self.fig,
-                                data=data['data'],
-                                label=data['label'],
-                                intersections=intersections,
-                                plot_type=data['type'],
-                                row=i+1,
-                                color=color)
-        self.n_plotted_intersections = len(intersections)
-        if show_fig:
-            self.fig.show()
-        if return_fig:
-            return self.fig
+def master_figure(n_samples: int, rows: int = 2) -> go.Figure:
+    """
+    Return a plotly.graph_objs.Figure with 2 subplots (2 rows, 1 column). The layout is only built once for each
+    combination of n_samples and rows. After that, a fresh copy of the prebuilt template is returned, which is much
+    faster than laying out the subplots again.
+    :param n_samples: The number of samples involved.
+    :param rows: The number of subplot rows to create.
+    :return:
+    """
+    key = (n_samples, rows)
+    if key not in _master_figure_templates:
+        _master_figure_templates[key] = pickle.dumps(build_master_figure(n_samples, rows))
+    return pickle.loads(_master_figure_templates[key])
 
 
-def master_figure(n_samples: int, rows: int = 2) -> go.Figure:
+def build_master_figure(n_samples: int, rows: int = 2) -> go.Figure:
     """
-    Return a plotly.graph_objs.Figure with 2 subplots (2 rows, 1 column).
+    Build the figure returned by master_figure from scratch.
     :param n_samples: The number of samples involved.
     :param rows: The number of subplot rows to create.
     :return:
@@ -168,7 +68,8 @@ def master_figure(n_samples: int, rows: int = 2) -> go.Figure:
 
 
 def add_intersect_bar_subplot(fig: go.Figure, intersections: List[Dict], row: int = 1, col: int = 1,
-                              color: str = '#636efa'):
+                              color: str = '#636efa', customdata: List = None, hovertext: List[str] = None,
+                              error_bounds: List[Tuple[float, float]] = None):
     """
     Add the intersect bar chart to the master figure (i.e. a figure with 2x2 subplots).
     :param fig: The plotly.graph_object.Figure object to add the subplot to
@@ -176,13 +77,24 @@ def add_intersect_bar_subplot(fig: go.Figure, intersections: List[Dict], row: in
     :param row: The row of the subplot to be added.
     :param col: The column of the subplot to be added.
     :param color: Color of the bars
+    :param customdata: Data to attach to each bar, e.g. the signature of its intersection.
+    :param hovertext: Extra text shown when hovering over each bar.
+    :param error_bounds: The (lower bound, upper bound) of each bar, if the sizes are estimates. They are shown as
+    error bars.
     :return:
     """
     color = get_rgb_tuple(color)
     color = f'rgb{color}'
     numbers = [x['n'] for x in intersections]
     labels = [' & '.join(x['samples']) for x in intersections]
-    fig.add_trace(go.Bar(x=labels, y=numbers, marker=dict(color=color)), row=row, col=col)
+    error_y = None
+    if error_bounds is not None:
+        error_y = dict(type='data', symmetric=False,
+                       array=[max(0, high - n) for n, (_, high) in zip(numbers, error_bounds)],
+                       arrayminus=[max(0, n - low) for n, (low, _) in zip(numbers, error_bounds)])
+    fig.add_trace(go.Bar(x=labels, y=numbers, marker=dict(color=color), customdata=customdata, hovertext=hovertext,
+                         error_y=error_y),
+                  row=row, col=col)
 
 
 def get_row_locations(n: int) -> List[Tuple[float, float]]:
@@ -207,6 +119,25 @@ def get_bar_locations(n: int) -> List[Tuple[float, float]]:
     return bins
 
 
+def add_shapes(fig: go.Figure, shapes: List[dict], row: int = 1, col: int = 1):
+    """
+    Add many shapes to a subplot at once. Figure.add_shape validates and updates the whole layout on every call, which
+    gets very slow with thousands of shapes, so instead the shapes are assigned to the layout in a single update.
+    :param fig: The figure to modify.
+    :param shapes: A list of shape dictionaries. Their xref and yref will be set to the axes of the subplot.
+    :param row: The row of the subplot the shapes belong to.
+    :param col: The column of the subplot the shapes belong to.
+    :return:
+    """
+    subplot = fig.get_subplot(row, col)
+    xref = subplot.yaxis.anchor
+    yref = subplot.xaxis.anchor
+    for shape in shapes:
+        shape['xref'] = xref
+        shape['yref'] = yref
+    fig.layout.shapes = fig.layout.shapes + tuple(shapes)
+
+
 def add_rows_to_sample_table(fig: go.Figure, names: List[str], row: int = 2, col: int = 1):
     """
     Add striped rows and sample names to the "table" part of the figure.
@@ -218,16 +149,16 @@ def add_rows_to_sample_table(fig: go.Figure, names: List[str], row: int = 2, col
     """
     row_colors = ['#ebf0f8', '#ced2d9']
     bins = get_row_locations(len(names))
+    shapes = []
     # add the alternating rows
     for i in range(len(names)):
-        fig.add_shape(dict(type='rect', x0=0, x1=1, y0=bins[i][0], y1=bins[i][1],
-                           line_width=0, fillcolor=row_colors[i % 2]),
-                      row=row, col=col)
+        shapes.append(dict(type='rect', x0=0, x1=1, y0=bins[i][0], y1=bins[i][1],
+                           line_width=0, fillcolor=row_colors[i % 2]))
     # add white lines between them
     for i in range(0, len(bins) - 1):
-        fig.add_shape(dict(type='line', x0=0, x1=1, y0=bins[i][0], y1=bins[i][0],
-                           line=dict(width=1, color='white')),
-                      row=row, col=col)
+        shapes.append(dict(type='line', x0=0, x1=1, y0=bins[i][0], y1=bins[i][0],
+                           line=dict(width=1, color='white')))
+    add_shapes(fig, shapes, row=row, col=col)
     fig.update_xaxes(range=[0, 1], row=row, col=col)
     fig.update_yaxes(range=[0, 1], row=row, col=col)
     # add y-axis tick labels
@@ -307,7 +238,11 @@ def add_circles_and_bars(fig: go.Figure, intersections: List[dict], names: List[
     col_bins = get_bar_locations(n_intersects)
     col_centers = [(x[0] + x[1]) / 2 for x in col_bins]
 
-    # now we iterate through the intersections and add the circles and bars to the figure
+    # the style of the glyphs only depends on the color, so make it once and only change the coordinates
+    bar_style = vbar_shape(x_center=0, y0=0, y1=0, width=0, color=color)
+    circle_style = circle_shape(x_center=0, y_center=0, width=0, height=0, color=color)
+
+    # now we iterate through the intersections and collect the circles and bars to add to the figure
     shapes = []
     for i in range(n_intersects):
         samples = intersections[i]['samples']
@@ -317,25 +252,26 @@ def add_circles_and_bars(fig: go.Figure, intersections: List[dict], names: List[
         # add bars
         min_y = min(y_locs)
         max_y = max(y_locs)
-        fig.add_shape(vbar_shape(x_center=x_center,
-                                 y0=min_y,
-                                 y1=max_y,
-                                 width=width*0.5,
-                                 color=color),
-                      row=row, col=col)
+        shapes.append(dict(bar_style,
+                           x0=x_center - 0.25 * width,
+                           x1=x_center + 0.25 * width,
+                           y0=min_y,
+                           y1=max_y))
 
         # add circles
         for y_loc in y_locs:
-            fig.add_shape(circle_shape(x_center=x_center,
-                                       y_center=y_loc,
-                                       width=width,
-                                       height=height,
-                                       color=color),
-                          row=row, col=col)
+            shapes.append(dict(circle_style,
+                               x0=x_center - 0.5 * width,
+                               x1=x_center + 0.5 * width,
+                               y0=y_loc - 0.5 * height,
+                               y1=y_loc + 0.5 * height))
+    add_shapes(fig, shapes, row=row, col=col)
 
 
 def add_additional_plot(fig: go.Figure, data: dict, label: str, intersections: List[Dict],
-                        plot_type: str = 'box', row: int = 2, col: int = 1, color:str = '#636efa'):
+                        plot_type: str = 'box', row: int = 2, col: int = 1, color:str = '#636efa',
+                        aggregate: bool = False, max_outliers: int = 100, max_points: int = None,
+                        values: List = None):
     """
     Add an additional plot to the UpSetPlot.
     :param fig: The figure being modified.
@@ -345,8 +281,20 @@ def add_additional_plot(fig: go.Figure, data: dict, label: str, intersections: L
     :param plot_type: The type of plot to add. Must be one of {box, violin, swarm}.
     :param row: The row of the subplot to be modified.
     :param col: The column of the subplot to be modified.
+    :param aggregate: If True, draw all the intersections in a single trace. See add_aggregated_plot.
+    :param max_outliers: The maximum number of outliers drawn per box when aggregate is True.
+    :param max_points: The maximum number of values drawn per intersection in violin and swarm plots. Requires
+    aggregate to be True.
+    :param values: The values of each intersection (lists or arrays), in the order of intersections. If given, they are
+    used instead of looking up every element in data.
     :return: None
     """
+    check_max_points(max_points, aggregate)
+    if aggregate:
+        add_aggregated_plot(fig, data=data, label=label, intersections=intersections, plot_type=plot_type,
+                            row=row, col=col, color=color, max_outliers=max_outliers, max_points=max_points,
+                            values=values)
+        return
 
     color = get_rgb_tuple(color)
     color = f'rgb{color}'
@@ -361,7 +309,10 @@ def add_additional_plot(fig: go.Figure, data: dict, label: str, intersections: L
     for i in range(n_intersections):
         intersection = intersections[i]
         x_loc = col_centers[i]
-        data_to_plot = [data[x] for x in intersection['elements']]
+        if values is not None:
+            data_to_plot = values[i]
+        else:
+            data_to_plot = [data[x] for x in intersection['elements']]
         if plot_type == 'box':
             box_width = 1 / n_intersections * 0.8
             fig.add_trace(go.Box(x=[x_loc]*len(data_to_plot),
@@ -390,3 +341,95 @@ def add_additional_plot(fig: go.Figure, data: dict, label: str, intersections: L
                                  jitter=0.6,
                                  pointpos=0),
                           row=row, col=col)
+
+
+def add_aggregated_plot(fig: go.Figure, data: dict, label: str, intersections: List[Dict],
+                        plot_type: str = 'box', row: int = 2, col: int = 1, color: str = '#636efa',
+                        max_outliers: int = 100, max_points: int = None, seed: int = 0, values: List = None):
+    """
+    Add an additional plot to the UpSetPlot using one trace for all intersections. Box plots are drawn from quartiles
+    and whiskers computed in advance, plus a single scatter trace holding at most max_outliers outliers per box, so
+    the figure does not carry every value. Violin and swarm plots need the raw values, but they can be downsampled
+    to max_points values per intersection. Swarm plots are drawn as a WebGL scatter with the jitter computed here.
+    Requires numpy.
+    :param fig: The figure being modified.
+    :param data: The data to be added. A dictionary of data values keyed by element.
+    :param label: The label to be used for the y-axis.
+    :param intersections: The intersection data in the UpSetPlot.
+    :param plot_type: The type of plot to add. Must be one of {box, violin, swarm}.
+    :param row: The row of the subplot to be modified.
+    :param col: The column of the subplot to be modified.
+    :param color: The color of the plot.
+    :param max_outliers: The maximum number of outliers drawn per box.
+    :param max_points: The maximum number of values drawn per intersection in violin and swarm plots. If None, all
+    values are drawn.
+    :param seed: Seed for the downsampling and the jitter of swarm plots.
+    :param values: The values of each intersection (lists or arrays), in the order of intersections. If given, they are
+    used instead of looking up every element in data.
+    :return: None
+    """
+    try:
+        import numpy as np
+        from upsetplotly.numpy_functions import grouped_box_stats, grouped_sample
+    except ImportError:
+        raise ImportError('Aggregated secondary plots require numpy. Install it with "pip install UpSetPlotly[numpy]".')
+
+    color = get_rgb_tuple(color)
+    color = f'rgb{color}'
+
+    if plot_type not in ['box', 'violin', 'swarm']:
+        raise ValueError('plot_type must be one of {box, violin, swarm}')
+    n_intersections = len(intersections)
+    col_bins = get_bar_locations(n_intersections)
+    col_centers = np.array([(x[0] + x[1]) / 2 for x in col_bins])
+    fig.update_yaxes(title_text=label, row=row, col=col)
+
+    if values is not None:
+        sizes = [len(x) for x in values]
+        values = np.concatenate([np.asarray(x, dtype=float) for x in values]) if values else np.empty(0)
+    else:
+        sizes = [x['n'] for x in intersections]
+        values = np.fromiter((data[x] for intersection in intersections for x in intersection['elements']),
+                             dtype=float, count=sum(sizes))
+
+    if plot_type == 'box':
+        stats = grouped_box_stats(values, sizes, max_outliers=max_outliers)
+        fig.add_trace(go.Box(x=col_centers,
+                             q1=stats['q1'],
+                             median=stats['median'],
+                             q3=stats['q3'],
+                             lowerfence=stats['lowerfence'],
+                             upperfence=stats['upperfence'],
+                             width=1 / n_intersections * 0.8,
+                             boxpoints=False,
+                             marker=dict(color=color),
+                             line=dict(color=color, width=1.5)
+                             ),
+                      row=row, col=col)
+        fig.add_trace(go.Scatter(x=col_centers[stats['outlier_groups']],
+                                 y=stats['outlier_values'],
+                                 mode='markers',
+                                 marker=dict(color=color, size=4),
+                                 hoverinfo='y'),
+                      row=row, col=col)
+    else:
+        positions = np.repeat(col_centers, sizes)
+        if max_points is not None:
+            keep = grouped_sample(sizes, max_points, seed=seed)
+            positions, values = positions[keep], values[keep]
+
+        if plot_type == 'violin':
+            fig.add_trace(go.Violin(x=positions,
+                                    y=values,
+                                    marker=dict(color=color),
+                                    line=dict(color=color, width=1.5)
+                                    ),
+                          row=row, col=col)
+        else:
+            jitter = (np.random.default_rng(seed).random(len(positions)) - 0.5) * 0.6 / n_intersections
+            fig.add_trace(go.Scattergl(x=positions + jitter,
+                                       y=values,
+                                       mode='markers',
+                                       marker={'color': color, 'size': 4},
+                                       hoverinfo='y'),
+                          row=row, col=col)
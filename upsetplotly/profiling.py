@@ -0,0 +1,126 @@
+from typing import Dict, Callable
+from contextlib import contextmanager
+from contextvars import ContextVar
+import time
+
+# the profilers which are currently collecting, and the stages which are currently running. stages are only timed if
+# at least one profiler is active, so the instrumentation costs next to nothing otherwise. for the same reason,
+# tracemalloc is only imported once a profiler is used.
+_active_profilers: ContextVar[tuple] = ContextVar('upsetplotly_profilers', default=())
+_running_stages: ContextVar[tuple] = ContextVar('upsetplotly_stages', default=())
+
+
+class Profiler:
+    def __init__(self, callback: Callable[[Dict], None] = None, track_memory: bool = False):
+        """
+        Collect the wall time, item count and (optionally) memory use of every stage run while the profiler is active.
+        Use it as a context manager:
+
+            with Profiler() as profiler:
+                usp = UpSetPlotly(samples, names)
+                usp.plot(show_fig=False)
+            print(profiler.summary())
+
+        :param callback: A function called with the record of each stage as soon as the stage finishes, e.g. to feed
+        the numbers into a monitoring system.
+        :param track_memory: Whether or not to measure memory with tracemalloc. This slows everything down
+        considerably, so only use it to find where memory goes.
+        """
+        self.callback = callback
+        self.track_memory = track_memory
+        self.records = []
+        self._token = None
+        self._started_tracing = False
+
+    def __enter__(self) -> 'Profiler':
+        import tracemalloc
+        if self.track_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+        self._token = _active_profilers.set(_active_profilers.get() + (self,))
+        return self
+
+    def __exit__(self, *exc) -> None:
+        import tracemalloc
+        _active_profilers.reset(self._token)
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    def _record(self, record: Dict) -> None:
+        self.records.append(record)
+        if self.callback is not None:
+            self.callback(record)
+
+    def totals(self) -> Dict[str, Dict]:
+        """
+        Add up the records of each stage. Stages are identified by their path, e.g. "plot/bar_trace", so a stage run
+        inside another one is never counted twice.
+        :return: A dictionary mapping each path to {'calls': int, 'wall_time': float, 'n_items': int,
+        'memory_peak': int}. 'memory_peak' is the largest peak over all calls, or None if memory was not tracked.
+        """
+        totals = {}
+        for record in self.records:
+            total = totals.setdefault(record['path'], {'calls': 0, 'wall_time': 0.0, 'n_items': 0,
+                                                       'memory_peak': None})
+            total['calls'] += 1
+            total['wall_time'] += record['wall_time']
+            total['n_items'] += record.get('n_items') or 0
+            if record['memory_peak'] is not None:
+                total['memory_peak'] = max(total['memory_peak'] or 0, record['memory_peak'])
+        return totals
+
+    def summary(self) -> str:
+        """
+        :return: A table of the totals of each stage, in the order the stages were first run.
+        """
+        lines = [f'{"stage":<40} {"calls":>6} {"time (s)":>10} {"items":>10} {"peak memory":>12}']
+        for path, total in self.totals().items():
+            memory = '' if total['memory_peak'] is None else f'{total["memory_peak"] / 1e6:.1f} MB'
+            lines.append(f'{path:<40} {total["calls"]:>6} {total["wall_time"]:>10.4f} {total["n_items"]:>10} '
+                         f'{memory:>12}')
+        return '\n'.join(lines)
+
+
+@contextmanager
+def stage(name: str, **info):
+    """
+    Mark a stage of work for any active Profiler. The context manager yields a dictionary to which details can be
+    added while the stage runs, most importantly 'n_items', the number of things the stage produced or processed.
+    :param name: The name of the stage.
+    :param info: Any other details to include in the record of the stage.
+    """
+    profilers = _active_profilers.get()
+    if not profilers:
+        yield info
+        return
+
+    import tracemalloc
+    running = _running_stages.get()
+    path = '/'.join([x['name'] for x in running] + [name])
+    current = {'name': name, 'peak': 0}
+    token = _running_stages.set(running + (current,))
+    tracing = tracemalloc.is_tracing() and any(p.track_memory for p in profilers)
+    if tracing:
+        start_memory, peak = tracemalloc.get_traced_memory()
+        # the peak is reset so it can be measured for this stage alone. the enclosing stage remembers its own peak.
+        if running:
+            running[-1]['peak'] = max(running[-1]['peak'], peak)
+        tracemalloc.reset_peak()
+    start = time.perf_counter()
+    try:
+        yield info
+    finally:
+        wall_time = time.perf_counter() - start
+        memory_peak = memory_change = None
+        if tracing:
+            end_memory, peak = tracemalloc.get_traced_memory()
+            peak = max(peak, current['peak'])
+            memory_peak, memory_change = peak - start_memory, end_memory - start_memory
+            if running:
+                running[-1]['peak'] = max(running[-1]['peak'], peak)
+        _running_stages.reset(token)
+        record = dict(info, stage=name, path=path, wall_time=wall_time, memory_peak=memory_peak,
+                      memory_change=memory_change)
+        for profiler in profilers:
+            profiler._record(record)
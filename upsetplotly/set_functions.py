@@ -1,15 +1,547 @@
-from typing import List, Set, Union, Dict
+from typing import List, Set, Union, Dict, Tuple, Iterable, Iterator, Callable, Optional
 import itertools
-from copy import copy
-from tqdm import tqdm
+import heapq
+from collections import Counter
+import os
+from upsetplotly.profiling import stage
 
 
-def get_all_intersections(samples: Union[List[List], List[Set]], names: List[str] = None) -> List[Dict]:
+BACKENDS = ['python', 'numpy', 'disk']
+
+# the number of intersections collected by get_all_intersections between calls of its progress function
+PROGRESS_INTERVAL = 10000
+
+# the samples being processed by get_membership_signatures when n_jobs > 1, and the shard of each of their elements.
+# the worker processes are forked, so they inherit these instead of having every sample pickled and sent to them.
+_shared_samples = None
+_shared_shard_ids = None
+
+
+def group_size(group: Union[Set, int]) -> int:
+    """
+    Get the number of elements in a signature group.
+    :param group: A collection of elements, or just the number of elements if the elements were not kept.
+    :return: The number of elements.
+    """
+    if isinstance(group, int):
+        return group
+    return len(group)
+
+
+def merge_signatures(signature_dicts: Iterable[Dict[int, Union[Set, int]]]) -> Dict[int, Union[Set, int]]:
+    """
+    Merge signature dictionaries computed for disjoint sets of elements (e.g. shards of the same samples).
+    :param signature_dicts: Dictionaries mapping signatures to sets of elements or to numbers of elements.
+    :return: A single dictionary. The groups of a signature found in several dictionaries are combined.
+    """
+    signatures = {}
+    for signature_dict in signature_dicts:
+        for signature, group in signature_dict.items():
+            if signature not in signatures:
+                signatures[signature] = group
+            elif isinstance(group, int):
+                signatures[signature] += group
+            else:
+                # the groups are disjoint, so add the smaller one to the bigger one
+                other = signatures[signature]
+                if len(other) < len(group):
+                    other, group = group, other
+                other |= group
+                signatures[signature] = other
+    return signatures
+
+
+def _get_shard_ids(index: int, start: int, stop: int, n_shards: int):
+    """
+    Assign the elements of a chunk of one sample of _shared_samples to shards.
+    """
+    from upsetplotly import numpy_functions
+    return numpy_functions.shard_ids(_shared_samples[index][start:stop], n_shards)
+
+
+def _get_shard_signatures(shard: int, backend: str, keep_elements: bool, compact: bool, disk_options: Dict):
+    """
+    Get the membership signatures of the elements of _shared_samples assigned to a shard. If compact, the elements are
+    returned in a single array sorted by signature, which is much cheaper to send back than sets.
+    """
+    from upsetplotly import numpy_functions
+    shard_samples = [numpy_functions.take(sample, ids == shard)
+                     for sample, ids in zip(_shared_samples, _shared_shard_ids)]
+    if not keep_elements or not compact:
+        return get_membership_signatures(shard_samples, backend=backend, keep_elements=keep_elements, **disk_options)
+    if backend == 'numpy':
+        elements, groups = numpy_functions.get_compact_signatures(shard_samples)
+    else:
+        elements, groups = numpy_functions.compact_signatures(get_membership_signatures(shard_samples, backend=backend,
+                                                                                        **disk_options))
+    return elements, list(groups), [len(x) for x in groups.values()]
+
+
+def _get_shard_signatures_without_numpy(shard: int, n_shards: int, backend: str, keep_elements: bool,
+                                        disk_options: Dict):
+    shard_samples = [[e for e in sample if hash(e) % n_shards == shard] for sample in _shared_samples]
+    return get_membership_signatures(shard_samples, backend=backend, keep_elements=keep_elements, **disk_options)
+
+
+def get_membership_signatures_parallel(samples: Union[List[List], List[Set]], backend: str = 'python',
+                                       n_jobs: int = -1, keep_elements: bool = True, compact: bool = False,
+                                       memory_budget: int = None, temp_dir: str = None) -> Union[Dict[int, Set], Tuple]:
+    """
+    Get the membership signatures using several processes. Every element is assigned to one shard per process by its
+    hash, so every element and all of its memberships end up in the same shard. The hashing is split between the
+    processes, after which each process takes the elements of its own shard, finds their signatures and sends them
+    back as a single array. The result is identical to get_membership_signatures. Worker processes are forked, so if
+    the platform does not support forking the signatures are computed in this process. Without numpy, every process
+    hashes all elements to find its shard, which limits the speedup.
+    :param samples: A list of lists or sets (the samples).
+    :param backend: The implementation used in each process. Must be one of {python, numpy, disk}.
+    :param n_jobs: The number of processes to use. -1 means one per CPU.
+    :param keep_elements: If False, only the number of elements having each signature is returned.
+    :param compact: If True, return (an array of all elements, a dictionary mapping each signature to a view of the
+    array) like numpy_functions.get_compact_signatures, which skips building sets altogether. Requires numpy.
+    :param memory_budget: For the disk backend, the approximate number of bytes used by all processes together. See
+    get_membership_signatures.
+    :param temp_dir: For the disk backend, the directory in which the partitions are created.
+    :return: A dictionary mapping each signature found in the data to the set of elements having that signature.
+    """
+    global _shared_samples, _shared_shard_ids
+    # imported here, as they are slow to import and only needed for parallel work
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+    try:
+        import numpy as np
+        from upsetplotly import numpy_functions
+    except ImportError:
+        if compact:
+            raise ImportError('compact=True requires numpy. Install it with "pip install UpSetPlotly[numpy]".')
+        numpy_functions = None
+    if n_jobs == -1 or n_jobs is None:
+        n_jobs = os.cpu_count() or 1
+    if n_jobs < 1:
+        raise ValueError('n_jobs must be a positive integer or -1.')
+    compact = compact and keep_elements
+    disk_options = _disk_options(backend, memory_budget, temp_dir)
+    if n_jobs == 1 or 'fork' not in multiprocessing.get_all_start_methods():
+        if compact:
+            return numpy_functions.get_compact_signatures(samples)
+        return get_membership_signatures(samples, backend=backend, keep_elements=keep_elements, **disk_options)
+    if 'memory_budget' in disk_options:
+        # every process spills its own shard, so they share the budget
+        disk_options['memory_budget'] = max(1, memory_budget // n_jobs)
+
+    context = multiprocessing.get_context('fork')
+    # sets are not indexable, so they are listed once. this only copies references.
+    _shared_samples = [x if isinstance(x, (list, tuple)) or hasattr(x, 'dtype') else list(x) for x in samples]
+    try:
+        if numpy_functions is None:
+            with ProcessPoolExecutor(max_workers=n_jobs, mp_context=context) as executor:
+                results = list(executor.map(_get_shard_signatures_without_numpy, range(n_jobs), [n_jobs] * n_jobs,
+                                            [backend] * n_jobs, [keep_elements] * n_jobs, [disk_options] * n_jobs))
+            return merge_signatures(results)
+
+        with stage('sharding', n_items=n_jobs):
+            # every sample is hashed in n_jobs chunks, so the hashing is spread evenly even with few samples
+            chunks = []
+            for i, sample in enumerate(_shared_samples):
+                size = max(1, -(-len(sample) // n_jobs))
+                chunks += [(i, start, start + size) for start in range(0, len(sample), size)]
+            with ProcessPoolExecutor(max_workers=n_jobs, mp_context=context) as executor:
+                chunk_ids = list(executor.map(_get_shard_ids, [x[0] for x in chunks], [x[1] for x in chunks],
+                                              [x[2] for x in chunks], [n_jobs] * len(chunks)))
+            sample_ids = [[np.empty(0, dtype=np.uint16)] for _ in _shared_samples]
+            for (i, _, _), ids in zip(chunks, chunk_ids):
+                sample_ids[i].append(ids)
+            _shared_shard_ids = [np.concatenate(x) for x in sample_ids]
+        # forked after the shards are known, so the workers inherit them
+        with ProcessPoolExecutor(max_workers=n_jobs, mp_context=context) as executor:
+            results = list(executor.map(_get_shard_signatures, range(n_jobs), [backend] * n_jobs,
+                                        [keep_elements] * n_jobs, [keep_elements] * n_jobs, [disk_options] * n_jobs))
+    finally:
+        _shared_samples = _shared_shard_ids = None
+
+    if not keep_elements:
+        return merge_signatures(results)
+    elements, groups = numpy_functions.merge_compact_signatures(results)
+    if compact:
+        return elements, groups
+    return {signature: set(group.tolist()) for signature, group in groups.items()}
+
+
+def get_membership_signatures(samples: Union[List[List], List[Set]], backend: str = 'python',
+                              n_jobs: int = 1, keep_elements: bool = True, memory_budget: int = None,
+                              temp_dir: str = None) -> Dict[int, Set]:
+    """
+    Group the elements of a list of lists or sets by their membership signature. The signature of an element is an
+    integer bitmask in which bit i is set if the element is found in samples[i]. Every element is visited once, so the
+    cost depends on the total number of elements and not on the number of possible intersections.
+    :param samples: A list of lists or sets (the samples).
+    :param backend: The implementation to use. Must be one of {python, numpy, disk}. The numpy backend is several times
+    faster for large samples of numbers but requires numpy to be installed. Strings and other python objects are
+    grouped the same way by both, so they take about as long. The disk backend spills the elements into partitions in a
+    temporary directory so they never all have to be in memory (see io_functions.signatures_out_of_core), which makes
+    sense when the samples are streamed, e.g. from generators reading files.
+    :param n_jobs: The number of processes to use. -1 means one per CPU. See get_membership_signatures_parallel.
+    :param keep_elements: If False, the elements are not kept and each signature is mapped to the number of elements
+    having it instead. This saves a lot of memory when only the sizes of the intersections are needed.
+    :param memory_budget: For the disk backend, the approximate number of bytes to use for buffers and for each
+    partition. If None, the default of io_functions.signatures_out_of_core is used.
+    :param temp_dir: For the disk backend, the directory in which the partitions are created. If None, the system
+    default is used.
+    :return: A dictionary mapping each signature found in the data to the set of elements having that signature.
+    """
+    if backend not in BACKENDS:
+        raise ValueError('backend must be one of {python, numpy, disk}')
+    disk_options = _disk_options(backend, memory_budget, temp_dir)
+    with stage('signatures', backend=backend, n_jobs=n_jobs) as info:
+        signatures = _get_membership_signatures(samples, backend, n_jobs, keep_elements, disk_options)
+        info['n_items'] = len(signatures)
+    return signatures
+
+
+def _get_membership_signatures(samples: Union[List[List], List[Set]], backend: str, n_jobs: int,
+                               keep_elements: bool, disk_options: Dict) -> Dict[int, Set]:
+    if n_jobs != 1:
+        return get_membership_signatures_parallel(samples, backend=backend, n_jobs=n_jobs,
+                                                  keep_elements=keep_elements, **disk_options)
+    if backend == 'numpy':
+        try:
+            from upsetplotly import numpy_functions
+        except ImportError:
+            raise ImportError('The numpy backend requires numpy. Install it with "pip install UpSetPlotly[numpy]" or '
+                              'use backend="python".')
+        return numpy_functions.get_membership_signatures(samples, keep_elements=keep_elements)
+    samples = _python_objects(samples)
+    if backend == 'disk':
+        from upsetplotly.io_functions import signatures_out_of_core
+        pairs = ((element, i) for i, sample in enumerate(samples) for element in sample)
+        return signatures_out_of_core(pairs, sample_names=list(range(len(samples))), keep_elements=keep_elements,
+                                      **disk_options)[1]
+
+    return group_element_signatures(get_element_signatures(samples), keep_elements=keep_elements)
+
+
+def _disk_options(backend: str, memory_budget: Optional[int], temp_dir: Optional[str]) -> Dict:
+    """
+    Check the options of the disk backend, and get them as keyword arguments for signatures_out_of_core.
+    """
+    options = {}
+    if memory_budget is not None:
+        if memory_budget < 1:
+            raise ValueError('memory_budget must be a positive number of bytes.')
+        options['memory_budget'] = memory_budget
+    if temp_dir is not None:
+        options['temp_dir'] = temp_dir
+    if options and backend != 'disk':
+        raise ValueError('memory_budget and temp_dir only apply to backend="disk".')
+    return options
+
+
+def _python_objects(samples: Iterable[Iterable]) -> List[Iterable]:
+    # arrays (e.g. from numpy) are read as python objects, which iterate much faster than numpy scalars and are what the
+    # numpy backend and the parallel workers return, so every backend gives elements of the same types
+    return [x.tolist() if hasattr(x, 'tolist') else x for x in samples]
+
+
+def get_element_signatures(samples: Union[List[List], List[Set]]) -> Dict:
+    """
+    Find the membership signature of every element, in a single pass over the samples.
+    :param samples: A list of lists or sets (the samples).
+    :return: A dictionary mapping each element to its signature.
+    """
+    element_signatures = {}
+    for i, sample in enumerate(samples):
+        bit = 1 << i
+        get = element_signatures.get
+        for element in sample:
+            element_signatures[element] = get(element, 0) | bit
+    return element_signatures
+
+
+def cached_membership_signatures(samples: Union[List[List], List[Set]], names: List[str], cache_dir: str,
+                                 backend: str = 'python', n_jobs: int = 1, keep_elements: bool = True,
+                                 allow_pickle: bool = False, memory_budget: int = None,
+                                 temp_dir: str = None) -> Tuple[Dict[int, Union[Set, int]], Optional[object]]:
+    """
+    Get the membership signatures of a list of samples from an on-disk cache, keyed by a content hash of the samples and
+    names. On a miss they are computed with get_membership_signatures and saved. Requires numpy.
+    :param samples: A list of lists or sets (the samples).
+    :param names: The names of the samples.
+    :param cache_dir: The directory holding the cache.
+    :param backend: The implementation used if the signatures have to be computed. See get_membership_signatures.
+    :param n_jobs: The number of processes used if the signatures have to be computed.
+    :param keep_elements: If False, only the number of elements having each signature is kept.
+    :param allow_pickle: Whether or not to load elements which are not numbers or strings from the cache. They are
+    pickled, and unpickling a file can run arbitrary code, so only allow this if no one else can write to cache_dir.
+    If False, such entries are computed again rather than loaded.
+    :param memory_budget: For the disk backend, the approximate number of bytes to use. See get_membership_signatures.
+    :param temp_dir: For the disk backend, the directory in which the partitions are created.
+    :return: A tuple of (a dictionary mapping each signature to a read-only array of elements, or to a number of
+    elements, the array holding all elements or None if they were not kept). Loaded arrays are memory-mapped where
+    possible, so elements are only read from disk when they are used.
+    """
+    cache_functions = import_cache_functions()
+    with stage('cache') as info:
+        key = cache_functions.hash_samples(samples, names, keep_elements=keep_elements)
+        info['hit'] = cache_functions.is_cached(cache_dir, key)
+        _, signatures, elements = cache_functions.cached_signatures(
+            cache_dir, key, lambda: (names, get_membership_signatures(samples, backend=backend, n_jobs=n_jobs,
+                                                                      keep_elements=keep_elements,
+                                                                      memory_budget=memory_budget, temp_dir=temp_dir)),
+            allow_pickle=allow_pickle)
+        info['n_items'] = len(signatures)
+    return signatures, elements
+
+
+def import_cache_functions():
+    """
+    Import upsetplotly.cache_functions, which needs numpy.
+    """
+    try:
+        from upsetplotly import cache_functions
+    except ImportError:
+        raise ImportError('Caching intersections requires numpy. Install it with "pip install UpSetPlotly[numpy]".')
+    return cache_functions
+
+
+def import_sketch_functions():
+    """
+    Import upsetplotly.sketch_functions, which needs numpy.
+    """
+    try:
+        from upsetplotly import sketch_functions
+    except ImportError:
+        raise ImportError('Sketching samples requires numpy. Install it with "pip install UpSetPlotly[numpy]".')
+    return sketch_functions
+
+
+def group_element_signatures(element_signatures: Dict, keep_elements: bool = True) -> Dict[int, Set]:
+    """
+    Turn a dictionary of element signatures into a dictionary of signature groups.
+    :param element_signatures: A dictionary mapping each element to its membership signature.
+    :param keep_elements: If False, each signature is mapped to the number of elements having it instead.
+    :return: A dictionary mapping each signature to the set of elements having it.
+    """
+    if not keep_elements:
+        return dict(Counter(element_signatures.values()))
+
+    signatures = {}
+    for element, signature in element_signatures.items():
+        if signature in signatures:
+            signatures[signature].add(element)
+        else:
+            signatures[signature] = {element}
+    return signatures
+
+
+def signature_to_samples(signature: int, names: List[str]) -> Tuple[str]:
+    """
+    Get the names of the samples making up a membership signature.
+    :param signature: An integer bitmask in which bit i refers to names[i].
+    :param names: The sample names.
+    :return: A tuple of the sample names, in the same order as names.
+    """
+    return tuple(name for i, name in enumerate(names) if signature >> i & 1)
+
+
+def samples_to_signature(samples: Iterable[str], names: List[str]) -> int:
+    """
+    Get the membership signature of a combination of samples.
+    :param samples: The names of the samples in the combination.
+    :param names: The sample names. Bit i of the signature refers to names[i].
+    :return: An integer bitmask.
+    """
+    signature = 0
+    for sample in samples:
+        if sample not in names:
+            raise ValueError(f'{sample} is not one of the sample names.')
+        signature |= 1 << names.index(sample)
+    return signature
+
+
+def get_sample_sizes(signatures: Dict[int, Set], n_samples: int) -> List[int]:
+    """
+    Get the number of unique elements in each sample from a dictionary of membership signatures.
+    :param signatures: A dictionary mapping signatures to sets of elements, as returned by get_membership_signatures.
+    :param n_samples: The number of samples.
+    :return: A list of sample sizes.
+    """
+    sizes = [0] * n_samples
+    for signature, elements in signatures.items():
+        n = group_size(elements)
+        i = 0
+        while signature:
+            if signature & 1:
+                sizes[i] += n
+            signature >>= 1
+            i += 1
+    return sizes
+
+
+def signature_order_key(signature: int) -> Tuple[int, Tuple[int]]:
+    """
+    Sort key which puts signatures in the same order as the combinations returned by get_all_intersections, i.e. by
+    the number of samples and then by the positions of the samples.
+    :param signature: An integer bitmask.
+    :return: A tuple which can be used as a sort key.
+    """
+    bits = []
+    i = 0
+    while signature:
+        if signature & 1:
+            bits.append(i)
+        signature >>= 1
+        i += 1
+    return len(bits), tuple(bits)
+
+
+def filter_signatures(signatures: Dict[int, Set], names: List[str],
+                      min_size: int = None,
+                      top_k: int = None,
+                      min_degree: int = None,
+                      max_degree: int = None,
+                      required_samples: Iterable[str] = None,
+                      excluded_samples: Iterable[str] = None,
+                      min_total_fraction: float = None,
+                      min_sample_fraction: float = None) -> List[int]:
+    """
+    Select the signatures which pass a set of filters. The filters are applied while the signatures are visited, so
+    no intersection is built unless it will be kept.
+    :param signatures: A dictionary mapping signatures to sets of elements, as returned by get_membership_signatures.
+    :param names: The sample names. Bit i of the signatures refers to names[i].
+    :param min_size: Only keep intersections with at least this many elements.
+    :param top_k: Only keep the k largest intersections. Ties are broken by the default (name) order.
+    :param min_degree: Only keep intersections of at least this many samples.
+    :param max_degree: Only keep intersections of at most this many samples.
+    :param required_samples: Only keep intersections which include all of these samples.
+    :param excluded_samples: Only keep intersections which include none of these samples.
+    :param min_total_fraction: Only keep intersections which are at least this fraction of the total number of unique
+    elements.
+    :param min_sample_fraction: Only keep intersections which are at least this fraction of any of the samples they
+    include.
+    :return: The selected signatures, in the same order as get_all_intersections.
+    """
+    with stage('filtering') as info:
+        selected = _filter_signatures(signatures, names, min_size, top_k, min_degree, max_degree, required_samples,
+                                      excluded_samples, min_total_fraction, min_sample_fraction)
+        info['n_items'] = len(selected)
+    return selected
+
+
+def _filter_signatures(signatures: Dict[int, Set], names: List[str], min_size: Optional[int], top_k: Optional[int],
+                       min_degree: Optional[int], max_degree: Optional[int], required_samples: Optional[Iterable[str]],
+                       excluded_samples: Optional[Iterable[str]], min_total_fraction: Optional[float],
+                       min_sample_fraction: Optional[float]) -> List[int]:
+    required = samples_to_signature(required_samples, names) if required_samples else 0
+    excluded = samples_to_signature(excluded_samples, names) if excluded_samples else 0
+    if min_total_fraction is not None:
+        total = sum(group_size(x) for x in signatures.values())
+    if min_sample_fraction is not None:
+        sample_sizes = get_sample_sizes(signatures, len(names))
+
+    selected = []
+    for signature, elements in signatures.items():
+        n = group_size(elements)
+        if n == 0:
+            continue
+        if min_size is not None and n < min_size:
+            continue
+        if signature & required != required or signature & excluded:
+            continue
+        if min_degree is not None or max_degree is not None:
+            degree = bin(signature).count('1')
+            if min_degree is not None and degree < min_degree:
+                continue
+            if max_degree is not None and degree > max_degree:
+                continue
+        if min_total_fraction is not None and n / total < min_total_fraction:
+            continue
+        if min_sample_fraction is not None:
+            smallest = min(size for i, size in enumerate(sample_sizes) if signature >> i & 1)
+            if n / smallest < min_sample_fraction:
+                continue
+        selected.append(signature)
+
+    if top_k is not None:
+        # a bounded heap keeps this at O(n log k). ties are broken in favour of the default order.
+        selected = heapq.nsmallest(top_k, selected,
+                                   key=lambda x: (-group_size(signatures[x]), signature_order_key(x)))
+    selected.sort(key=signature_order_key)
+    return selected
+
+
+def intersections_from_signatures(signatures: Dict[int, Set], names: List[str], **filters) -> Iterator[Dict]:
+    """
+    Yield the intersections described by a dictionary of membership signatures. Only signatures which occur in the
+    data are visited, so nothing is done for the (possibly very many) empty intersections.
+    :param signatures: A dictionary mapping signatures to sets of elements, as returned by get_membership_signatures.
+    :param names: The sample names. Bit i of the signatures refers to names[i].
+    :param filters: Keyword arguments passed to filter_signatures, e.g. min_size or top_k.
+    :return: A generator of dictionaries of form {'samples': [samples], 'elements': [elements unique to these samples],
+    'n': [number of elements]}, in the same order as get_all_intersections. If the signatures only hold the number of
+    elements, 'elements' is None.
+    """
+    for signature in filter_signatures(signatures, names, **filters):
+        elements = signatures[signature]
+        if isinstance(elements, int):
+            yield {'samples': signature_to_samples(signature, names), 'elements': None, 'n': elements}
+        else:
+            yield {'samples': signature_to_samples(signature, names), 'elements': elements, 'n': len(elements)}
+
+
+def iter_intersections(samples: Union[List[List], List[Set]], names: List[str] = None,
+                       backend: str = 'python', n_jobs: int = 1, memory_budget: int = None, temp_dir: str = None,
+                       **filters) -> Iterator[Dict]:
+    """
+    Get the elements unique to each non-empty intersection of a list of lists or sets. Unlike get_all_intersections,
+    the possible combinations of samples are never enumerated, so this is feasible for many more samples.
+    :param samples: A list of lists or sets (the samples). These are the sets of elements which will be compared.
+    :param names: Names for the respective samples. They must be unique. If None, sequential integers will be used.
+    :param backend: The implementation used to find the intersections. Must be one of {python, numpy, disk}.
+    :param n_jobs: The number of processes used to find the intersections. -1 means one per CPU.
+    :param memory_budget: For the disk backend, the approximate number of bytes to use. See get_membership_signatures.
+    :param temp_dir: For the disk backend, the directory in which the partitions are created.
+    :param filters: Keyword arguments passed to filter_signatures, e.g. min_size or top_k.
+    :return: A generator of dictionaries of form {'samples': [samples], 'elements': [elements unique to these samples],
+    'n': [number of elements]}, in the same order as get_all_intersections.
+    """
+    if names:
+        if not len(samples) == len(names):
+            raise ValueError('the length of samples and names must be equal.')
+    else:
+        names = [str(x) for x in range(1, len(samples) + 1)]
+
+    signatures = get_membership_signatures(samples, backend=backend, n_jobs=n_jobs, memory_budget=memory_budget,
+                                           temp_dir=temp_dir)
+    return intersections_from_signatures(signatures, names, **filters)
+
+
+def get_all_intersections(samples: Union[List[List], List[Set]], names: List[str] = None,
+                          backend: str = 'python', n_jobs: int = 1,
+                          progress: Union[bool, Callable[[int, int], None]] = False,
+                          cache_dir: str = None, sketch_size: int = None, allow_pickle: bool = False,
+                          memory_budget: int = None, temp_dir: str = None) -> List[Dict]:
     """
     Get the elements unique to all possible intersections of a list of lists or sets. Lists will automatically be
     converted to sets.
     :param samples: A list of lists or sets (the samples). These are the sets of elements which will be compared.
     :param names: Names for the respective samples. They must be unique. If None, sequential integers will be used.
+    :param backend: The implementation used to find the intersections. Must be one of {python, numpy, disk}.
+    :param n_jobs: The number of processes used to find the intersections. -1 means one per CPU.
+    :param progress: How to report progress while the possible intersections are collected. If True, a tqdm progress
+    bar is shown, which requires tqdm. If a function, it is called with (number of intersections collected, number of
+    possible intersections) every PROGRESS_INTERVAL intersections and at the end. If False, nothing is reported.
+    :param cache_dir: If given, the intersections are saved in this directory, keyed by a hash of the samples and
+    names, and loaded from it when the same samples are seen again. The elements are then read-only numpy arrays
+    rather than sets, including for the intersections without any element. Requires numpy. See
+    cached_membership_signatures.
+    :param sketch_size: If given, the sizes of the intersections are estimated from a sketch of this many hashes per
+    sample (see sketch_functions.SampleSketch) rather than computed exactly, which takes constant memory per sample.
+    'elements' is then None, and each intersection also has 'bounds', a tuple of (lower bound, upper bound) of its size
+    which holds about 95% of the time. Requires numpy.
+    :param allow_pickle: Whether or not elements which are not numbers or strings may be loaded from cache_dir, which
+    unpickles them. Only allow this if no one else can write to cache_dir. See cached_membership_signatures.
+    :param memory_budget: For the disk backend, the approximate number of bytes to use. See get_membership_signatures.
+    :param temp_dir: For the disk backend, the directory in which the partitions are created.
     :return: A list of dictionaries of form {'samples': [samples], 'elements': [elements unique to these samples],
     'n': [number of elements]}
     """
@@ -20,45 +552,61 @@ def get_all_intersections(samples: Union[List[List], List[Set]], names: List[str
     else:
         # if there are no names provided, use sequential integers starting at 1
         names = [str(x) for x in range(1, len(samples) + 1)]
-    names_set = set(names)
-
-    # put the samples in a dictionary, making sure everything is sets
-    sets = {name: set(x) for name, x in zip(names, samples)}
-
-    # get all possible combinations of samples
-    possible_intersects = []
-    for i in range(1, len(samples) + 1):
-        possible_intersects += list(itertools.combinations(names, i))
-    #possible_intersects = [list(x) for x in possible_intersects]
-
-    # now get a list that is the compliment, i.e. the samples not in each possible combination
-    compliment_sets = []
-    for intersect in possible_intersects:
-        compliment_sets.append(tuple(names_set - set(intersect)))  # as a tuple to be consistent
-    if len(possible_intersects) > 10000:
-        disable_tqdm = False
+
+    # group the elements by the samples they are found in. each group is exactly the set of elements unique to
+    # one intersection, so all that is left is to put them in order.
+    bounds = None
+    empty = set()
+    if sketch_size is not None:
+        sketch_functions = import_sketch_functions()
+        with stage('sketch', k=sketch_size) as info:
+            signatures, bounds, theta = sketch_functions.sketch_signatures(samples, k=sketch_size)
+            info['n_items'] = len(signatures)
+        unseen_bounds = sketch_functions.estimate_bounds(0, theta)
+    elif cache_dir is not None:
+        signatures, elements = cached_membership_signatures(samples, names, cache_dir, backend=backend, n_jobs=n_jobs,
+                                                            allow_pickle=allow_pickle, memory_budget=memory_budget,
+                                                            temp_dir=temp_dir)
+        # an empty slice of the same array, so every intersection holds the same type
+        empty = elements[:0]
     else:
-        disable_tqdm = True
-    # and now get the actual intersections
-    intersects = []
-    for intersect in tqdm(possible_intersects, desc='Calculating possible intersections', disable=disable_tqdm):
-        intersect = list(intersect)
-        intersect.sort(key=lambda x: len(sets[x]))
-        S = copy(sets[intersect[0]])
-        for name in intersect[1:]:
-            S &= sets[name]
-        intersects.append(S)
-
-    # remove any elements found in the compliment sets
-    for i in tqdm(range(len(intersects)), desc='Removing elements found in complimentary sets', disable=disable_tqdm):
-        intersect = copy(intersects[i])
-        compliment = compliment_sets[i]
-        for c_s in compliment:
-            intersect = intersect - sets[c_s]
-        intersects[i] = intersect
-
-    out = [{'samples': intersect, 'elements': elements, 'n': len(elements)}
-           for intersect, elements in zip(possible_intersects, intersects)]
+        signatures = get_membership_signatures(samples, backend=backend, n_jobs=n_jobs, memory_budget=memory_budget,
+                                               temp_dir=temp_dir)
+
+    n_possible = 2 ** len(samples) - 1
+    pbar = None
+    if progress is True:
+        try:
+            from tqdm import tqdm
+        except ImportError:
+            raise ImportError('progress=True requires tqdm. Install it with "pip install UpSetPlotly[progress]" or '
+                              'pass a function as progress.')
+        pbar = tqdm(total=n_possible, desc='Collecting possible intersections')
+
+        def progress(done: int, total: int) -> None:
+            pbar.update(done - pbar.n)
+
+    out = []
+    with stage('enumeration') as info:
+        for i in range(1, len(samples) + 1):
+            for combination in itertools.combinations(range(len(samples)), i):
+                signature = 0
+                for j in combination:
+                    signature |= 1 << j
+                if bounds is not None:
+                    out.append({'samples': tuple(names[j] for j in combination), 'elements': None,
+                                'n': signatures.get(signature, 0), 'bounds': bounds.get(signature, unseen_bounds)})
+                else:
+                    elements = signatures.get(signature, empty)
+                    out.append({'samples': tuple(names[j] for j in combination), 'elements': elements,
+                                'n': len(elements)})
+                if progress and len(out) % PROGRESS_INTERVAL == 0:
+                    progress(len(out), n_possible)
+        info['n_items'] = len(out)
+    if progress:
+        progress(len(out), n_possible)
+    if pbar is not None:
+        pbar.close()
     return out
 
 
@@ -67,15 +615,15 @@ def order_sample_intersections(intersects: List[Dict], by: str = 'decreasing') -
     Order the list of dictionaries returned by get_all_intersects.
     :param intersects: A list of dictionaries returned by get_all_intersects
     :param by: How to order the list. Must be one of {'name', 'increasing', 'decreasing'}.
-    :return:
+    :return: A new, ordered list. The list which is passed in is not modified.
     """
     if by == 'name':
         # the return value from get_all_intersects is already in order by name, so for now we do nothing.
-        return intersects
+        return list(intersects)
     if by == 'increasing':
-        intersects.sort(key=lambda x: x['n'])
+        intersects = sorted(intersects, key=lambda x: x['n'])
     elif by == 'decreasing':
-        intersects.sort(key=lambda x: x['n'], reverse=True)
+        intersects = sorted(intersects, key=lambda x: x['n'], reverse=True)
     else:
         raise ValueError("'by' must be one of {'name', 'increasing', 'decreasing'}.")
     return intersects
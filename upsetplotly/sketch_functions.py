@@ -0,0 +1,293 @@
+from typing import List, Dict, Tuple, Iterable, Union
+import hashlib
+import itertools
+import math
+import numpy as np
+from upsetplotly.numpy_functions import _as_array, _mix
+
+# the default number of hashes kept by a sketch. the relative standard error of an estimate from m retained hashes is
+# about 1 / sqrt(m), so a sample sketched with 4096 hashes is estimated to within about 1.6%.
+DEFAULT_SKETCH_SIZE = 4096
+
+# the number of elements hashed at a time when a sketch is updated from an iterator, which keeps memory constant
+_CHUNK_SIZE = 1 << 16
+
+# a hash is kept if it is below the threshold of the sketch. 2 ** 64 keeps every hash.
+_FULL = 1 << 64
+
+# tags mixed into the hashes, so e.g. the string "1" and the integer 1 hash differently
+_NUMBER_TAG, _TEXT_TAG, _BYTES_TAG, _OBJECT_TAG = 1, 2, 3, 4
+
+
+def _hash_native(arr: np.ndarray, seed: int) -> np.ndarray:
+    """
+    Hash the elements of an array with a numeric or text dtype.
+    """
+    kind = arr.dtype.kind
+    if kind in 'biu':
+        words, tag = [arr.astype(np.int64).view(np.uint64)], _NUMBER_TAG
+    elif kind == 'f':
+        arr = arr.astype(np.float64)
+        with np.errstate(invalid='ignore'):
+            integral = (arr == np.floor(arr)) & (np.abs(arr) < 2.0 ** 63)
+        words = [np.where(integral, arr.astype(np.int64, casting='unsafe').view(np.uint64), arr.view(np.uint64))]
+        tag = _NUMBER_TAG
+    else:
+        # the array is padded to the longest element with zeros, which are skipped so the padding does not change
+        # the hash
+        n_words = (arr.dtype.itemsize + 7) // 8
+        raw = np.zeros((len(arr), n_words * 8), dtype=np.uint8)
+        raw[:, :arr.dtype.itemsize] = np.ascontiguousarray(arr).view(np.uint8).reshape(len(arr), arr.dtype.itemsize)
+        words = list(raw.view('<u8').T)
+        tag = _TEXT_TAG if kind == 'U' else _BYTES_TAG
+
+    hashes = _mix(np.full(len(arr), seed * 8 + tag, dtype=np.uint64))
+    for word in words:
+        mixed = _mix(hashes ^ word)
+        hashes = np.where(word != 0, mixed, hashes) if kind in 'US' else mixed
+    return _mix(hashes)
+
+
+def _hash_objects(values: List, seed: int) -> np.ndarray:
+    """
+    Hash elements which are not numbers or strings by their repr.
+    """
+    digests = [hashlib.blake2b(repr(x).encode(), digest_size=8).digest() for x in values]
+    word = np.frombuffer(b''.join(digests), dtype='<u8')
+    return _mix(_mix(np.full(len(values), seed * 8 + _OBJECT_TAG, dtype=np.uint64)) ^ word)
+
+
+def _element_type(x) -> str:
+    if isinstance(x, (int, np.integer)):
+        # bools are ints. ints which do not fit in 64 bits are hashed by their repr, like in an array of them.
+        return 'int' if -2 ** 63 <= x < 2 ** 63 else 'object'
+    if isinstance(x, (float, np.floating)):
+        return 'float'
+    if isinstance(x, str):
+        return 'str'
+    if isinstance(x, bytes):
+        return 'bytes'
+    return 'object'
+
+
+_NATIVE_DTYPES = {'int': np.int64, 'float': np.float64, 'str': str, 'bytes': bytes}
+
+
+def hash_elements(elements: Iterable, seed: int = 0) -> np.ndarray:
+    """
+    Hash elements to 64 bit integers. The hash of an element only depends on the element and the seed (not on the
+    other elements, the dtype of the array or the process), so sketches built on different machines can be merged.
+    Numbers which compare equal in python (e.g. 1 and 1.0) hash the same. Elements which are not numbers or strings are
+    hashed by their repr, which is slower.
+    :param elements: A list, set or array of elements.
+    :param seed: The seed of the hash function.
+    :return: An array of unsigned 64 bit integers.
+    """
+    arr = _as_array(elements)
+    if arr.dtype.kind == 'u' and len(arr) > 0 and arr.max() >= 2 ** 63:
+        arr = arr.astype(object)
+    if arr.dtype.kind in 'biufUS':
+        return _hash_native(arr, seed)
+
+    # elements of different types (or of other types) are grouped by type, and each group is hashed the way an array
+    # of only that type would be
+    values = arr.tolist()
+    groups = {}
+    for i, x in enumerate(values):
+        groups.setdefault(_element_type(x), []).append(i)
+    hashes = np.empty(len(values), dtype=np.uint64)
+    for element_type, indices in groups.items():
+        group = [values[i] for i in indices]
+        if element_type == 'object':
+            hashes[indices] = _hash_objects(group, seed)
+        else:
+            hashes[indices] = _hash_native(np.array(group, dtype=_NATIVE_DTYPES[element_type]), seed)
+    return hashes
+
+
+class SampleSketch:
+    def __init__(self, k: int = DEFAULT_SKETCH_SIZE, seed: int = 0):
+        """
+        A constant-memory summary of the distinct elements of a sample (a theta sketch). It keeps the k smallest hashes
+        of the elements, which are a uniform random sample of them. Sketches of different samples made with the same
+        seed are coordinated: an element which is kept in one sketch is kept in every sketch of a sample containing
+        it, so the sizes of all intersections can be estimated from the sketches (see estimate_signatures).
+        Sketches can be updated incrementally, and sketches of parts of a sample (e.g. from different nodes) merged.
+        :param k: The number of hashes to keep. The memory used is 8 * k bytes.
+        :param seed: The seed of the hash function. Only sketches with the same seed can be combined.
+        """
+        if k < 1:
+            raise ValueError('k must be a positive integer.')
+        self.k = k
+        self.seed = seed
+        # every hash below the threshold is in hashes, sorted
+        self.threshold = _FULL
+        self.hashes = np.empty(0, dtype=np.uint64)
+
+    @property
+    def theta(self) -> float:
+        """
+        The probability with which an element of the sample is kept. 1 means the sketch is exact.
+        """
+        return self.threshold / _FULL
+
+    def _add_hashes(self, hashes: np.ndarray) -> None:
+        if self.threshold < _FULL:
+            hashes = hashes[hashes < np.uint64(self.threshold)]
+        hashes = np.concatenate([self.hashes, hashes])
+        if len(hashes) > 2 * (self.k + 1):
+            # only the k + 1 smallest hashes can be kept, so the rest need not be sorted. there may be fewer distinct
+            # ones among them if there are duplicates, in which case everything is sorted after all.
+            smallest = hashes[hashes <= np.partition(hashes, self.k)[self.k]]
+            smallest = np.unique(smallest)
+            hashes = smallest if len(smallest) > self.k else np.unique(hashes)
+        else:
+            hashes = np.unique(hashes)
+        if len(hashes) > self.k:
+            self.threshold = int(hashes[self.k])
+            hashes = hashes[:self.k]
+        self.hashes = hashes
+
+    def update(self, elements: Iterable) -> 'SampleSketch':
+        """
+        Add elements to the sketch. Adding an element twice has no effect.
+        :param elements: A list, set, array or iterator of elements. Iterators are read in chunks, so they may be
+        larger than memory.
+        :return: The sketch itself.
+        """
+        if isinstance(elements, (list, tuple, set, frozenset, np.ndarray)):
+            self._add_hashes(hash_elements(elements, seed=self.seed))
+            return self
+        iterator = iter(elements)
+        while True:
+            chunk = list(itertools.islice(iterator, _CHUNK_SIZE))
+            if not chunk:
+                return self
+            self._add_hashes(hash_elements(chunk, seed=self.seed))
+
+    def merge(self, other: 'SampleSketch') -> 'SampleSketch':
+        """
+        Add the elements summarized by another sketch, e.g. of another part of the same sample.
+        :param other: A sketch made with the same seed.
+        :return: The sketch itself.
+        """
+        if other.seed != self.seed:
+            raise ValueError('Only sketches with the same seed can be merged.')
+        self.k = min(self.k, other.k)
+        # hashes at or above the threshold of the other sketch may be missing from it, so they are dropped from this
+        # one too. otherwise the truncation in _add_hashes could raise the threshold above hashes which were never seen.
+        if other.threshold < self.threshold:
+            self.threshold = other.threshold
+            self.hashes = self.hashes[self.hashes < np.uint64(self.threshold)]
+        self._add_hashes(other.hashes)
+        return self
+
+    def estimate(self) -> float:
+        """
+        :return: The estimated number of distinct elements in the sample.
+        """
+        return len(self.hashes) / self.theta
+
+    def bounds(self, n_std: float = 2.0) -> Tuple[float, float]:
+        """
+        :param n_std: The number of standard deviations the bounds are apart from the estimate. 2 gives bounds which
+        hold about 95% of the time.
+        :return: A tuple of (lower bound, upper bound) of the number of distinct elements.
+        """
+        return estimate_bounds(len(self.hashes), self.theta, n_std)
+
+    def to_bytes(self) -> bytes:
+        """
+        :return: The sketch as bytes, e.g. to send it to another node. See from_bytes.
+        """
+        header = np.array([self.k, self.seed, self.threshold - 1], dtype=np.uint64)
+        return header.astype('<u8').tobytes() + self.hashes.astype('<u8').tobytes()
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> 'SampleSketch':
+        """
+        :param data: Bytes returned by to_bytes.
+        :return: The sketch.
+        """
+        words = np.frombuffer(data, dtype='<u8')
+        if len(words) < 3:
+            raise ValueError('The data is not a sketch.')
+        sketch = cls(k=int(words[0]), seed=int(words[1]))
+        sketch.threshold = int(words[2]) + 1
+        sketch.hashes = words[3:].astype(np.uint64)
+        return sketch
+
+
+def estimate_bounds(n_retained: int, theta: float, n_std: float = 2.0) -> Tuple[float, float]:
+    """
+    Bound the number of elements of which n_retained were kept, each with probability theta. The number kept is
+    binomial, so its standard deviation is about sqrt(n_retained * (1 - theta)).
+    :param n_retained: The number of elements which were kept.
+    :param theta: The probability with which each element was kept.
+    :param n_std: The number of standard deviations the bounds are apart from the estimate.
+    :return: A tuple of (lower bound, upper bound). The lower bound is never below n_retained, which were all seen.
+    """
+    estimate = n_retained / theta
+    error = n_std * math.sqrt(max(n_retained, 1) * (1 - theta)) / theta
+    return max(float(n_retained), estimate - error), estimate + error
+
+
+def sketch_samples(samples: Iterable[Iterable], k: int = DEFAULT_SKETCH_SIZE, seed: int = 0) -> List[SampleSketch]:
+    """
+    Sketch each of a list of samples.
+    :param samples: A list of lists, sets, arrays or iterators (the samples).
+    :param k: The number of hashes kept by each sketch. See SampleSketch.
+    :param seed: The seed of the hash function.
+    :return: A list of sketches, one per sample.
+    """
+    return [SampleSketch(k=k, seed=seed).update(sample) for sample in samples]
+
+
+def estimate_signatures(sketches: List[SampleSketch],
+                        n_std: float = 2.0) -> Tuple[Dict[int, int], Dict[int, Tuple[float, float]], float]:
+    """
+    Estimate the number of elements having each membership signature from sketches of the samples. Every hash below the
+    smallest threshold of the sketches is known to be in exactly the sketches holding it, so the signatures of these
+    hashes are a uniform sample of the signatures of all elements.
+    :param sketches: A sketch of each sample, all made with the same seed. Bit i of the signatures refers to
+    sketches[i].
+    :param n_std: The number of standard deviations the bounds are apart from the estimates.
+    :return: A tuple of (a dictionary mapping each signature found in the sketches to its estimated number of elements,
+    a dictionary mapping each of these signatures to (lower bound, upper bound), the probability with which each element
+    was sampled). If no sketch was full, the probability is 1 and the numbers are exact. Signatures which were not
+    found may still have up to estimate_bounds(0, probability, n_std)[1] elements.
+    """
+    if len({sketch.seed for sketch in sketches}) > 1:
+        raise ValueError('Only sketches with the same seed can be combined.')
+    threshold = min((sketch.threshold for sketch in sketches), default=_FULL)
+    theta = threshold / _FULL
+
+    hash_signatures = {}
+    for i, sketch in enumerate(sketches):
+        bit = 1 << i
+        hashes = sketch.hashes if threshold == _FULL else sketch.hashes[sketch.hashes < np.uint64(threshold)]
+        get = hash_signatures.get
+        for h in hashes.tolist():
+            hash_signatures[h] = get(h, 0) | bit
+
+    counts = {}
+    for signature in hash_signatures.values():
+        counts[signature] = counts.get(signature, 0) + 1
+    estimates = {signature: int(round(n / theta)) for signature, n in counts.items()}
+    bounds = {signature: estimate_bounds(n, theta, n_std) for signature, n in counts.items()}
+    return estimates, bounds, theta
+
+
+def sketch_signatures(samples: Union[List[Iterable], List[SampleSketch]], k: int = DEFAULT_SKETCH_SIZE,
+                      seed: int = 0,
+                      n_std: float = 2.0) -> Tuple[Dict[int, int], Dict[int, Tuple[float, float]], float]:
+    """
+    Estimate the number of elements having each membership signature, sketching the samples first if needed.
+    :param samples: A list of samples, or of sketches of the samples.
+    :param k: The number of hashes kept by each sketch. Ignored for samples which are already sketched.
+    :param seed: The seed of the hash function. Ignored for samples which are already sketched.
+    :param n_std: The number of standard deviations the bounds are apart from the estimates.
+    :return: See estimate_signatures.
+    """
+    sketches = [x if isinstance(x, SampleSketch) else SampleSketch(k=k, seed=seed).update(x) for x in samples]
+    return estimate_signatures(sketches, n_std=n_std)
@@ -0,0 +1,42 @@
+import json
+import pytest
+from upsetplotly import UpSetPlotly
+from upsetplotly.batch import plot_batch
+
+JOBS = [
+    {'samples': [[1, 2, 3, 4], [2, 3, 4], [2, 5, 6]], 'sample_names': ['a', 'b', 'c'], 'name': 'first'},
+    {'samples': [[1, 2], [2, 3]], 'plot': {'order_by': 'decreasing'}, 'name': 'second',
+     'secondary_plots': [{'data': {1: 1.0, 2: 2.0, 3: 3.0}, 'label': 'value'}]},
+    {'samples': [[1, 2, 3], [3, 4], [4, 5], [5, 1]], 'plot': {'max_intersections': 3}},
+]
+
+
+def expected_json(job):
+    usp = UpSetPlotly(job['samples'], job.get('sample_names'))
+    for secondary_plot in job.get('secondary_plots', []):
+        usp.add_secondary_plot(**secondary_plot)
+    return json.loads(usp.plot(show_fig=False, return_fig=True, **job.get('plot', {})).to_json())
+
+
+@pytest.mark.parametrize('n_jobs', [1, 2])
+def test_plot_batch(n_jobs):
+    figs = plot_batch(JOBS, n_jobs=n_jobs)
+    assert [json.loads(fig.to_json()) for fig in figs] == [expected_json(job) for job in JOBS]
+    # the figures built from the shared layouts must not affect each other
+    assert len(figs[0].data) == 1 and len(figs[2].data) == 1
+
+
+def test_plot_batch_output_dir(tmp_path):
+    paths = plot_batch(JOBS, n_jobs=2, output='json', output_dir=str(tmp_path))
+    assert paths == [str(tmp_path / 'first.json'), str(tmp_path / 'second.json'), str(tmp_path / '2.json')]
+    with open(paths[1]) as f:
+        assert json.load(f) == expected_json(JOBS[1])
+    html = plot_batch(JOBS[:1], output='html')[0]
+    assert html.startswith('<div') and '<html>' not in html
+
+
+def test_plot_batch_errors():
+    with pytest.raises(ValueError):
+        plot_batch([{'samples': [[1]], 'color': 'red'}])
+    with pytest.raises(ValueError):
+        plot_batch(JOBS, output='figure', output_dir='out')
@@ -0,0 +1,82 @@
+import json
+import os
+import pytest
+from upsetplotly import UpSetPlotly, Profiler
+from upsetplotly.set_functions import get_all_intersections
+
+np = pytest.importorskip('numpy')
+from upsetplotly.cache_functions import hash_samples, load_signatures  # noqa: E402
+
+SAMPLES = [[1, 2, 3, 4], [2, 3, 4], [2, 5, 6]]
+NAMES = ['a', 'b', 'c']
+
+
+def test_hash_samples():
+    key = hash_samples(SAMPLES, NAMES)
+    assert key == hash_samples([set(reversed(x)) for x in SAMPLES], NAMES)
+    assert key != hash_samples(SAMPLES, ['a', 'b', 'd'])
+    assert key != hash_samples([[1, 2, 3], [2, 3, 4], [2, 5, 6]], NAMES)
+    assert key != hash_samples(SAMPLES, NAMES, keep_elements=False)
+    assert hash_samples([['x', (1, 2)], ['y']], NAMES[:2]) == hash_samples([[(1, 2), 'x'], ['y']], NAMES[:2])
+
+
+def test_cached_plot(tmp_path):
+    expected = json.loads(UpSetPlotly(SAMPLES, NAMES).plot(show_fig=False, return_fig=True).to_json())
+    for hit in [False, True]:
+        with Profiler() as profiler:
+            usp = UpSetPlotly(SAMPLES, NAMES, cache_dir=str(tmp_path))
+        assert [x['hit'] for x in profiler.records if x['stage'] == 'cache'] == [hit]
+        assert json.loads(usp.plot(show_fig=False, return_fig=True).to_json()) == expected
+    assert isinstance(usp.elements, np.memmap)
+    assert len(os.listdir(tmp_path)) == 1
+
+    # counts only is a different entry
+    usp = UpSetPlotly(SAMPLES, NAMES, cache_dir=str(tmp_path), keep_elements=False)
+    usp = UpSetPlotly(SAMPLES, NAMES, cache_dir=str(tmp_path), keep_elements=False)
+    assert not usp.keep_elements and usp.signatures == {1: 1, 3: 2, 4: 2, 7: 1}
+    assert len(os.listdir(tmp_path)) == 2
+
+
+def test_cached_get_all_intersections(tmp_path):
+    expected = get_all_intersections(SAMPLES, NAMES)
+    for _ in range(2):
+        out = get_all_intersections(SAMPLES, NAMES, cache_dir=str(tmp_path))
+        assert [(x['samples'], x['n'], set(x['elements'])) for x in out] == \
+               [(x['samples'], x['n'], x['elements']) for x in expected]
+        # the intersections without elements hold an empty array too
+        assert all(isinstance(x['elements'], np.ndarray) for x in out)
+
+
+def test_cached_python_objects(tmp_path):
+    # 1 == 1.0 == True, so the types have to be compared as well
+    def typed(out):
+        return [(x['samples'], sorted((type(e).__name__, repr(e)) for e in x['elements'].tolist())) for x in out]
+
+    samples = [[1, 2.5, (1, 2)], [True, (1, 2)]]
+    expected = typed([dict(x, elements=np.array(list(x['elements']), dtype=object))
+                      for x in get_all_intersections(samples)])
+    assert expected[0] == (('1',), [('float', '2.5')])
+    for allow_pickle in [False, False, True]:
+        assert typed(get_all_intersections(samples, cache_dir=str(tmp_path), allow_pickle=allow_pickle)) == expected
+    assert len(os.listdir(tmp_path)) == 1
+
+    # the elements are pickled, which is only loaded when allowed
+    directory = str(tmp_path / os.listdir(tmp_path)[0])
+    with pytest.raises(ValueError):
+        load_signatures(directory)
+    assert load_signatures(directory, allow_pickle=True)[0] == ['1', '2']
+    usp = UpSetPlotly(samples, cache_dir=str(tmp_path))
+    assert usp.get_intersection_elements(['1', '2']).tolist() == [1, (1, 2)] or \
+        usp.get_intersection_elements(['1', '2']).tolist() == [(1, 2), 1]
+
+
+def test_cached_from_file(tmp_path):
+    path = tmp_path / 'pairs.tsv'
+    path.write_text('p1\ta\np2\ta\np2\tb\np3\tb\n')
+    cache_dir = str(tmp_path / 'cache')
+    first = UpSetPlotly.from_file(str(path), cache_dir=cache_dir)
+    second = UpSetPlotly.from_file(str(path), cache_dir=cache_dir)
+    assert second.sample_names == first.sample_names == ['a', 'b']
+    assert {k: set(v.tolist()) for k, v in second.signatures.items()} == {1: {'p1'}, 2: {'p3'}, 3: {'p2'}}
+    path.write_text('p1\ta\n')
+    assert UpSetPlotly.from_file(str(path), cache_dir=cache_dir).signatures.keys() == {1}
@@ -0,0 +1,93 @@
+import gzip
+import pytest
+from upsetplotly import UpSetPlotly
+from upsetplotly.set_functions import get_membership_signatures
+from upsetplotly.io_functions import signatures_from_pairs, signatures_from_file, signatures_from_membership_table, \
+    signatures_out_of_core
+
+samples = [['1', '2', '3', '4'], ['2', '3', '4'], ['2', '5', '6']]
+names = ['a', 'b', 'c']
+pairs = [(element, name) for sample, name in zip(samples, names) for element in sample]
+
+
+def test_signatures_from_pairs():
+    expected = get_membership_signatures(samples)
+    assert signatures_from_pairs(pairs) == (names, expected)
+    assert signatures_from_pairs(pairs + pairs[:3], chunksize=2) == (names, expected)
+    # the given sample names set the order of the bits
+    assert signatures_from_pairs(pairs, sample_names=['c', 'b', 'a'])[1] == \
+        get_membership_signatures(samples[::-1])
+    assert signatures_from_pairs(pairs, keep_elements=False)[1] == {0b001: 1, 0b011: 2, 0b111: 1, 0b100: 2}
+    with pytest.raises(ValueError):
+        signatures_from_pairs(pairs, sample_names=['a', 'b'])
+
+
+def test_signatures_from_file(tmp_path):
+    path = tmp_path / 'pairs.tsv.gz'
+    with gzip.open(path, 'wt') as f:
+        f.write('sample\telement\n')
+        f.writelines(f'{name}\t{element}\n' for element, name in pairs)
+    assert signatures_from_file(str(path), element_column=1, sample_column=0, header=True, chunksize=4) == \
+        (names, get_membership_signatures(samples))
+
+
+def test_signatures_from_membership_table(tmp_path):
+    rows = [['1', 1, 0, 0], ['2', 1, 1, 1], ['3', 1, 1, 0], ['4', 1, 1, 0], ['5', 0, 0, 1], ['6', 0, 0, 1]]
+    expected = (names, get_membership_signatures(samples))
+    assert signatures_from_membership_table(rows, sample_names=names) == expected
+
+    path = tmp_path / 'table.csv'
+    path.write_text('peptide,a,b,c\n' + ''.join(f'{r[0]},{r[1]},{r[2]},{bool(r[3])}\n' for r in rows))
+    assert signatures_from_membership_table(str(path), sep=',') == expected
+    with pytest.raises(ValueError):
+        signatures_from_membership_table(rows)
+
+
+def test_upsetplotly_constructors(tmp_path):
+    expected = UpSetPlotly(samples, names).intersections
+    assert UpSetPlotly.from_pairs(iter(pairs)).intersections == expected
+
+    path = tmp_path / 'pairs.tsv'
+    path.write_text(''.join(f'{element}\t{name}\n' for element, name in pairs))
+    assert UpSetPlotly.from_file(str(path)).intersections == expected
+    assert UpSetPlotly.from_file(str(path), keep_elements=False).sample_sizes == {'a': 4, 'b': 3, 'c': 3}
+
+
+def test_signatures_out_of_core(tmp_path):
+    many_samples = [[f'e{x}' for x in range(i, 3000, i + 1)] for i in range(5)]
+    many_pairs = [(element, str(i)) for i, sample in enumerate(many_samples) for element in sample]
+    expected = get_membership_signatures(many_samples)
+    # a tiny budget forces the partitions to be split again
+    assert signatures_out_of_core(many_pairs, memory_budget=10000, n_partitions=4, temp_dir=str(tmp_path))[1] == \
+        expected
+    assert list(tmp_path.iterdir()) == []
+    assert signatures_from_pairs(many_pairs, keep_elements=False, memory_budget=2 ** 20)[1] == \
+        get_membership_signatures(many_samples, keep_elements=False)
+    assert get_membership_signatures(many_samples, backend='disk') == expected
+
+
+def test_disk_backend_options(tmp_path, monkeypatch):
+    from upsetplotly import io_functions
+    from upsetplotly.set_functions import get_all_intersections, iter_intersections
+    calls = []
+
+    def recording(*args, **kwargs):
+        calls.append(kwargs)
+        return signatures_out_of_core(*args, **kwargs)
+
+    monkeypatch.setattr(io_functions, 'signatures_out_of_core', recording)
+    expected = get_all_intersections(samples, names)
+    options = {'memory_budget': 10000, 'temp_dir': str(tmp_path)}
+    assert get_all_intersections(samples, names, backend='disk', **options) == expected
+    assert list(iter_intersections(samples, names, backend='disk', **options)) == \
+        [x for x in expected if x['n'] > 0]
+    assert UpSetPlotly(samples, names, backend='disk', **options).intersections == \
+        [x for x in expected if x['n'] > 0]
+    assert len(calls) == 3
+    assert all(x['memory_budget'] == 10000 and x['temp_dir'] == str(tmp_path) for x in calls)
+    assert get_membership_signatures(samples, backend='disk', n_jobs=2, memory_budget=10000) == \
+        get_membership_signatures(samples)
+    with pytest.raises(ValueError):
+        get_membership_signatures(samples, memory_budget=10000)
+    with pytest.raises(ValueError):
+        UpSetPlotly(samples, names, backend='numpy', compact=True, temp_dir=str(tmp_path))
@@ -0,0 +1,133 @@
+import itertools
+import random
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from upsetplotly.set_functions import get_all_intersections, get_membership_signatures, \
+    get_membership_signatures_parallel
+from upsetplotly.numpy_functions import encode_elements, grouped_box_stats, grouped_sample, get_compact_signatures, \
+    compact_signatures
+from upsetplotly import UpSetPlotly
+
+
+def test_numpy_backend_matches_python():
+    names = ['a', 'b', 'c']
+    samples = [[1, 2, 3, 4], [2, 3, 4], [2, 5, 6]]
+    assert get_all_intersections(samples, names, backend='numpy') == get_all_intersections(samples, names)
+
+    rng = random.Random(0)
+    samples = [[''.join(rng.choices('abcdef', k=3)) for _ in range(rng.randint(50, 300))] for _ in range(6)]
+    assert get_all_intersections(samples, backend='numpy') == get_all_intersections(samples)
+
+
+def test_numpy_backend_many_samples():
+    # more than 64 samples needs signatures wider than a uint64
+    samples = [set(range(i, i + 5)) for i in range(70)]
+    assert get_membership_signatures(samples, backend='numpy') == get_membership_signatures(samples)
+
+
+def test_encode_elements_keeps_element_types():
+    # numpy would turn these into strings, so they must be kept as objects
+    elements, ids = encode_elements([[1, 'a'], ['a', 'b']])
+    assert set(elements.tolist()) == {1, 'a', 'b'}
+    assert [elements[x].tolist() for x in ids] == [[1, 'a'], ['a', 'b']]
+    assert get_membership_signatures([[1, 'a'], ['a', 'b']], backend='numpy') == {0b01: {1}, 0b11: {'a'}, 0b10: {'b'}}
+
+
+def test_numpy_backend_keeps_numbers_distinct():
+    # ints above 2 ** 53 would be rounded in a float array, and int64 with uint64 only fits in floats too
+    samples = [[2 ** 60], [2 ** 60 + 1, 0.5]]
+    assert get_membership_signatures(samples, backend='numpy') == get_membership_signatures(samples)
+    samples = [np.array([2 ** 63, 1], dtype=np.uint64), np.array([-1, 1])]
+    assert get_membership_signatures(samples, backend='numpy') == {0b01: {2 ** 63}, 0b10: {-1}, 0b11: {1}}
+
+
+def test_numpy_backend_nans():
+    # a NaN only equals itself, so the same NaN object is one element but two NaNs are two, as in a python set
+    nan = float('nan')
+    for make_samples, expected in [(lambda: [[nan, 1.0], [nan]], {0b01: 1, 0b11: 1}),
+                                   (lambda: [[float('nan'), 1.0], [float('nan')]], {0b01: 2, 0b10: 1}),
+                                   (lambda: [np.array([np.nan, 1.0]), np.array([np.nan])], {0b01: 2, 0b10: 1}),
+                                   (lambda: [(x for x in [nan, 2.0]), [nan]], {0b01: 1, 0b11: 1})]:
+        for backend in ['python', 'numpy']:
+            signatures = get_membership_signatures(make_samples(), backend=backend)
+            assert {x: len(y) for x, y in signatures.items()} == expected
+        assert {x: len(y) for x, y in get_compact_signatures(make_samples())[1].items()} == expected
+
+
+def typed(elements):
+    # 1 == 1.0 == True, so the types have to be compared as well
+    return sorted((type(x).__name__, x) for x in elements)
+
+
+def test_compact_keeps_element_types():
+    samples = [[1, 2.5, 3], [3, False]]
+    expected = typed(itertools.chain.from_iterable(get_membership_signatures(samples).values()))
+    assert expected == [('bool', False), ('float', 2.5), ('int', 1), ('int', 3)]
+    for backend in ['python', 'numpy']:
+        assert typed(UpSetPlotly(samples, compact=True, backend=backend).elements.tolist()) == expected
+        assert typed(get_membership_signatures(samples, backend=backend)[0b01]) == [('float', 2.5), ('int', 1)]
+    assert typed(compact_signatures(get_membership_signatures(samples))[0].tolist()) == expected
+    assert typed(get_compact_signatures(samples)[0].tolist()) == expected
+    assert compact_signatures({1: {1, 2}, 2: {3}})[0].dtype.kind == 'i'
+
+
+def test_numpy_backend_strings():
+    samples = [['PEPTIDEA', 'PEPTIDEB'], {'PEPTIDEB', 'PEPTIDEC'}, np.array(['PEPTIDEC', 'PEPTIDED'])]
+    expected = get_membership_signatures(samples)
+    assert get_membership_signatures(samples, backend='numpy') == expected
+    assert get_membership_signatures(samples, backend='numpy', keep_elements=False) == \
+        {x: len(y) for x, y in expected.items()}
+    elements, groups = get_compact_signatures(samples)
+    assert elements.dtype.kind == 'U'
+    assert {x: set(y.tolist()) for x, y in groups.items()} == expected
+
+
+def test_parallel_shards():
+    samples = [np.arange(1000), np.arange(500, 2000, 3), np.arange(100, dtype=float), np.array(['a', 'b']),
+               [2 ** 70, 5]]
+    for backend in ['python', 'numpy']:
+        for keep_elements in [True, False]:
+            assert (get_membership_signatures(samples, backend=backend, n_jobs=3, keep_elements=keep_elements) ==
+                    get_membership_signatures(samples, backend=backend, keep_elements=keep_elements))
+    mixed = [[1, 2.5, 3], [3, 4, True], np.arange(3)]
+    for backend in ['python', 'numpy', 'disk']:
+        for n_jobs in [1, 2]:
+            usp = UpSetPlotly(mixed, ['a', 'b', 'c'], backend=backend, n_jobs=n_jobs)
+            assert [typed(x['elements']) for x in usp.intersections] == \
+                [[('float', 2.5)], [('int', 4)], [('int', 0), ('int', 2)], [('int', 3)], [('int', 1)]]
+    elements, groups = get_membership_signatures_parallel(samples[:3], 'numpy', n_jobs=3, compact=True)
+    assert {x: set(group.tolist()) for x, group in groups.items()} == get_membership_signatures(samples[:3])
+    assert sum(len(x) for x in groups.values()) == len(elements)
+
+
+def test_unknown_backend():
+    with pytest.raises(ValueError):
+        get_all_intersections([[1], [2]], backend='fortran')
+
+
+def test_grouped_box_stats_matches_percentile():
+    rng = np.random.default_rng(0)
+    groups = [rng.normal(size=n) for n in [1, 2, 10, 500, 0, 37]]
+    stats = grouped_box_stats(np.concatenate(groups), [len(x) for x in groups], max_outliers=2)
+    for i, group in enumerate(groups):
+        if len(group) == 0:
+            assert np.isnan(stats['median'][i])
+            continue
+        q1, median, q3 = np.percentile(group, [25, 50, 75])
+        limit = 1.5 * (q3 - q1)
+        inside = group[(group >= q1 - limit) & (group <= q3 + limit)]
+        assert np.allclose([stats['q1'][i], stats['median'][i], stats['q3'][i]], [q1, median, q3])
+        assert stats['lowerfence'][i] == inside.min()
+        assert stats['upperfence'][i] == inside.max()
+        assert (stats['outlier_groups'] == i).sum() == min(2, len(group) - len(inside))
+
+
+def test_grouped_sample():
+    sizes = [3, 0, 50, 10]
+    keep = grouped_sample(sizes, 10, seed=1)
+    groups = np.repeat(np.arange(4), sizes)[keep]
+    assert np.bincount(groups, minlength=4).tolist() == [3, 0, 10, 10]
+    assert len(np.unique(keep)) == len(keep)
+    assert np.array_equal(keep, grouped_sample(sizes, 10, seed=1))
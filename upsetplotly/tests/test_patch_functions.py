@@ -0,0 +1,81 @@
+import copy
+import pytest
+from upsetplotly import UpSetPlotly
+from upsetplotly.patch_functions import figure_diff, apply_patch, figure_json, plotly_js_calls, _set_path
+
+SAMPLES = [{1, 2, 3, 4, 7}, {2, 3, 4, 8}, {2, 5, 6, 9, 10, 11}]
+NAMES = ['a', 'b', 'c']
+VALUES = {x: x / 2 for x in range(1, 12)}
+
+
+def test_figure_diff():
+    old = {'data': [{'x': [1, 2], 'y': [3, 4], 'marker': {'color': 'red'}}, {'x': [0]}],
+           'layout': {'shapes': [{'x0': 0, 'x1': 1}, {'x0': 2, 'x1': 3}], 'title': {'text': 't'}}}
+    new = {'data': [{'x': [2, 1], 'y': [3, 4], 'marker': {'color': 'red', 'opacity': 0.5}}],
+           'layout': {'shapes': [{'x0': 0, 'x1': 1}, {'x0': 4, 'x1': 3}]}}
+    patch = figure_diff(old, new)
+    assert patch == {'restyle': {0: {'x': [2, 1], 'marker.opacity': 0.5}},
+                     'relayout': {'shapes[1].x0': 4, 'title': None},
+                     'delete_traces': [1], 'add_traces': []}
+    assert apply_patch(old, patch) == new
+    assert figure_diff(new, new) == {'restyle': {}, 'relayout': {}, 'delete_traces': [], 'add_traces': []}
+
+
+def apply_plotly_js_calls(fig, calls):
+    # what plotly.js does with the calls: restyle takes one value per trace from every array it is given
+    fig = copy.deepcopy(fig)
+    for name, *args in calls:
+        if name == 'restyle':
+            update, traces = args
+            for j, index in enumerate(traces):
+                for path, value in update.items():
+                    _set_path(fig['data'][index], path, value[j % len(value)] if isinstance(value, list) else value)
+        elif name == 'relayout':
+            for path, value in args[0].items():
+                _set_path(fig['layout'], path, value)
+        elif name == 'deleteTraces':
+            fig['data'] = [trace for i, trace in enumerate(fig['data']) if i not in args[0]]
+        else:
+            fig['data'] = fig['data'] + args[0]
+    return fig
+
+
+def test_plotly_js_calls():
+    old = {'data': [{'x': [1, 2], 'y': [3, 4]}, {'x': [0]}], 'layout': {'shapes': [{'x0': 0}]}}
+    new = {'data': [{'x': [2, 1], 'y': [3, 4], 'opacity': 0.5}, {'x': [0]}, {'x': [5]}],
+           'layout': {'shapes': [{'x0': 1}]}}
+    calls = plotly_js_calls(figure_diff(old, new))
+    assert calls == [['restyle', {'x': [[2, 1]], 'opacity': [0.5]}, [0]], ['relayout', {'shapes[0].x0': 1}],
+                     ['addTraces', [{'x': [5]}]]]
+    assert apply_plotly_js_calls(old, calls) == new
+
+
+@pytest.mark.parametrize('aggregate', [False, True])
+def test_plot_patch(aggregate):
+    usp = UpSetPlotly(SAMPLES, NAMES)
+    usp.add_secondary_plot(VALUES, 'values', aggregate=aggregate)
+    usp.plot(show_fig=False)
+    previous = figure_json(usp.fig)
+    for params in [{'order_by': 'increasing'}, {'order_by': 'decreasing'},
+                   {'order_by': 'decreasing', 'intersection_limit': 'by_total 0.2'}, {}]:
+        patch = usp.plot_patch(previous, **params)
+        fresh = UpSetPlotly(SAMPLES, NAMES)
+        fresh.add_secondary_plot(VALUES, 'values', aggregate=aggregate)
+        expected = figure_json(fresh.plot(show_fig=False, return_fig=True, **params))
+        assert apply_patch(previous, patch) == expected
+        assert apply_plotly_js_calls(previous, plotly_js_calls(patch)) == expected
+        previous = expected
+
+    # only the glyphs move when the order changes. the template and the axes of the samples stay as they are.
+    usp.plot(show_fig=False)
+    patch = usp.plot_patch(order_by='increasing')
+    assert patch['relayout'] and all(key.startswith('shapes[') for key in patch['relayout'])
+
+
+def test_plot_patch_errors():
+    usp = UpSetPlotly(SAMPLES, NAMES)
+    with pytest.raises(ValueError):
+        usp.plot_patch(order_by='increasing')
+    usp.plot(show_fig=False)
+    with pytest.raises(ValueError):
+        usp.plot_patch(show_fig=True)
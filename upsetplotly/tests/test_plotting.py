@@ -0,0 +1,226 @@
+import subprocess
+import sys
+import pytest
+from upsetplotly import UpSetPlotly
+from upsetplotly.set_functions import samples_to_signature
+
+
+def test_matrix_shapes():
+    usp = UpSetPlotly([[1, 2, 3, 4], [2, 3, 4], [2, 5, 6]], ['a', 'b', 'c'])
+    fig = usp.plot(show_fig=False, return_fig=True)
+    shapes = fig.layout.shapes
+    # 3 stripes, 2 separators, then a bar and a circle per sample for each of the 4 intersections
+    assert len(shapes) == 3 + 2 + 4 + (1 + 1 + 2 + 3)
+    assert all(shape.xref == 'x2' and shape.yref == 'y2' for shape in shapes)
+    assert [shape.type for shape in shapes[5:9]] == ['rect', 'circle', 'rect', 'circle']
+
+
+def test_aggregated_box_plot():
+    pytest.importorskip('numpy')
+    samples = [list(range(0, 60)), list(range(30, 90))]
+    usp = UpSetPlotly(samples, ['a', 'b'])
+    usp.add_secondary_plot({x: float(x) for x in range(90)}, 'value', aggregate=True)
+    fig = usp.plot(show_fig=False, return_fig=True)
+    box = [trace for trace in fig.data if trace.type == 'box'][0]
+    assert box.y is None
+    assert list(box.median) == [14.5, 74.5, 44.5]
+
+
+def test_downsampled_swarm_plot():
+    pytest.importorskip('numpy')
+    samples = [list(range(0, 600)), list(range(300, 900))]
+    usp = UpSetPlotly(samples, ['a', 'b'])
+    usp.add_secondary_plot({x: float(x) for x in range(900)}, 'value', plot_type='swarm', aggregate=True,
+                           max_points=50)
+    fig = usp.plot(show_fig=False, return_fig=True)
+    swarm = [trace for trace in fig.data if trace.type == 'scattergl'][0]
+    assert len(swarm.y) == 150
+    # plots which are not aggregated draw every value, so a point budget would be ignored
+    for max_points in [50, 0]:
+        with pytest.raises(ValueError):
+            usp.add_secondary_plot({x: float(x) for x in range(900)}, 'value', plot_type='swarm',
+                                   aggregate=max_points == 0, max_points=max_points)
+
+
+def test_incremental_updates():
+    samples = [[1, 2, 3, 4], [2, 3, 4], [2, 5, 6], [6, 7, 1]]
+    names = ['a', 'b', 'c', 'd']
+
+    usp = UpSetPlotly(samples[:2], names[:2])
+    usp.add_sample(samples[2], 'c')
+    usp.add_sample([6, 7], 'd')
+    usp.add_elements('d', [1, 7])
+    assert usp.intersections == UpSetPlotly(samples, names).intersections
+    assert usp.all_elements == set(range(1, 8))
+
+    usp.remove_sample('b')
+    assert usp.intersections == UpSetPlotly([samples[0], samples[2], samples[3]], ['a', 'c', 'd']).intersections
+    usp.remove_sample('d')
+    assert usp.intersections == UpSetPlotly([samples[0], samples[2]], ['a', 'c']).intersections
+    assert usp.all_elements == {1, 2, 3, 4, 5, 6}
+    usp.plot(show_fig=False)
+
+
+def test_plot_cache():
+    usp = UpSetPlotly([[1, 2, 3, 4], [2, 3, 4], [2, 5, 6]], ['a', 'b', 'c'])
+    names_order = usp.intersections
+    fig = usp.plot(show_fig=False, return_fig=True, order_by='decreasing')
+    assert usp.plot(show_fig=False, return_fig=True, order_by='decreasing') is fig
+    assert usp.plot(show_fig=False, return_fig=True, order_by='decreasing', use_cache=False) is not fig
+    assert usp.plot(show_fig=False, return_fig=True, order_by='decreasing', color='#fcba03') is not fig
+    # ordering must not change the original order of the intersections
+    assert usp.intersections == names_order
+    assert [x['samples'] for x in usp.intersections] == [('a',), ('c',), ('a', 'b'), ('a', 'b', 'c')]
+
+    usp.add_elements('b', [7])
+    new_fig = usp.plot(show_fig=False, return_fig=True, order_by='decreasing')
+    assert new_fig is not fig
+    assert sum(new_fig.data[0].y) == 7
+
+
+def test_nothing_to_plot():
+    usp = UpSetPlotly([[1, 2, 3, 4], [2, 3, 4], [2, 5, 6]], ['a', 'b', 'c'])
+    assert len(usp.plot(show_fig=False, return_fig=True, max_intersections=1).data[0].y) == 1
+    for max_intersections in [0, -1, 1.5]:
+        with pytest.raises(ValueError):
+            usp.plot(show_fig=False, max_intersections=max_intersections)
+    with pytest.raises(RuntimeError):
+        usp.plot(show_fig=False, intersection_limit='by_total 0.9')
+    with pytest.raises(RuntimeError):
+        UpSetPlotly([[], []], ['a', 'b']).plot(show_fig=False)
+
+
+def test_compact_and_counts_only_storage():
+    pytest.importorskip('numpy')
+    samples = [['a', 'b', 'c', 'd'], ['b', 'c', 'd'], ['b', 'e', 'f']]
+    usp = UpSetPlotly(samples)
+    for compact in UpSetPlotly(samples, compact=True), UpSetPlotly(samples, compact=True, backend='numpy'):
+        assert [x['n'] for x in compact.intersections] == [x['n'] for x in usp.intersections]
+        assert [set(x['elements'].tolist()) for x in compact.intersections] == \
+               [x['elements'] for x in usp.intersections]
+        # every element is stored once, in the order of the intersections
+        assert compact.elements.tolist()[:3] == ['a', 'e', 'f'] or compact.elements.tolist()[:3] == ['a', 'f', 'e']
+        assert compact.intersections[1]['elements'].base is compact.elements
+
+    counts_only = UpSetPlotly(samples, keep_elements=False)
+    assert [x['n'] for x in counts_only.intersections] == [x['n'] for x in usp.intersections]
+    assert counts_only.intersections[0]['elements'] is None
+    assert counts_only.sample_sizes == {'1': 4, '2': 3, '3': 3}
+    counts_only.plot(show_fig=False, intersection_limit='by_sample 0.3')
+    with pytest.raises(ValueError):
+        counts_only.add_secondary_plot({x: 1 for x in 'abcdef'}, 'value')
+
+    compact = UpSetPlotly(samples, compact=True)
+    compact.add_elements('2', ['a'])
+    assert compact.elements is None
+    assert compact.intersections[0] == {'samples': ('3',), 'elements': {'e', 'f'}, 'n': 2}
+
+
+def test_plotly_is_imported_lazily():
+    code = ('import sys, upsetplotly\n'
+            'usp = upsetplotly.UpSetPlotly([[1, 2], [2, 3]])\n'
+            'usp.get_plotted_intersections()\n'
+            'assert "plotly" not in sys.modules and "tqdm" not in sys.modules\n'
+            'usp.plot(show_fig=False)\n'
+            'assert "plotly" in sys.modules\n')
+    subprocess.run([sys.executable, '-c', code], check=True)
+
+
+def test_element_index():
+    usp = UpSetPlotly([[1, 2, 3, 4], [2, 3, 4], [2, 5, 6]], ['a', 'b', 'c'])
+    assert usp.find_intersection(2) == ('a', 'b', 'c')
+    assert usp.find_intersection(7) is None
+    assert usp.find_intersections([1, 5, 7, 3]) == [('a',), ('c',), None, ('a', 'b')]
+    assert usp.get_intersection_elements(['b', 'a']) == {3, 4}
+    assert usp.get_intersection_elements(['b']) == set()
+
+    # the bars carry their signature, which leads back to their elements
+    fig = usp.plot(show_fig=False, return_fig=True, hover_elements=1)
+    bar = [trace for trace in fig.data if trace.type == 'bar'][0]
+    assert list(bar.customdata) == ['0x1', '0x4', '0x3', '0x7']
+    assert [set(usp.get_intersection_elements(x)) for x in bar.customdata] == [{1}, {5, 6}, {3, 4}, {2}]
+    assert usp.get_intersection_elements(3) == usp.get_intersection_elements('0x3') == {3, 4}
+    assert usp.get_intersection_elements('a') == {1}
+    with pytest.raises(ValueError):
+        usp.get_intersection_elements('d')
+    assert bar.hovertext[1] in ('5<br>... and 1 more', '6<br>... and 1 more')
+
+    # the index follows updates to the samples
+    usp.add_elements('c', [1])
+    assert usp.find_intersection(1) == ('a', 'c')
+    usp.remove_sample('a')
+    assert usp.find_intersection(1) == ('c',)
+
+
+def test_customdata_with_many_samples():
+    # the signatures of intersections including sample 60 are above the largest integer javascript holds exactly
+    names = [f's{i}' for i in range(61)]
+    usp = UpSetPlotly([[0, 1]] + [[i] for i in range(2, 61)] + [[1]], names)
+    bar = [trace for trace in usp.plot(show_fig=False, return_fig=True).data if trace.type == 'bar'][0]
+    assert hex(samples_to_signature(['s0', 's60'], names)) in bar.customdata
+    assert usp.get_intersection_elements(hex(samples_to_signature(['s0', 's60'], names))) == {1}
+    assert usp.get_intersection_elements(['s0', 's60']) == {1}
+
+
+def test_element_index_compact():
+    pytest.importorskip('numpy')
+    usp = UpSetPlotly([[1, 2, 3, 4], [2, 3, 4], [2, 5, 6]], ['a', 'b', 'c'], backend='numpy', compact=True)
+    assert usp.find_intersections([1, 2, 7]) == [('a',), ('a', 'b', 'c'), None]
+    assert sorted(usp.get_intersection_elements(['a', 'b']).tolist()) == [3, 4]
+
+
+def secondary_json(usp, *args, **kwargs):
+    # the traces of the secondary plot, with the values of each trace sorted, as their order within an intersection
+    # depends on how the elements are stored
+    usp.add_secondary_plot(*args, **kwargs)
+    fig = usp.plot(show_fig=False, return_fig=True)
+    traces = []
+    for trace in fig.data[1:]:
+        if trace.xaxis == 'x':
+            traces.append({key: sorted(list(value)) if isinstance(value, (tuple, list)) or hasattr(value, 'dtype')
+                           else value for key, value in trace.to_plotly_json().items()})
+    return traces
+
+
+@pytest.mark.parametrize('aggregate', [False, True])
+def test_aligned_secondary_data(aggregate):
+    np = pytest.importorskip('numpy')
+    samples = [list(range(0, 60)), list(range(30, 90)), list(range(50, 100))]
+    data = {x: float(x % 17) for x in range(100)}
+    expected = secondary_json(UpSetPlotly(samples), data, 'value', aggregate=aggregate)
+    usp = UpSetPlotly(samples, backend='numpy', compact=True)
+    values = np.array([data[x] for x in usp.elements.tolist()])
+    assert secondary_json(usp, values, 'value', aggregate=aggregate) == expected
+
+    # missing values are NaN, and are left out with ignore_missing
+    values[usp.elements == 10] = np.nan
+    del data[10]
+    with pytest.raises(ValueError):
+        UpSetPlotly(samples, backend='numpy', compact=True).add_secondary_plot(values, 'value')
+    with pytest.raises(ValueError):
+        UpSetPlotly(samples).add_secondary_plot(data, 'value')
+    expected = secondary_json(UpSetPlotly(samples), data, 'value', aggregate=aggregate, ignore_missing=True)
+    usp = UpSetPlotly(samples, backend='numpy', compact=True)
+    assert secondary_json(usp, values, 'value', aggregate=aggregate, ignore_missing=True) == expected
+
+    # the array is turned into a dictionary when the samples change
+    usp.add_elements('1', [99])
+    assert usp.additional_data[0]['kind'] == 'dict' and 10 not in usp.additional_data[0]['data']
+    usp.plot(show_fig=False)
+
+
+def test_aligned_secondary_data_needs_compact():
+    np = pytest.importorskip('numpy')
+    with pytest.raises(ValueError):
+        UpSetPlotly([[1, 2], [2, 3]]).add_secondary_plot(np.zeros(3), 'value')
+    with pytest.raises(ValueError):
+        UpSetPlotly([[1, 2], [2, 3]], backend='numpy', compact=True).add_secondary_plot(np.zeros(2), 'value')
+
+
+def test_series_secondary_data():
+    pd = pytest.importorskip('pandas')
+    samples = [[1, 2, 3, 4], [2, 3, 4], [2, 5, 6]]
+    data = {x: float(x) for x in range(1, 7)}
+    expected = secondary_json(UpSetPlotly(samples), data, 'value')
+    assert secondary_json(UpSetPlotly(samples), pd.Series(data), 'value') == expected
+    assert secondary_json(UpSetPlotly(samples, backend='numpy', compact=True), pd.Series(data), 'value') == expected
@@ -0,0 +1,53 @@
+import sys
+import pytest
+from upsetplotly import UpSetPlotly, Profiler
+from upsetplotly.set_functions import get_all_intersections
+from upsetplotly.profiling import stage
+
+
+def test_plot_stages():
+    records = []
+    with Profiler(callback=records.append) as profiler:
+        usp = UpSetPlotly([[1, 2, 3, 4], [2, 3, 4], [2, 5, 6]], ['a', 'b', 'c'])
+        usp.add_secondary_plot({x: float(x) for x in range(1, 7)}, 'value')
+        usp.plot(show_fig=False, order_by='decreasing')
+        usp.plot(show_fig=False, order_by='decreasing')
+    usp.plot(show_fig=False)
+
+    assert records == profiler.records
+    totals = profiler.totals()
+    assert totals['signatures']['n_items'] == 4
+    assert totals['plot']['calls'] == 2
+    assert totals['plot/intersections']['n_items'] == 4
+    assert totals['plot/intersections/filtering']['calls'] == 1
+    for path in ['layout', 'bar_trace', 'sample_table', 'matrix_glyphs', 'secondary_plot']:
+        assert totals['plot/' + path]['calls'] == 1
+    assert [x['cached'] for x in profiler.records if x['stage'] == 'plot'] == [False, True]
+    assert 'plot/matrix_glyphs' in profiler.summary()
+
+
+def test_memory_tracking():
+    with Profiler(track_memory=True) as profiler:
+        with stage('outer'):
+            with stage('inner') as info:
+                block = bytearray(10 ** 6)
+                info['n_items'] = 1
+            del block
+    inner, outer = profiler.records
+    assert inner['path'] == 'outer/inner' and inner['n_items'] == 1
+    assert inner['memory_peak'] >= 10 ** 6
+    assert outer['memory_peak'] >= inner['memory_peak']
+    assert outer['memory_change'] < 10 ** 6
+
+
+def test_progress_callback():
+    calls = []
+    out = get_all_intersections([[1, 2], [2, 3], [3, 4]], progress=lambda done, total: calls.append((done, total)))
+    assert len(out) == 7
+    assert calls == [(7, 7)]
+
+
+def test_progress_bar_needs_tqdm(monkeypatch):
+    monkeypatch.setitem(sys.modules, 'tqdm', None)
+    with pytest.raises(ImportError, match='progress'):
+        get_all_intersections([[1, 2], [2, 3]], progress=True)
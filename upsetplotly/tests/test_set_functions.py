@@ -1,4 +1,5 @@
-from upsetplotly.set_functions import get_all_intersections, order_sample_intersections
+from upsetplotly.set_functions import get_all_intersections, order_sample_intersections, get_membership_signatures, \
+    signature_to_samples, samples_to_signature, iter_intersections, filter_signatures
 
 
 def test_get_all_intersects_returns():
@@ -68,3 +69,80 @@ def test_order_sample_intersects_decreasing():
 
     intersects = get_all_intersections(samples, names)
     assert order_sample_intersections(intersects, 'decreasing') == order_sample_intersections(intersects) == should_return
+
+
+def test_get_membership_signatures():
+    signatures = get_membership_signatures([[1, 2, 3, 4], [2, 3, 4], [2, 5, 6]])
+    assert signatures == {0b001: {1}, 0b011: {3, 4}, 0b111: {2}, 0b100: {5, 6}}
+    assert signature_to_samples(0b101, ['a', 'b', 'c']) == ('a', 'c')
+    assert samples_to_signature(('c', 'a'), ['a', 'b', 'c']) == 0b101
+
+
+def test_get_all_intersects_matches_brute_force():
+    # compare against intersecting and subtracting the sets directly
+    samples = [set(range(i, 40, i + 1)) for i in range(5)]
+    names = [f's{i}' for i in range(5)]
+    for intersect in get_all_intersections(samples, names):
+        inside = [samples[names.index(x)] for x in intersect['samples']]
+        outside = [samples[i] for i in range(5) if names[i] not in intersect['samples']]
+        expected = set.intersection(*inside).difference(*outside)
+        assert intersect['elements'] == expected
+        assert intersect['n'] == len(expected)
+
+
+def test_iter_intersections_skips_empty():
+    samples = [[1, 2, 3, 4], [2, 3, 4], [2, 5, 6]]
+    names = ['a', 'b', 'c']
+    expected = [x for x in get_all_intersections(samples, names) if x['n'] > 0]
+    assert list(iter_intersections(samples, names)) == expected
+
+
+def test_iter_intersections_many_samples():
+    # 2^40 possible intersections could never be enumerated
+    samples = [[i, i + 1] for i in range(40)]
+    returned = list(iter_intersections(samples))
+    assert len(returned) == 41
+    assert returned[0] == {'samples': ('1',), 'elements': {0}, 'n': 1}
+    assert returned[-1] == {'samples': ('39', '40'), 'elements': {39}, 'n': 1}
+
+
+def test_filter_signatures():
+    samples = [[1, 2, 3, 4], [2, 3, 4], [2, 5, 6]]
+    names = ['a', 'b', 'c']
+    signatures = get_membership_signatures(samples)
+
+    def returned_samples(**filters):
+        return [x['samples'] for x in iter_intersections(samples, names, **filters)]
+
+    assert returned_samples(min_size=2) == [('c',), ('a', 'b')]
+    assert returned_samples(min_degree=2) == [('a', 'b'), ('a', 'b', 'c')]
+    assert returned_samples(max_degree=1) == [('a',), ('c',)]
+    assert returned_samples(required_samples=['b']) == [('a', 'b'), ('a', 'b', 'c')]
+    assert returned_samples(excluded_samples=['b']) == [('a',), ('c',)]
+    assert returned_samples(min_total_fraction=0.3) == [('c',), ('a', 'b')]
+    # {1} is 1/4 of a, {2} is 1/3 of b and c
+    assert returned_samples(min_sample_fraction=0.3) == [('c',), ('a', 'b'), ('a', 'b', 'c')]
+    # ties are broken by the default order
+    assert returned_samples(top_k=3) == [('a',), ('c',), ('a', 'b')]
+    assert filter_signatures(signatures, names, top_k=1) == [0b100]
+
+
+def test_parallel_matches_serial():
+    samples = [[f'e{x}' for x in range(i, 300, i + 1)] for i in range(6)]
+    assert get_all_intersections(samples, n_jobs=3) == get_all_intersections(samples)
+    assert list(iter_intersections(samples, n_jobs=2)) == list(iter_intersections(samples))
+
+
+def test_parallel_mixed_types():
+    # 1 == 1.0 == True, so the types of the elements are compared as well
+    def typed(signatures):
+        return {x: sorted((type(e).__name__, repr(e)) for e in group) for x, group in signatures.items()}
+
+    for samples in [[['a', 1, 2.0, (1, 2), 2 ** 70, -1], {1, 'a', 3, (1, 2)}, [], [2, -1.0, 'b']],
+                    [[1, 2.5, 3], [3, 4, True, 2 ** 63]], [list(range(50)), [x / 2 for x in range(100)]]]:
+        for backend in ['python', 'disk']:
+            serial = get_membership_signatures(samples, backend=backend)
+            parallel = get_membership_signatures(samples, backend=backend, n_jobs=3)
+            assert typed(parallel) == typed(serial)
+            assert (get_membership_signatures(samples, backend=backend, n_jobs=3, keep_elements=False) ==
+                    get_membership_signatures(samples, backend=backend, keep_elements=False))
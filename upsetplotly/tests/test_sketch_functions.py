@@ -0,0 +1,98 @@
+import pytest
+from upsetplotly import UpSetPlotly
+from upsetplotly.set_functions import get_all_intersections, get_membership_signatures
+
+np = pytest.importorskip('numpy')
+from upsetplotly.sketch_functions import SampleSketch, hash_elements, sketch_samples, estimate_signatures  # noqa: E402
+
+SAMPLES = [[1, 2, 3, 4], [2, 3, 4], [2, 5, 6]]
+NAMES = ['a', 'b', 'c']
+
+
+def large_samples():
+    rng = np.random.default_rng(0)
+    return [rng.choice(100000, size=size, replace=False) for size in [20000, 40000, 60000]]
+
+
+def test_hash_elements():
+    assert hash_elements(['a'])[0] == hash_elements(np.array(['a', 'a much longer string']))[0]
+    assert hash_elements([1])[0] == hash_elements([1.0])[0] == hash_elements(np.array([1], dtype=np.int8))[0]
+    assert hash_elements([1])[0] != hash_elements(['1'])[0]
+    assert hash_elements([1])[0] != hash_elements([1], seed=1)[0]
+    assert hash_elements([(1, 2)])[0] == hash_elements([(1, 2), 'x'])[0]
+    assert len(set(hash_elements(range(10000)).tolist())) == 10000
+
+
+def test_hash_mixed_types():
+    # an element hashes the same in a sample of mixed types as in a sample of only its own type
+    mixed = ['a', 1, 2.5, b'b', (1, 2), 2 ** 70, True]
+    pure = [['a'], [1], [2.5], [b'b'], [(1, 2)], [2 ** 70], [True]]
+    assert hash_elements(mixed).tolist() == [hash_elements(x)[0] for x in pure]
+    assert [x['n'] for x in get_all_intersections([['a', 'b'], ['a', 1]], sketch_size=100)] == [1, 1, 1]
+    assert SampleSketch(k=100).update(iter(['a', 'b'])).update(iter(['a', 1])).estimate() == 3
+
+
+def test_exact_when_not_full():
+    estimates, bounds, theta = estimate_signatures(sketch_samples(SAMPLES))
+    assert theta == 1
+    assert estimates == get_membership_signatures(SAMPLES, keep_elements=False)
+    assert all(low == high == estimates[x] for x, (low, high) in bounds.items())
+
+
+def test_update_and_merge():
+    sample = large_samples()[1]
+    whole = SampleSketch(k=256).update(sample)
+    assert len(whole.hashes) == 256 and whole.theta < 1
+
+    streamed = SampleSketch(k=256).update(iter(sample.tolist()))
+    merged = SampleSketch(k=256).update(sample[:25000]).merge(SampleSketch(k=256).update(sample[15000:]))
+    copied = SampleSketch.from_bytes(whole.to_bytes())
+    for sketch in [streamed, merged, copied]:
+        assert sketch.threshold == whole.threshold
+        assert np.array_equal(sketch.hashes, whole.hashes)
+
+    low, high = whole.bounds()
+    assert low < whole.estimate() < high
+    assert low < 40000 < high
+    with pytest.raises(ValueError):
+        whole.merge(SampleSketch(k=256, seed=1))
+
+
+def test_merge_exact_into_full():
+    # the exact sketch holds hashes above the threshold of the full one, which must not survive the merge
+    expected = SampleSketch(k=64).update(range(100000))
+    for small_first in [True, False]:
+        small, full = SampleSketch(k=64).update(range(100)), SampleSketch(k=64).update(range(100, 100000))
+        merged = small.merge(full) if small_first else full.merge(small)
+        assert merged.threshold == expected.threshold
+        assert np.array_equal(merged.hashes, expected.hashes)
+        low, high = merged.bounds()
+        assert low < 100000 < high
+
+
+def test_estimates():
+    samples = large_samples()
+    exact = get_membership_signatures(samples, backend='numpy', keep_elements=False)
+    estimates, bounds, theta = estimate_signatures(sketch_samples(samples, k=2048))
+    assert theta < 1
+    assert set(estimates) == set(exact)
+    assert sum(low <= exact[x] <= high for x, (low, high) in bounds.items()) >= len(exact) - 1
+    assert abs(sum(estimates.values()) - sum(exact.values())) < 0.05 * sum(exact.values())
+
+
+def test_sketched_intersections():
+    samples = large_samples()
+    intersections = get_all_intersections(samples, NAMES, sketch_size=2048)
+    exact = get_all_intersections(samples, NAMES)
+    assert [x['samples'] for x in intersections] == [x['samples'] for x in exact]
+    assert all(x['elements'] is None and x['bounds'][0] <= x['n'] <= x['bounds'][1] for x in intersections)
+
+    usp = UpSetPlotly(samples, NAMES, sketch_size=2048)
+    assert usp.signatures == estimate_signatures(sketch_samples(samples, k=2048))[0]
+    assert UpSetPlotly.from_sketches(sketch_samples(samples, k=2048), NAMES).signatures == usp.signatures
+    fig = usp.plot(show_fig=False, return_fig=True)
+    assert len(fig.data[0].error_y.array) == len(fig.data[0].y)
+    with pytest.raises(ValueError):
+        usp.add_secondary_plot({}, 'values')
+    with pytest.raises(ValueError):
+        UpSetPlotly.from_sketches(sketch_samples(samples), NAMES[:2])